@@ -0,0 +1,96 @@
+# src/benchmark/bulk_mrz_benchmark.py
+
+"""
+Throughput of the vectorized MRZ parser of formatter.bulk_mrz.
+
+Times load_mrz_array (packing the raw strings) and parse_mrz_bulk (parsing and
+validating the packed records) on valid TD3 MRZs from the identities of
+benchmark.synthetic, and reports records per second for each and for both
+together. The best of several runs is kept. Run from src/:
+
+    python -m benchmark.bulk_mrz_benchmark --records 1000000 --repeat 3
+"""
+
+import argparse
+import json
+import time
+from datetime import datetime
+
+import numpy as np
+
+from benchmark.synthetic import random_identity, td3_lines
+from formatter.bulk_mrz import load_mrz_array, parse_mrz_bulk
+from instrumentation.threads import available_cpus
+
+
+def generate_mrz(records, distinct, seed=0):
+    """
+    Return records raw MRZ strings cycling over distinct random passports.
+    """
+    rng = np.random.default_rng(seed)
+    samples = ["".join(td3_lines(random_identity(rng, serial))) for serial in range(distinct)]
+    return [samples[index % distinct] for index in range(records)]
+
+
+def time_best(function, repeat):
+    """
+    Return the result and the shortest wall time of repeat calls of function.
+    """
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        seconds = time.perf_counter() - started
+        best = seconds if best is None else min(best, seconds)
+    return result, best
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the vectorized MRZ parser.")
+    parser.add_argument("--records", type=int, default=1_000_000)
+    parser.add_argument(
+        "--distinct", type=int, default=10_000, help="Different passports among the records."
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per step, the best is kept.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="Also write the report to this JSON file.")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    print(f"Generating {args.records} MRZs...")
+    mrz_strings = generate_mrz(args.records, min(args.distinct, args.records), args.seed)
+
+    mrz, load_seconds = time_best(lambda: load_mrz_array(mrz_strings), args.repeat)
+    columns, parse_seconds = time_best(lambda: parse_mrz_bulk(mrz), args.repeat)
+    if not columns["valid"].all():
+        raise SystemExit("parse_mrz_bulk rejected generated MRZs, the timings are not comparable.")
+
+    report = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "records": args.records,
+        "distinct": args.distinct,
+        "cpus": available_cpus(),
+        "load_seconds": load_seconds,
+        "parse_seconds": parse_seconds,
+        "load_records_per_s": args.records / load_seconds,
+        "parse_records_per_s": args.records / parse_seconds,
+        "records_per_s": args.records / (load_seconds + parse_seconds),
+    }
+    print(
+        f"load {report['load_records_per_s']:,.0f} records/s, "
+        f"parse {report['parse_records_per_s']:,.0f} records/s, "
+        f"both {report['records_per_s']:,.0f} records/s"
+    )
+    text = json.dumps(report, indent=4)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+        print(f"Report saved as: {args.output}")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
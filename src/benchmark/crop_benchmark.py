@@ -0,0 +1,115 @@
+# src/benchmark/crop_benchmark.py
+
+"""
+Latency against crop accuracy of the YOLO settings of Cropper.
+
+Every setting is compared with the reference crop of the original untuned
+inference (all 80 classes, default image size, one image per call). Run from
+src/:
+
+    python -m benchmark.crop_benchmark --imgsz 320 480 640 --conf 0.25 0.4
+"""
+
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import os
+import time
+
+import numpy as np
+
+from cropper.crop import Cropper
+from cropper.detections import box_iou
+from processing.pages import load_images
+
+
+def reference_boxes(cropper, images):
+    """
+    Crop boxes of the original inference: every class, default settings, one image at a time.
+    """
+    return [cropper.crop_box(image, cropper.model(image, verbose=False)) for image in images]
+
+
+def run_setting(cropper, images, references, repeat):
+    """
+    Time batched cropping of all images with the cropper's current settings.
+    """
+    cropper.crop_boxes(images[:cropper.batch_size])  # Warm-up
+    durations = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        boxes = cropper.crop_boxes(images)
+        durations.append(time.perf_counter() - started)
+    ious = np.array([box_iou(box, reference) for box, reference in zip(boxes, references)])
+    seconds = float(np.median(durations))
+    return {
+        "imgsz": cropper.imgsz,
+        "conf": cropper.conf,
+        "max_det": cropper.max_det,
+        "batch_size": cropper.batch_size,
+        "ms_per_image": seconds * 1000 / len(images),
+        "images_per_s": len(images) / seconds,
+        "mean_iou": float(ious.mean()),
+        "min_iou": float(ious.min()),
+        "agreement": float((ious >= 0.9).mean()),
+    }
+
+
+def parse_args():
+    src_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    parser = argparse.ArgumentParser(description="Benchmark the YOLO settings of Cropper.")
+    parser.add_argument(
+        "--input-folder",
+        default=os.path.join(os.path.dirname(src_dir), 'inputs'),
+        help="Folder with the benchmark images.",
+    )
+    parser.add_argument(
+        "--model",
+        default=os.path.join(src_dir, 'weights', 'yolo', 'yolo11n.pt'),
+        help="YOLO weights.",
+    )
+    parser.add_argument("--imgsz", type=int, nargs="+", default=[320, 480, 640])
+    parser.add_argument("--conf", type=float, nargs="+", default=[0.25])
+    parser.add_argument("--max-det", type=int, nargs="+", default=[10, 300])
+    parser.add_argument("--batch-size", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per setting.")
+    parser.add_argument("--output", default=None, help="Also write the report to this JSON file.")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    images = load_images(args.input_folder)
+    if not images:
+        raise SystemExit(f"No images found in {args.input_folder}")
+
+    cropper = Cropper(args.model)
+    report = []
+    # The crop methods print their decisions; keep them out of the report
+    with contextlib.redirect_stdout(io.StringIO()):
+        references = reference_boxes(cropper, images)
+        for imgsz, conf, max_det, batch_size in itertools.product(
+            args.imgsz, args.conf, args.max_det, args.batch_size
+        ):
+            cropper.imgsz, cropper.conf = imgsz, conf
+            cropper.max_det, cropper.batch_size = max_det, batch_size
+            report.append(run_setting(cropper, images, references, args.repeat))
+
+    print(f"{len(images)} images")
+    print("imgsz  conf  max_det  batch  ms/image  images/s  mean IoU  agreement")
+    for row in report:
+        print(
+            f"{row['imgsz']:>5}  {row['conf']:.2f}  {row['max_det']:>7}  {row['batch_size']:>5}"
+            f"  {row['ms_per_image']:>8.1f}  {row['images_per_s']:>8.1f}"
+            f"  {row['mean_iou']:>8.3f}  {row['agreement']:>9.0%}"
+        )
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=4)
+        print(f"Report saved as: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
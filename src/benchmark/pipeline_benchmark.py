@@ -0,0 +1,344 @@
+# src/benchmark/pipeline_benchmark.py
+
+"""
+End-to-end benchmark of PassportProcessor on a labeled corpus from benchmark.synthetic.
+
+Reports throughput, per-image latency percentiles, per-stage latencies, peak
+memory and field-level accuracy as JSON, optionally compared with a saved
+baseline report. With --detect-orientation, the accuracy and cost of the
+orientation stage are reported on their own as well. The headline accuracy
+covers the HEADLINE_FORMATS only; by_format scores every format of the corpus.
+Run from src/:
+
+    python -m benchmark.synthetic --output ../benchmark_corpus --count 200
+    python -m benchmark.pipeline_benchmark --corpus ../benchmark_corpus --output report.json
+    python -m benchmark.pipeline_benchmark --corpus ../benchmark_corpus --baseline report.json
+
+    python -m benchmark.synthetic --output ../rotated_corpus --count 200 --rotations 0 90 180 270
+    python -m benchmark.pipeline_benchmark --corpus ../rotated_corpus --detect-orientation
+
+    python -m benchmark.synthetic --output ../large_corpus --count 50 --scale 4
+    python -m benchmark.pipeline_benchmark --corpus ../large_corpus --profile-memory --output full.json
+    python -m benchmark.pipeline_benchmark --corpus ../large_corpus --profile-memory \
+        --detection-side 1024 --baseline full.json
+"""
+
+import argparse
+import contextlib
+import difflib
+import io
+import json
+import os
+import tempfile
+import time
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+from benchmark.synthetic import LABELS_FILE
+from instrumentation.memory import peak_rss_mb
+from instrumentation.tracing import MemorySink, Tracer
+from storage.image_writer import ImageWriter
+from storage.data_manager import DataManager
+from processing.passport_processor import PassportProcessor
+
+# Record fields scored for accuracy, as in StoreData.as_dict()
+SCORED_FIELDS = ("Country", "Surname", "Given Names", "Date of Birth", "Sex", "Passport Number")
+# Formats in the headline accuracy. The MRZ parser reads TD3 passports only, so
+# TD1 ID cards always score 0 and would hide TD3 changes; they stay in by_format.
+HEADLINE_FORMATS = ("TD3",)
+# Report metrics compared with the baseline, and whether higher is better
+COMPARED_METRICS = {
+    "throughput_images_per_s": True,
+    "latency_ms.p50": False,
+    "latency_ms.p95": False,
+    "latency_ms.p99": False,
+    "peak_rss_mb": False,
+    "accuracy.all_fields": True,
+    "accuracy.raw_mrz_characters": True,
+    "orientation.accuracy": True,
+    "orientation.latency_ms.mean": False,
+}
+
+
+def score(entries, labels):
+    """
+    Return the field-level accuracy of the stored entries against the corpus labels.
+
+    Missing entries (unreadable images, parse errors) count as wrong on every field.
+    """
+    correct = {field: 0 for field in SCORED_FIELDS}
+    all_fields = 0
+    character_ratio = 0.0
+    for image_file, label in labels.items():
+        expected = label["record"]
+        entry = entries.get(image_file) or {}
+        matches = [entry.get(field) == expected[field] for field in SCORED_FIELDS]
+        for field, match in zip(SCORED_FIELDS, matches):
+            correct[field] += match
+        all_fields += all(matches)
+        character_ratio += difflib.SequenceMatcher(
+            None, entry.get("raw_mrz", ""), expected["raw_mrz"], autojunk=False
+        ).ratio()
+    count = max(len(labels), 1)
+    accuracy = {field: correct[field] / count for field in SCORED_FIELDS}
+    accuracy["all_fields"] = all_fields / count
+    accuracy["raw_mrz_characters"] = character_ratio / count
+    return accuracy
+
+
+def _metric(report, path):
+    value = report
+    for key in path.split("."):
+        value = value.get(key) if isinstance(value, dict) else None
+    return value
+
+
+def compare_reports(report, baseline):
+    """
+    Return {metric: {"baseline", "current", "change", "regression"}} for COMPARED_METRICS.
+
+    change is relative to the baseline; regression is True when the metric got worse.
+    """
+    comparison = {}
+    for path, higher_is_better in COMPARED_METRICS.items():
+        current, previous = _metric(report, path), _metric(baseline, path)
+        if current is None or not previous:
+            continue
+        change = (current - previous) / previous
+        comparison[path] = {
+            "baseline": previous,
+            "current": current,
+            "change": change,
+            "regression": change < 0 if higher_is_better else change > 0,
+        }
+    return comparison
+
+
+def run_benchmark(processor, corpus, labels, tracer):
+    """
+    Process every labeled image of the corpus; return the report without memory figures.
+    """
+    entries = {}
+    latencies = []
+    started = time.perf_counter()
+    for image_file in labels:
+        image_started = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            entries[image_file] = processor.process_image(image_file, corpus)
+        latencies.append((time.perf_counter() - image_started) * 1000)
+    processor.image_writer.flush()
+    elapsed = time.perf_counter() - started
+
+    latencies = np.array(latencies)
+    by_format = {}
+    for document_format in sorted({label["format"] for label in labels.values()}):
+        subset = {
+            name: label for name, label in labels.items() if label["format"] == document_format
+        }
+        by_format[document_format] = {"images": len(subset), "accuracy": score(entries, subset)}
+    headline = {
+        name: label for name, label in labels.items() if label["format"] in HEADLINE_FORMATS
+    }
+    return {
+        "images": len(labels),
+        "failures": sum(entry is None for entry in entries.values()),
+        "throughput_images_per_s": len(labels) / elapsed,
+        "latency_ms": {
+            "mean": float(latencies.mean()),
+            "p50": float(np.percentile(latencies, 50)),
+            "p95": float(np.percentile(latencies, 95)),
+            "p99": float(np.percentile(latencies, 99)),
+        },
+        "stages_ms": tracer.summary(),
+        "stages_memory_mb": tracer.memory_summary(),
+        "accuracy": score(entries, headline),
+        "by_format": by_format,
+    }
+
+
+def evaluate_orientation(reader, corpus, labels):
+    """
+    Return the accuracy and cost of the orientation stage alone on the corpus.
+
+    Images are decoded outside the timed section; the latency covers detection
+    and the rotation of the full image.
+    """
+    correct = 0
+    latencies, runs = [], []
+    confusion = {}
+    for image_file, label in labels.items():
+        image = cv2.imread(os.path.join(corpus, image_file), cv2.IMREAD_COLOR)
+        if image is None:
+            continue
+        started = time.perf_counter()
+        _, rotation, segmentation_runs = reader.upright(image)
+        latencies.append((time.perf_counter() - started) * 1000)
+        runs.append(segmentation_runs)
+        expected = label.get("rotation", 0)
+        correct += rotation == expected
+        # "expected->detected": count
+        key = f"{expected}->{rotation}"
+        confusion[key] = confusion.get(key, 0) + 1
+    latencies = np.array(latencies or [0.0])
+    return {
+        "images": len(runs),
+        "accuracy": correct / max(len(runs), 1),
+        "latency_ms": {
+            "mean": float(latencies.mean()),
+            "p95": float(np.percentile(latencies, 95)),
+        },
+        "segmentation_runs_mean": float(np.mean(runs)) if runs else 0.0,
+        "confusion": dict(sorted(confusion.items())),
+    }
+
+
+def build_processor(args, output_folder, tracer, num_threads=None):
+    """
+    Build the pipeline like main.py, writing into a scratch output folder.
+
+    num_threads sizes the TFLite interpreter, see instrumentation.threads.
+    """
+    from cropper.crop import Cropper
+    from cropper.geometry import GeometricCropper
+    from mrz_reader.reader import MRZReader
+
+    src_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    weights_dir = os.path.join(src_dir, "weights")
+    reader = MRZReader(
+        facedetection_protxt=os.path.join(weights_dir, "face_detector/deploy.prototxt"),
+        facedetection_caffemodel=os.path.join(
+            weights_dir, "face_detector/res10_300x300_ssd_iter_140000.caffemodel"
+        ),
+        segmentation_model=os.path.join(weights_dir, "mrz_detector/mrz_seg.tflite"),
+        easy_ocr_params={"lang_list": ["en"], "gpu": False},
+        num_threads=num_threads,
+        tracer=tracer,
+    )
+
+    def build_yolo_cropper():
+        return Cropper(os.path.join(weights_dir, "yolo/yolo11n.pt"), tracer=tracer)
+
+    if args.crop_mode == "geometric":
+        cropper = GeometricCropper(fallback=build_yolo_cropper)
+    else:
+        cropper = build_yolo_cropper()
+
+    data_manager = DataManager(output_folder, durability="none")
+    image_writer = ImageWriter(
+        save_faces=not args.skip_faces,
+        save_documents=not args.skip_documents,
+        max_pending=2 if args.low_memory else 8,
+        tracer=tracer,
+    )
+    return PassportProcessor(
+        reader,
+        cropper,
+        data_manager,
+        weights_dir,
+        image_writer,
+        tracer=tracer,
+        low_memory=args.low_memory,
+        detect_orientation=args.detect_orientation,
+        detection_side=args.detection_side,
+    )
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline on a synthetic corpus.")
+    parser.add_argument("--corpus", required=True, help="Folder written by benchmark.synthetic.")
+    parser.add_argument("--output", default=None, help="Write the JSON report to this file.")
+    parser.add_argument("--baseline", default=None, help="Compare with this saved JSON report.")
+    parser.add_argument(
+        "--fail-on-regression",
+        type=float,
+        default=None,
+        help="Exit with status 1 if a compared metric got worse by more than this fraction.",
+    )
+    parser.add_argument("--crop-mode", choices=["yolo", "geometric"], default="yolo")
+    parser.add_argument("--skip-faces", action="store_true")
+    parser.add_argument("--skip-documents", action="store_true")
+    parser.add_argument(
+        "--profile-memory",
+        action="store_true",
+        help="Also report the array memory allocated by each stage (slows the run down).",
+    )
+    parser.add_argument(
+        "--low-memory", action="store_true", help="Run the pipeline in memory-budget mode."
+    )
+    parser.add_argument(
+        "--detection-side",
+        type=int,
+        default=None,
+        help="Run the models on a reduced decode at least this large (multi-resolution mode).",
+    )
+    parser.add_argument(
+        "--detect-orientation",
+        action="store_true",
+        help="Turn rotated images upright, and report the orientation accuracy and cost.",
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    with open(os.path.join(args.corpus, LABELS_FILE), "r") as f:
+        corpus_labels = json.load(f)
+    labels = corpus_labels["images"]
+
+    tracer = Tracer(MemorySink(), profile_memory=args.profile_memory)
+    with tempfile.TemporaryDirectory() as output_folder:
+        processor = build_processor(args, output_folder, tracer)
+        rss_before = peak_rss_mb()
+        report = run_benchmark(processor, args.corpus, labels, tracer)
+        if args.detect_orientation:
+            report["orientation"] = evaluate_orientation(processor.reader, args.corpus, labels)
+        processor.image_writer.close()
+        processor.data_manager.close()
+
+    report.update(
+        {
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "corpus": os.path.abspath(args.corpus),
+            "distortions": corpus_labels.get("distortions", {}),
+            "crop_mode": args.crop_mode,
+            "low_memory": args.low_memory,
+            "detect_orientation": args.detect_orientation,
+            "detection_side": args.detection_side,
+            "peak_rss_mb": peak_rss_mb(),
+            "peak_rss_after_load_mb": rss_before,
+        }
+    )
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            report["comparison"] = compare_reports(report, json.load(f))
+        for metric, values in report["comparison"].items():
+            print(
+                f"{metric:<32}{values['baseline']:>12.3f}{values['current']:>12.3f}"
+                f"{values['change']:>+9.1%}"
+            )
+            if (
+                args.fail_on_regression is not None
+                and values["regression"]
+                and abs(values["change"]) > args.fail_on_regression
+            ):
+                regressions.append(metric)
+
+    text = json.dumps(report, indent=4)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+        print(f"Report saved as: {args.output}")
+    else:
+        print(text)
+    if regressions:
+        raise SystemExit(
+            f"Regressions beyond {args.fail_on_regression:.0%}: {', '.join(regressions)}"
+        )
+
+
+if __name__ == "__main__":
+    main()
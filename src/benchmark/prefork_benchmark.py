@@ -0,0 +1,132 @@
+# src/benchmark/prefork_benchmark.py
+
+"""
+Memory of pipeline workers sharing their models against loading their own.
+
+The labeled corpus of benchmark.synthetic is processed by forked workers
+(processing.workers.run_prefork) twice: once with every worker loading its
+own models after the fork, once with the models loaded in the parent before
+the fork and shared copy-on-write. The unique (USS) and proportional (PSS)
+memory of every process is reported for both. Run from src/:
+
+    python -m benchmark.prefork_benchmark --corpus ../benchmark_corpus --workers 4
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import tempfile
+from datetime import datetime
+from types import SimpleNamespace
+
+from benchmark.pipeline_benchmark import build_processor
+from benchmark.synthetic import LABELS_FILE
+from instrumentation.threads import ThreadBudget
+from instrumentation.tracing import NULL_TRACER
+from processing.passport_processor import PassportProcessor
+from processing.workers import format_worker_reports, run_prefork
+from storage.data_manager import DataManager
+from storage.image_writer import ImageWriter
+
+# Per-worker loading runs first, before the parent holds any model itself
+MODES = ("per_worker", "shared")
+
+
+def run_mode(mode, corpus, image_files, workers, options, threads):
+    """
+    Process the corpus with forked workers; return the parent and worker reports.
+    """
+    with tempfile.TemporaryDirectory() as output_folder:
+        shared = None
+        if mode == "shared":
+            with contextlib.redirect_stdout(io.StringIO()):
+                shared = build_processor(options, output_folder, NULL_TRACER, threads)
+            shared.data_manager.close()
+
+        def build_worker(index):
+            worker_folder = os.path.join(output_folder, f"worker-{index}")
+            with contextlib.redirect_stdout(io.StringIO()):
+                if shared is None:
+                    processor = build_processor(options, worker_folder, NULL_TRACER, threads)
+                else:
+                    processor = PassportProcessor(
+                        shared.reader,
+                        shared.cropper,
+                        DataManager(worker_folder, durability="none"),
+                        shared.weights_dir,
+                        ImageWriter(),
+                    )
+
+            def handle(image_file):
+                with contextlib.redirect_stdout(io.StringIO()):
+                    processor.process_image(image_file, corpus)
+
+            def close():
+                processor.image_writer.close()
+                processor.data_manager.close()
+
+            return handle, close
+
+        return run_prefork(image_files, workers, build_worker)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Compare the memory of workers sharing their models with workers "
+        "loading their own."
+    )
+    parser.add_argument("--corpus", required=True, help="Folder written by benchmark.synthetic.")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--crop-mode", choices=["yolo", "geometric"], default="yolo")
+    parser.add_argument("--limit", type=int, default=None, help="Process the first N images only.")
+    parser.add_argument("--output", default=None, help="Also write the report to this JSON file.")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    with open(os.path.join(args.corpus, LABELS_FILE), "r") as f:
+        image_files = list(json.load(f)["images"])[: args.limit]
+
+    budget = ThreadBudget.for_workers(args.workers)
+    budget.apply()
+    options = SimpleNamespace(
+        crop_mode=args.crop_mode,
+        skip_faces=False,
+        skip_documents=False,
+        low_memory=False,
+        detect_orientation=False,
+        detection_side=None,
+    )
+    report = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "corpus": os.path.abspath(args.corpus),
+        "images": len(image_files),
+        "workers": args.workers,
+    }
+    for mode in MODES:
+        parent, workers = run_mode(
+            mode, args.corpus, image_files, args.workers, options, budget.threads
+        )
+        print(f"Models {mode.replace('_', ' ')}:")
+        print(format_worker_reports(workers, parent))
+        report[mode] = {
+            "parent": parent,
+            "workers": workers,
+            "total_pss_mb": sum((m["pss_mb"] or 0.0) for m in [parent] + workers),
+            "mean_worker_uss_mb": sum(w["uss_mb"] for w in workers) / max(len(workers), 1),
+        }
+
+    text = json.dumps(report, indent=4)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+        print(f"Report saved as: {args.output}")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,384 @@
+# src/benchmark/synthetic.py
+
+"""
+Offline generator of a labeled corpus of synthetic passport and ID card pages.
+
+Every page carries a valid TD3 (passport, 2x44) or TD1 (ID card, 3x30) MRZ
+with correct check digits, rendered at the ICAO 2.54 mm character pitch, plus
+a portrait placeholder. Blur, skew, shadow, noise, resolution and whole-page
+rotations by 90, 180 or 270 degrees are controllable. labels.json maps each
+image file to its format, MRZ lines, rotation and the record PassportProcessor
+should store for it. Run from src/:
+
+    python -m benchmark.synthetic --output ../benchmark_corpus --count 200 --blur 1.0 --skew 3
+
+Pass an OCR-B TrueType font with --font for realistic glyphs; Pillow's default
+font is used otherwise.
+"""
+
+import argparse
+import json
+import os
+import string
+from datetime import date
+
+import cv2
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+from formatter.bulk_mrz import compute_check_digits, load_mrz_array
+
+LABELS_FILE = "labels.json"
+# Page sizes in millimetres and MRZ layout of each document format
+DOCUMENT_FORMATS = {
+    "TD3": {"page_mm": (125.0, 88.0), "lines": 2, "length": 44, "code": "P<"},
+    "TD1": {"page_mm": (85.6, 54.0), "lines": 3, "length": 30, "code": "ID"},
+}
+MRZ_PITCH_MM = 2.54
+MRZ_LINE_SPACING_MM = 4.8
+MRZ_BOTTOM_MARGIN_MM = 4.0
+# cv2.rotate code turning an upright page clockwise by each rotation in degrees
+ROTATE_CODES = {
+    90: cv2.ROTATE_90_CLOCKWISE,
+    180: cv2.ROTATE_180,
+    270: cv2.ROTATE_90_COUNTERCLOCKWISE,
+}
+
+COUNTRIES = ("UTO", "FRA", "DEU", "ITA", "ESP", "NLD", "GBR", "USA", "CAN", "TUR")
+SURNAMES = ("ERIKSSON", "MARTIN", "MULLER", "ROSSI", "GARCIA", "DE JONG", "SMITH", "YILMAZ")
+GIVEN_NAMES = ("ANNA", "MARIA", "JEAN", "LUCA", "SOFIA", "EMMA", "NOAH", "AYSE", "PAUL")
+
+
+def check_digit(field):
+    """
+    Return the ICAO 9303 check digit of an MRZ field as a character.
+    """
+    return str(compute_check_digits(load_mrz_array([field], len(field)))[0])
+
+
+def _mrz_name(surname, given_names, length):
+    name = surname.replace(" ", "<") + "<<" + "<".join(given_names)
+    return name[:length].ljust(length, "<")
+
+
+def _mrz_date(value):
+    return value.strftime("%y%m%d")
+
+
+def _random_date(rng, first_year, last_year):
+    return date(
+        int(rng.integers(first_year, last_year + 1)),
+        int(rng.integers(1, 13)),
+        int(rng.integers(1, 29)),
+    )
+
+
+def random_identity(rng, serial):
+    """
+    Return the fields of a random document holder; serial makes the document number unique.
+    """
+    today = date.today()
+    birth = _random_date(rng, 1950, today.year - 1)
+    expiry = _random_date(rng, today.year + 1, today.year + 10)
+    letters = "".join(rng.choice(list(string.ascii_uppercase), 2))
+    return {
+        "country": str(rng.choice(COUNTRIES)),
+        "surname": str(rng.choice(SURNAMES)),
+        "given_names": [
+            str(name) for name in rng.choice(GIVEN_NAMES, int(rng.integers(1, 3)), replace=False)
+        ],
+        "document_number": f"{letters}{serial:07d}",
+        "birth": birth,
+        "expiry": expiry,
+        "sex": str(rng.choice(["M", "F"])),
+        "personal_number": "".join(rng.choice(list(string.digits), 8)),
+    }
+
+
+def td3_lines(identity):
+    """
+    Return the two 44-character lines of a passport MRZ.
+    """
+    number = identity["document_number"].ljust(9, "<")
+    personal = identity["personal_number"].ljust(14, "<")
+    name = _mrz_name(identity["surname"], identity["given_names"], 39)
+    line1 = "P<" + identity["country"] + name
+    line2 = (
+        number + check_digit(number)
+        + identity["country"]
+        + _mrz_date(identity["birth"]) + check_digit(_mrz_date(identity["birth"]))
+        + identity["sex"]
+        + _mrz_date(identity["expiry"]) + check_digit(_mrz_date(identity["expiry"]))
+        + personal + check_digit(personal)
+    )
+    composite = line2[0:10] + line2[13:20] + line2[21:43]
+    return [line1, line2 + check_digit(composite)]
+
+
+def td1_lines(identity):
+    """
+    Return the three 30-character lines of an ID card MRZ.
+    """
+    number = identity["document_number"].ljust(9, "<")
+    line1 = ("ID" + identity["country"] + number + check_digit(number)).ljust(30, "<")
+    line2 = (
+        _mrz_date(identity["birth"]) + check_digit(_mrz_date(identity["birth"]))
+        + identity["sex"]
+        + _mrz_date(identity["expiry"]) + check_digit(_mrz_date(identity["expiry"]))
+        + identity["country"]
+    ).ljust(29, "<")
+    composite = line1[5:30] + line2[0:7] + line2[8:15] + line2[18:29]
+    line3 = _mrz_name(identity["surname"], identity["given_names"], 30)
+    return [line1, line2 + check_digit(composite), line3]
+
+
+def expected_record(identity, lines):
+    """
+    Return the record PassportProcessor should store for a page, as in StoreData.as_dict().
+    """
+    return {
+        "Country": identity["country"],
+        "Surname": identity["surname"].replace(" ", ""),
+        "Given Names": " ".join(identity["given_names"]),
+        "Date of Birth": identity["birth"].isoformat(),
+        "Sex": {"M": "Male", "F": "Female"}[identity["sex"]],
+        "Passport Number": identity["document_number"],
+        "raw_mrz": "".join(lines),
+    }
+
+
+def load_font(font_path, size):
+    """
+    Return the TrueType font at font_path, or Pillow's default font, at a pixel size.
+    """
+    if font_path:
+        return ImageFont.truetype(font_path, size)
+    return ImageFont.load_default(size)
+
+
+def render_page(lines, document_format, rng, font_path=None, pixels_per_mm=10.0):
+    """
+    Render a flat, undistorted document page with its MRZ as a BGR image.
+    """
+    layout = DOCUMENT_FORMATS[document_format]
+    width_mm, height_mm = layout["page_mm"]
+    width, height = int(width_mm * pixels_per_mm), int(height_mm * pixels_per_mm)
+    background = tuple(int(v) for v in rng.integers(205, 250, 3))
+    page = Image.new("RGB", (width, height), background)
+    draw = ImageDraw.Draw(page)
+
+    def mm(value):
+        return int(round(value * pixels_per_mm))
+
+    # Security print stand-in: faint wavy lines over the whole page
+    tint = tuple(max(0, v - 25) for v in background)
+    for offset in range(0, height, mm(3)):
+        points = [(x, offset + mm(1) * np.sin(x / mm(6))) for x in range(0, width, mm(2))]
+        draw.line(points, fill=tint, width=1)
+
+    # Portrait zone with a face-like placeholder
+    portrait = (mm(6), mm(12), mm(6 + width_mm * 0.27), mm(12 + height_mm * 0.5))
+    draw.rectangle(portrait, fill=(225, 225, 225), outline=(120, 120, 120))
+    skin = tuple(int(v) for v in rng.integers(120, 220, 3))
+    cx, cy = (portrait[0] + portrait[2]) // 2, (portrait[1] + portrait[3]) // 2
+    rx, ry = (portrait[2] - portrait[0]) // 3, (portrait[3] - portrait[1]) // 3
+    draw.ellipse((cx - rx, cy - ry, cx + rx, cy + ry), fill=skin)
+    for eye in (-1, 1):
+        ex, ey = cx + eye * rx // 2, cy - ry // 4
+        draw.ellipse((ex - 4, ey - 4, ex + 4, ey + 4), fill=(40, 40, 40))
+    draw.line((cx - rx // 3, cy + ry // 2, cx + rx // 3, cy + ry // 2), fill=(90, 40, 40), width=3)
+
+    # Visual zone text stand-in
+    label_font = load_font(font_path, mm(2.2))
+    for row in range(5):
+        draw.text(
+            (portrait[2] + mm(5), portrait[1] + row * mm(7)),
+            "".join(rng.choice(list(string.ascii_uppercase), int(rng.integers(6, 16)))),
+            fill=(60, 60, 80),
+            font=label_font,
+        )
+
+    # MRZ at the ICAO pitch, one glyph per cell so any font renders monospaced
+    mrz_font = load_font(font_path, mm(3.0))
+    left = (width_mm - layout["length"] * MRZ_PITCH_MM) / 2
+    bottom = height_mm - MRZ_BOTTOM_MARGIN_MM
+    for row, line in enumerate(lines):
+        top = bottom - (len(lines) - row) * MRZ_LINE_SPACING_MM
+        for column, character in enumerate(line):
+            position = (mm(left + column * MRZ_PITCH_MM), mm(top))
+            draw.text(position, character, fill=(10, 10, 10), font=mrz_font)
+
+    return cv2.cvtColor(np.asarray(page), cv2.COLOR_RGB2BGR)
+
+
+def distort(page, rng, blur=0.0, skew=0.0, shadow=0.0, noise=0.0, scale=1.0):
+    """
+    Photograph-like degradation of a rendered page.
+
+    Parameters:
+    -----------
+    page : numpy.ndarray
+        The rendered BGR page.
+    rng : numpy.random.Generator
+        Source of the random skew direction, placement and noise.
+    blur : float
+        Gaussian blur sigma in pixels (0 for none).
+    skew : float
+        Maximum rotation in degrees; each page is rotated by a uniform angle in [-skew, skew].
+    shadow : float
+        Darkening (0 to 1) at the dark end of a linear shadow across the image.
+    noise : float
+        Standard deviation of additive Gaussian noise in gray levels.
+    scale : float
+        Resolution factor applied last (below 1 for low-resolution captures).
+
+    Returns:
+    --------
+    numpy.ndarray
+        The degraded BGR image, with the page placed on a darker background.
+    """
+    height, width = page.shape[:2]
+    canvas_w, canvas_h = int(width * 1.3), int(height * 1.3)
+    backdrop = tuple(float(v) for v in rng.integers(30, 110, 3))
+    angle = float(rng.uniform(-skew, skew)) if skew else 0.0
+    center = (width / 2, height / 2)
+    transform = cv2.getRotationMatrix2D(center, angle, 1.0)
+    transform[:, 2] += ((canvas_w - width) / 2, (canvas_h - height) / 2)
+    image = cv2.warpAffine(page, transform, (canvas_w, canvas_h), borderValue=backdrop)
+    image = image.astype(np.float32)
+
+    if shadow:
+        direction = rng.uniform(0, 2 * np.pi)
+        ys, xs = np.mgrid[0:canvas_h, 0:canvas_w].astype(np.float32)
+        ramp = xs * np.cos(direction) / canvas_w + ys * np.sin(direction) / canvas_h
+        ramp = (ramp - ramp.min()) / max(float(np.ptp(ramp)), 1e-6)
+        image *= (1.0 - shadow * ramp)[..., None]
+    if blur:
+        image = cv2.GaussianBlur(image, (0, 0), blur)
+    if noise:
+        image += rng.normal(0, noise, image.shape).astype(np.float32)
+    image = np.clip(image, 0, 255).astype(np.uint8)
+    if scale != 1.0:
+        image = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    return image
+
+
+def generate_corpus(
+    output_folder,
+    count,
+    td1_fraction=0.0,
+    seed=0,
+    font_path=None,
+    blur=0.0,
+    skew=0.0,
+    shadow=0.0,
+    noise=0.0,
+    scale=1.0,
+    jpeg_quality=90,
+    rotations=(0,),
+):
+    """
+    Write count synthetic pages and their labels.json to output_folder; return the labels.
+
+    Each page is rotated clockwise by one of rotations (degrees, multiples of 90)
+    drawn at random.
+    """
+    rng = np.random.default_rng(seed)
+    os.makedirs(output_folder, exist_ok=True)
+    labels = {}
+    for serial in range(count):
+        document_format = "TD1" if rng.random() < td1_fraction else "TD3"
+        identity = random_identity(rng, serial)
+        lines = td1_lines(identity) if document_format == "TD1" else td3_lines(identity)
+        page = render_page(lines, document_format, rng, font_path)
+        image = distort(page, rng, blur, skew, shadow, noise, scale)
+        # Draw only when there is a choice, so older seeds give the same corpus
+        rotation = int(rng.choice(rotations)) if len(rotations) > 1 else int(rotations[0])
+        if rotation:
+            image = cv2.rotate(image, ROTATE_CODES[rotation])
+
+        image_file = f"page-{serial:05d}.jpg"
+        cv2.imwrite(
+            os.path.join(output_folder, image_file),
+            image,
+            [cv2.IMWRITE_JPEG_QUALITY, jpeg_quality],
+        )
+        labels[image_file] = {
+            "format": document_format,
+            "mrz": lines,
+            "rotation": rotation,
+            "record": expected_record(identity, lines),
+        }
+
+    with open(os.path.join(output_folder, LABELS_FILE), "w") as f:
+        json.dump(
+            {
+                "seed": seed,
+                "distortions": {
+                    "blur": blur,
+                    "skew": skew,
+                    "shadow": shadow,
+                    "noise": noise,
+                    "scale": scale,
+                    "rotations": list(rotations),
+                },
+                "images": labels,
+            },
+            f,
+            indent=4,
+        )
+    return labels
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Generate a labeled synthetic passport corpus.")
+    parser.add_argument("--output", required=True, help="Folder of the generated corpus.")
+    parser.add_argument("--count", type=int, default=100, help="Number of pages.")
+    parser.add_argument(
+        "--td1-fraction",
+        type=float,
+        default=0.0,
+        help="Share of TD1 ID cards, scored in the benchmark's by_format accuracy only.",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--font", default=None, help="TrueType font for the MRZ, e.g. OCR-B.")
+    parser.add_argument("--blur", type=float, default=0.0, help="Gaussian blur sigma in pixels.")
+    parser.add_argument("--skew", type=float, default=0.0, help="Maximum rotation in degrees.")
+    parser.add_argument("--shadow", type=float, default=0.0, help="Shadow strength, 0 to 1.")
+    parser.add_argument(
+        "--noise", type=float, default=0.0, help="Noise standard deviation in gray levels."
+    )
+    parser.add_argument("--scale", type=float, default=1.0, help="Resolution factor.")
+    parser.add_argument("--jpeg-quality", type=int, default=90)
+    parser.add_argument(
+        "--rotations",
+        type=int,
+        nargs="+",
+        choices=[0, 90, 180, 270],
+        default=[0],
+        help="Clockwise page rotations in degrees, one drawn at random per page.",
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    labels = generate_corpus(
+        args.output,
+        args.count,
+        td1_fraction=args.td1_fraction,
+        seed=args.seed,
+        font_path=args.font,
+        blur=args.blur,
+        skew=args.skew,
+        shadow=args.shadow,
+        noise=args.noise,
+        scale=args.scale,
+        jpeg_quality=args.jpeg_quality,
+        rotations=args.rotations,
+    )
+    print(f"{len(labels)} pages written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
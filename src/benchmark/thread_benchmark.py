@@ -0,0 +1,161 @@
+# src/benchmark/thread_benchmark.py
+
+"""
+Node throughput of several pipeline workers with and without a thread budget.
+
+For every worker count, that many worker processes split the labeled corpus
+of benchmark.synthetic and process it at the same time, once with every
+runtime left at its default (a thread pool per core in each worker) and once
+with the ThreadBudget of instrumentation.threads (an even share of the CPUs per
+worker). Models are loaded before the clock starts. Run from src/:
+
+    python -m benchmark.thread_benchmark --corpus ../benchmark_corpus --workers 1 2 4
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+from datetime import datetime
+from types import SimpleNamespace
+
+from benchmark.synthetic import LABELS_FILE
+from instrumentation.threads import ThreadBudget, available_cpus
+
+# Thread settings compared for every worker count
+MODES = ("default", "budget")
+
+
+def run_worker(corpus, image_files, threads, crop_mode, barrier, results):
+    """
+    Load the pipeline, wait for the other workers, then process image_files.
+
+    threads is the budget of this worker, or None to leave every runtime at its default.
+    """
+    if threads is not None:
+        # Applied before the models are imported, so the environment reaches them too
+        ThreadBudget(threads).apply()
+
+    from benchmark.pipeline_benchmark import build_processor
+    from instrumentation.tracing import NULL_TRACER
+
+    options = SimpleNamespace(
+        crop_mode=crop_mode,
+        skip_faces=False,
+        skip_documents=False,
+        low_memory=False,
+        detect_orientation=False,
+        detection_side=None,
+    )
+    with tempfile.TemporaryDirectory() as output_folder:
+        with contextlib.redirect_stdout(io.StringIO()):
+            processor = build_processor(options, output_folder, NULL_TRACER, threads)
+        barrier.wait()
+        started = time.perf_counter()
+        cpu_started = time.process_time()
+        with contextlib.redirect_stdout(io.StringIO()):
+            for image_file in image_files:
+                processor.process_image(image_file, corpus)
+            processor.image_writer.flush()
+        results.put(
+            {
+                "images": len(image_files),
+                "seconds": time.perf_counter() - started,
+                "cpu_seconds": time.process_time() - cpu_started,
+            }
+        )
+        processor.image_writer.close()
+        processor.data_manager.close()
+
+
+def run_setting(corpus, image_files, workers, threads, crop_mode):
+    """
+    Process the corpus with workers processes at once; return the node throughput.
+    """
+    # Fresh interpreters, so every worker sizes its pools from scratch
+    context = multiprocessing.get_context("spawn")
+    barrier = context.Barrier(workers)
+    results = context.Queue()
+    processes = [
+        context.Process(
+            target=run_worker,
+            args=(corpus, image_files[index::workers], threads, crop_mode, barrier, results),
+        )
+        for index in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    reports = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    # Workers start together, the slowest one sets the node's wall time
+    seconds = max(report["seconds"] for report in reports)
+    return {
+        "threads_per_worker": threads,
+        "throughput_images_per_s": len(image_files) / seconds,
+        "seconds": seconds,
+        "cpu_seconds": sum(report["cpu_seconds"] for report in reports),
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Benchmark several pipeline workers per node with and without a thread budget."
+    )
+    parser.add_argument("--corpus", required=True, help="Folder written by benchmark.synthetic.")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument(
+        "--threads-per-worker",
+        type=int,
+        default=None,
+        help="Budget of each worker instead of the even share of the CPUs.",
+    )
+    parser.add_argument("--crop-mode", choices=["yolo", "geometric"], default="yolo")
+    parser.add_argument("--limit", type=int, default=None, help="Process the first N images only.")
+    parser.add_argument("--output", default=None, help="Also write the report to this JSON file.")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    with open(os.path.join(args.corpus, LABELS_FILE), "r") as f:
+        image_files = list(json.load(f)["images"])[: args.limit]
+
+    cpus = available_cpus()
+    settings = []
+    for workers in args.workers:
+        budget = ThreadBudget.for_workers(workers, args.threads_per_worker, cpus)
+        for mode in MODES:
+            threads = budget.threads if mode == "budget" else None
+            print(f"{workers} worker(s), {mode} threads...")
+            result = run_setting(args.corpus, image_files, workers, threads, args.crop_mode)
+            result.update({"workers": workers, "mode": mode})
+            settings.append(result)
+            print(
+                f"{workers:>3} workers  {mode:<8}{result['throughput_images_per_s']:>10.2f} img/s"
+                f"{result['cpu_seconds']:>10.1f} s CPU"
+            )
+
+    report = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "corpus": os.path.abspath(args.corpus),
+        "images": len(image_files),
+        "cpus": cpus,
+        "settings": settings,
+    }
+    text = json.dumps(report, indent=4)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+        print(f"Report saved as: {args.output}")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
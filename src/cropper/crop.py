@@ -1,75 +1,160 @@
 # src/cropper/crop.py
 
-from ultralytics import YOLO
 import cv2
-import os
 import numpy as np
 
+from cropper.detections import (
+    DETECTION_CLASSES,
+    collect_boxes,
+    select_book_boxes,
+    select_bottom_person,
+)
+from instrumentation.metrics import NULL_METRICS, stage_latency
+from instrumentation.tracing import NULL_TRACER
+from quantization.manifest import accepted_model
+
+
+def contour_boxes_and_areas(contours):
+    """
+    Compute the bounding boxes and areas of many contours in one vectorized pass.
+
+    Parameters:
+    -----------
+    contours : sequence of numpy.ndarray
+        Contours as returned by cv2.findContours.
+
+    Returns:
+    --------
+    tuple
+        ((x, y, w, h), areas) where each element is an array with one value per
+        contour, matching cv2.boundingRect and cv2.contourArea.
+    """
+    lengths = np.array([len(contour) for contour in contours])
+    starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    points = np.concatenate(contours).reshape(-1, 2).astype(np.int64)
+    px, py = points[:, 0], points[:, 1]
+
+    x = np.minimum.reduceat(px, starts)
+    y = np.minimum.reduceat(py, starts)
+    w = np.maximum.reduceat(px, starts) - x + 1
+    h = np.maximum.reduceat(py, starts) - y + 1
+
+    # Shoelace formula, each contour closed back onto its first point
+    following = np.arange(1, len(points) + 1)
+    following[starts + lengths - 1] = starts
+    cross = px * py[following] - px[following] * py
+    areas = np.abs(np.add.reduceat(cross, starts)) / 2.0
+    return (x, y, w, h), areas
+
 
 class Cropper:
-    def __init__(self, model_path):
-        # Load the YOLO model
-        self.model = YOLO(model_path)
+    """
+    Finds the document page in a passport image using YOLO detections.
+
+    Nothing is written to disk: the crop methods return the crop as an array
+    (a view into the decoded image) and the crop_box methods return its
+    (x1, y1, x2, y2) coordinates, so callers decide whether and how to persist it
+    and several croppers can run in parallel.
+    """
+
+    def __init__(
+        self,
+        model_path,
+        contour_max_side=1024,
+        imgsz=640,
+        conf=0.25,
+        max_det=300,
+        batch_size=8,
+        int8_manifest=None,
+        tracer=None,
+        metrics=None,
+    ):
+        # Use the INT8 export when it passed the accuracy gate of quantization/quantize.py
+        if int8_manifest:
+            entry = accepted_model(int8_manifest, "yolo")
+            if entry is not None:
+                model_path = entry["path"]
+
+        # Load the YOLO model; ultralytics is only needed when a Cropper is created
+        from ultralytics import YOLO
+
+        self.model = YOLO(model_path, task="detect")
+        # Records a span per YOLO call and contour search, disabled by default
+        self.tracer = tracer or NULL_TRACER
+        # Records the YOLO and contour latencies and which crop method produced each box
+        metrics = metrics or NULL_METRICS
+        self._stage_latency = stage_latency(metrics)
+        self._crop_results = metrics.counter(
+            "mrz_crop_results_total", "Document crops, by the method that produced the box.",
+            ("method",),
+        )
+        # Longest side of the copy searched for page contours in v2 (None for full resolution)
+        self.contour_max_side = contour_max_side
+        # Inference settings: only the person and book classes are scored
+        self.imgsz = imgsz
+        self.conf = conf
+        self.max_det = max_det
+        self.batch_size = batch_size
+
+    def _load_image(self, image):
+        """
+        Return the decoded image for a path or an already decoded array.
+        """
+        if isinstance(image, str):
+            original_image = cv2.imread(image)
+            if original_image is None:
+                raise FileNotFoundError(image)
+            return original_image
+        return image
+
+    def _predict(self, source):
+        with self.tracer.span("yolo") as span:
+            results = self.model(
+                source,
+                classes=list(DETECTION_CLASSES),
+                imgsz=self.imgsz,
+                conf=self.conf,
+                max_det=self.max_det,
+                verbose=False,
+            )
+            span.set(images=len(results))
+        self._stage_latency.observe(span.duration, stage="yolo")
+        return results
+
+    def detect(self, image):
+        """
+        Run YOLO on a decoded image and return its results.
+        """
+        return self._predict(image)
+
+    def detect_batch(self, images):
+        """
+        Run YOLO on a list of decoded images, batch_size images per forward pass.
+        Returns one results list per image, each accepted by the crop_box methods.
+        """
+        results = []
+        for start in range(0, len(images), self.batch_size):
+            batch = list(images[start:start + self.batch_size])
+            results.extend([result] for result in self._predict(batch))
+        return results
 
-    def crop_image_v1(self, image_path, output_directory):
+    def crop_box_v1(self, image, results=None):
         """
         Original v1 cropping logic.
         This will be used as a fallback if v2 fails to crop an image.
+        Always returns a box: the whole image when no book is detected.
         """
+        original_image = self._load_image(image)
+
         # Perform inference
-        results = self.model(image_path)
-
-        # Load the original image for cropping
-        original_image = cv2.imread(image_path)
-
-        # Initialize variables for book boxes
-        smallest_book_box = None
-        smallest_area = float("inf")  # Start with a very large area
-        largest_book_box = None
-        largest_area = 0  # Start with zero for the largest area
-
-        # Iterate through results to find the smallest book bounding box including a person
-        for result in results:
-            boxes = result.boxes  # Access the detection boxes
-            if boxes is not None and len(boxes) > 0:
-                boxes_xyxy = boxes.xyxy.cpu().numpy()  # Convert to NumPy array
-                classes = boxes.cls.cpu().numpy()  # Get class indices
-
-                # Loop through boxes to find the smallest book that includes the person
-                for i in range(len(boxes_xyxy)):
-                    # Check if the current box is a book (ID 73)
-                    if classes[i] == 73:
-                        book_box = boxes_xyxy[i]
-                        book_x1, book_y1, book_x2, book_y2 = book_box
-
-                        # Calculate area of the book box
-                        area = (book_x2 - book_x1) * (book_y2 - book_y1)
-
-                        # Track the largest book box found
-                        if area > largest_area:
-                            largest_area = area
-                            largest_book_box = book_box
-
-                        # Check for any person (ID 0) boxes
-                        for j in range(len(boxes_xyxy)):
-                            if classes[j] == 0:  # Check if it's a person
-                                person_box = boxes_xyxy[j]
-                                person_x1, person_y1, person_x2, person_y2 = person_box
-
-                                # Check if the book box includes the person box
-                                if (
-                                    book_x1 <= person_x2
-                                    and book_x2 >= person_x1
-                                    and book_y1 <= person_y2
-                                    and book_y2 >= person_y1
-                                ):
-
-                                    # Check if this is the smallest area found
-                                    if area < smallest_area:
-                                        smallest_area = area
-                                        smallest_book_box = book_box
-
-        # Determine which box to save
+        if results is None:
+            results = self.detect(original_image)
+
+        # Smallest book overlapping a person, and the largest book as a fallback
+        boxes, classes = collect_boxes(results)
+        smallest_book_box, largest_book_box = select_book_boxes(boxes, classes)
+
+        # Determine which box to use
         if smallest_book_box is not None:
             # Include padding to the smallest book box to ensure it includes the person
             padding = 20  # Adjust padding as needed
@@ -78,113 +163,107 @@ class Cropper:
             y1 = max(int(y1) - padding, 0)
             x2 = min(int(x2) + padding, original_image.shape[1])
             y2 = min(int(y2) + padding, original_image.shape[0])
-
-            # Crop the bounding box from the original image
-            cropped_image = original_image[y1:y2, x1:x2]
-
-            # Save the cropped image in the specified output directory
-            result_cropped_path = os.path.join(output_directory, "result_cropped.jpg")
-            cv2.imwrite(result_cropped_path, cropped_image)
-            print(f"Cropped image saved as: {result_cropped_path}")
+            print("Smallest book including a person cropped.")
+            self._crop_results.inc(method="book_with_person")
+            return x1, y1, x2, y2
         elif largest_book_box is not None:
-            # If no valid book box was found, save the largest book box instead
+            # If no valid book box was found, use the largest book box instead
             x1, y1, x2, y2 = largest_book_box.astype(int)
-            # Crop the largest book box from the original image
-            cropped_image = original_image[y1:y2, x1:x2]
-
-            # Save the cropped image in the specified output directory
-            result_cropped_path = os.path.join(output_directory, "result_cropped.jpg")
-            cv2.imwrite(result_cropped_path, cropped_image)
-            print(
-                f"No valid book detected that includes a person. Largest book cropped and saved as: {result_cropped_path}"
-            )
+            print("No valid book detected that includes a person. Largest book cropped.")
+            self._crop_results.inc(method="largest_book")
+            return int(x1), int(y1), int(x2), int(y2)
         else:
-            # If no book boxes are present, save the original image
-            result_cropped_path = os.path.join(output_directory, "result_cropped.jpg")
-            cv2.imwrite(result_cropped_path, original_image)
-            print(
-                "No books detected in the image. Original image saved as cropped image."
-            )
+            # If no book boxes are present, use the original image
+            print("No books detected in the image. Original image used as cropped image.")
+            self._crop_results.inc(method="full_image")
+            return 0, 0, original_image.shape[1], original_image.shape[0]
 
-    def crop_image_v2(self, image_path, output_directory):
+    def crop_box_v2(self, image, results=None):
         """
         New v2 cropping logic.
+        Returns None when no page contour containing a person is found.
         """
-        # Perform inference
-        results = self.model(image_path)
-
-        # Load the original image for cropping
-        original_image = cv2.imread(image_path)
-
-        # Initialize variables for person detection
-        person_boxes = []
+        original_image = self._load_image(image)
 
-        # Detect persons
-        for result in results:
-            boxes = result.boxes  # Access the detection boxes
-            if boxes is not None and len(boxes) > 0:
-                boxes_xyxy = boxes.xyxy.cpu().numpy()  # Convert to NumPy array
-                classes = boxes.cls.cpu().numpy()  # Get class indices
+        # Perform inference
+        if results is None:
+            results = self.detect(original_image)
 
-                # Loop through boxes to find all persons (ID 0)
-                for i in range(len(boxes_xyxy)):
-                    if classes[i] == 0:  # Person detected
-                        person_boxes.append(boxes_xyxy[i])  # Store person bounding box
+        # Select the bottom-most person
+        boxes, classes = collect_boxes(results)
+        person_box = select_bottom_person(boxes, classes)
 
         # If no persons detected, print message and return
-        if len(person_boxes) == 0:
+        if person_box is None:
             print("No persons detected in the image. Skipping contour adjustment.")
-            return False
-
-        # Select the person with the lowest y2 coordinate (the bottom-most person)
-        person_boxes = sorted(
-            person_boxes, key=lambda box: box[3]
-        )  # Sort by the y2 coordinate (index 3)
-        person_box = person_boxes[-1]  # The last one will be the bottom-most
-
+            return None
+
+        with self.tracer.span("contours") as span:
+            box = self._contour_box(original_image, person_box)
+            if box is None:
+                span.set(outcome="not_found")
+        self._stage_latency.observe(span.duration, stage="contours")
+        if box is not None:
+            self._crop_results.inc(method="contour")
+        return box
+
+    def _contour_box(self, original_image, person_box):
+        """
+        Return the padded box of the smallest page contour containing the person box, or None.
+        """
         # Extract person box coordinates
         person_x1, person_y1, person_x2, person_y2 = map(int, person_box)
 
-        # Detect contours to find the smallest contour that contains the person
-        gray_image = cv2.cvtColor(original_image, cv2.COLOR_BGR2GRAY)
+        # Detect contours on a downscaled copy to find the smallest contour that contains the person
+        scale = 1.0
+        if self.contour_max_side:
+            scale = min(1.0, self.contour_max_side / max(original_image.shape[:2]))
+        search_image = original_image
+        if scale < 1.0:
+            search_image = cv2.resize(
+                original_image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA
+            )
+        gray_image = cv2.cvtColor(search_image, cv2.COLOR_BGR2GRAY)
         blurred_image = cv2.GaussianBlur(gray_image, (5, 5), 0)
         edged_image = cv2.Canny(blurred_image, 50, 150)
 
         # Find contours in the image
         contours, _ = cv2.findContours(
-            edged_image.copy(), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE
+            edged_image, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE
         )
 
         smallest_contour = None
-        smallest_area = float("inf")  # Initialize to infinity for finding the minimum
         padding = 10  # Reduced padding to minimize background
 
-        for contour in contours:
-            # Get the bounding box of the contour
-            x, y, w, h = cv2.boundingRect(contour)
-            aspect_ratio = float(w) / h if h != 0 else 0
-
-            # Check if the contour's bounding box contains the person box
-            if (
-                x <= person_x1
-                and (x + w) >= person_x2
-                and y <= person_y1
-                and (y + h) >= person_y2
-            ):
-                if (
-                    0.5 < aspect_ratio < 1.7
-                ):  # Aspect ratio check for a rectangular page
-                    # Calculate the area of the contour
-                    area = cv2.contourArea(contour)
-
-                    # Update the smallest contour if this one is smaller
-                    if area < smallest_area:
-                        smallest_area = area
-                        smallest_contour = (x, y, w, h)
+        if len(contours) > 0:
+            # Bounding boxes and areas of all contours at once, mapped back to full resolution
+            (x, y, w, h), areas = contour_boxes_and_areas(contours)
+            x1 = np.floor(x / scale).astype(int)
+            y1 = np.floor(y / scale).astype(int)
+            x2 = np.ceil((x + w) / scale).astype(int)
+            y2 = np.ceil((y + h) / scale).astype(int)
+            aspect_ratio = np.divide(w, h, out=np.zeros(len(w)), where=h != 0)
+
+            # Keep contours whose bounding box contains the person box and
+            # whose aspect ratio matches a rectangular page
+            candidates = (
+                (x1 <= person_x1)
+                & (x2 >= person_x2)
+                & (y1 <= person_y1)
+                & (y2 >= person_y2)
+                & (aspect_ratio > 0.5)
+                & (aspect_ratio < 1.7)
+            )
+            if candidates.any():
+                # Smallest contour area wins, the first one on ties
+                best = np.flatnonzero(candidates)[np.argmin(areas[candidates])]
+                smallest_contour = (
+                    x1[best], y1[best], x2[best] - x1[best], y2[best] - y1[best]
+                )
 
         if smallest_contour is not None:
             # Unpack the smallest contour's bounding box
-            x, y, w, h = smallest_contour
+            x, y, w, h = map(int, smallest_contour)
 
             # Expand the bounding box slightly to include more of the page, but avoid too much background
             x = max(0, x - padding)
@@ -192,26 +271,72 @@ class Cropper:
             w = min(original_image.shape[1], x + w + padding) - x
             h = min(original_image.shape[0], y + h + padding) - y
 
-            # Crop the bounding box from the original image
-            cropped_image = original_image[y : y + h, x : x + w]
-
-            # Save the cropped image in the specified output directory
-            result_cropped_path = os.path.join(output_directory, "result_cropped.jpg")
-            cv2.imwrite(result_cropped_path, cropped_image)
-            print(
-                f"Smallest contour containing the bottom-most person detected and cropped. Image saved as: {result_cropped_path}"
-            )
-            return True
+            print("Smallest contour containing the bottom-most person detected and cropped.")
+            return x, y, x + w, y + h
         else:
-            # If no contour contains the person, print a message and return False
-            print("No contour containing the person found. Saving original image.")
-            return False
+            # If no contour contains the person, print a message and return None
+            print("No contour containing the person found.")
+            return None
+
+    def crop_box(self, image, results=None):
+        """
+        Return the document box, trying v2 first and falling back to v1.
+        YOLO runs once and its results are shared by both.
+        """
+        original_image = self._load_image(image)
+        if results is None:
+            results = self.detect(original_image)
 
-    def crop_image(self, image_path, output_directory):
         # First, try to run v2 logic
-        v2_success = self.crop_image_v2(image_path, output_directory)
+        box = self.crop_box_v2(original_image, results)
 
-        # If v2 fails (returns False), fall back to v1 logic
-        if not v2_success:
+        # If v2 fails (returns None), fall back to v1 logic
+        if box is None:
             print("Falling back to v1 logic.")
-            self.crop_image_v1(image_path, output_directory)
+            box = self.crop_box_v1(original_image, results)
+        return box
+
+    def crop_boxes(self, images):
+        """
+        Return the document box of each decoded image, with batched inference.
+        """
+        return [
+            self.crop_box(image, results)
+            for image, results in zip(images, self.detect_batch(images))
+        ]
+
+    def crop_images(self, images):
+        """
+        Return the document crop of each decoded image as an array, with batched inference.
+        """
+        return [
+            image[y1:y2, x1:x2]
+            for image, (x1, y1, x2, y2) in zip(images, self.crop_boxes(images))
+        ]
+
+    def crop_image_v1(self, image):
+        """
+        Return the v1 crop of an image as an array.
+        """
+        original_image = self._load_image(image)
+        x1, y1, x2, y2 = self.crop_box_v1(original_image)
+        return original_image[y1:y2, x1:x2]
+
+    def crop_image_v2(self, image):
+        """
+        Return the v2 crop of an image as an array, or None if v2 finds no page.
+        """
+        original_image = self._load_image(image)
+        box = self.crop_box_v2(original_image)
+        if box is None:
+            return None
+        x1, y1, x2, y2 = box
+        return original_image[y1:y2, x1:x2]
+
+    def crop_image(self, image):
+        """
+        Return the document crop of an image as an array.
+        """
+        original_image = self._load_image(image)
+        x1, y1, x2, y2 = self.crop_box(original_image)
+        return original_image[y1:y2, x1:x2]
@@ -0,0 +1,118 @@
+# src/cropper/detections.py
+
+import numpy as np
+
+# COCO class ids used by the cropper
+PERSON_CLASS = 0
+BOOK_CLASS = 73
+# Classes YOLO is asked to score, all others are skipped
+DETECTION_CLASSES = (PERSON_CLASS, BOOK_CLASS)
+
+
+def collect_boxes(results):
+    """
+    Gather the detections of YOLO results for one image into plain arrays.
+
+    Parameters:
+    -----------
+    results : iterable
+        Results returned by the YOLO model for a single image.
+
+    Returns:
+    --------
+    tuple
+        (boxes, classes): an (n, 4) float array of x1, y1, x2, y2 boxes and an
+        (n,) array of class ids.
+    """
+    all_boxes = [np.empty((0, 4))]
+    all_classes = [np.empty(0)]
+    for result in results:
+        boxes = result.boxes  # Access the detection boxes
+        if boxes is not None and len(boxes) > 0:
+            all_boxes.append(boxes.xyxy.cpu().numpy())
+            all_classes.append(boxes.cls.cpu().numpy())
+    return np.concatenate(all_boxes), np.concatenate(all_classes)
+
+
+def box_areas(boxes):
+    """
+    Return the area of each x1, y1, x2, y2 box.
+    """
+    return (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+
+
+def box_iou(box_a, box_b):
+    """
+    Return the intersection over union of two x1, y1, x2, y2 boxes.
+    """
+    width = min(box_a[2], box_b[2]) - max(box_a[0], box_b[0])
+    height = min(box_a[3], box_b[3]) - max(box_a[1], box_b[1])
+    intersection = max(0, width) * max(0, height)
+    union = (
+        (box_a[2] - box_a[0]) * (box_a[3] - box_a[1])
+        + (box_b[2] - box_b[0]) * (box_b[3] - box_b[1])
+        - intersection
+    )
+    return intersection / union if union > 0 else 0.0
+
+
+def overlap_matrix(boxes_a, boxes_b):
+    """
+    Return a boolean matrix telling whether each box of boxes_a touches or
+    overlaps each box of boxes_b (edges touching count as overlap).
+    """
+    a = boxes_a[:, None, :]
+    b = boxes_b[None, :, :]
+    return (
+        (a[..., 0] <= b[..., 2])
+        & (a[..., 2] >= b[..., 0])
+        & (a[..., 1] <= b[..., 3])
+        & (a[..., 3] >= b[..., 1])
+    )
+
+
+def select_book_boxes(boxes, classes):
+    """
+    Select the book boxes used by the v1 crop.
+
+    Parameters:
+    -----------
+    boxes : numpy.ndarray
+        (n, 4) array of x1, y1, x2, y2 boxes.
+    classes : numpy.ndarray
+        (n,) array of class ids.
+
+    Returns:
+    --------
+    tuple
+        (smallest_book_box, largest_book_box): the smallest book overlapping a
+        person and the largest book with a positive area, each None when there
+        is no such box. Ties go to the earliest detection.
+    """
+    books = boxes[classes == BOOK_CLASS]
+    persons = boxes[classes == PERSON_CLASS]
+    if len(books) == 0:
+        return None, None
+
+    areas = box_areas(books)
+    largest = int(np.argmax(areas))
+    largest_book_box = books[largest] if areas[largest] > 0 else None
+
+    smallest_book_box = None
+    with_person = overlap_matrix(books, persons).any(axis=1)
+    if with_person.any():
+        candidates = np.flatnonzero(with_person)
+        smallest_book_box = books[candidates[np.argmin(areas[candidates])]]
+    return smallest_book_box, largest_book_box
+
+
+def select_bottom_person(boxes, classes):
+    """
+    Return the person box with the largest y2 (the bottom-most person), or None.
+
+    Ties go to the latest detection.
+    """
+    persons = boxes[classes == PERSON_CLASS]
+    if len(persons) == 0:
+        return None
+    return persons[len(persons) - 1 - int(np.argmax(persons[::-1, 3]))]
@@ -0,0 +1,215 @@
+# src/cropper/geometry.py
+
+import cv2
+import numpy as np
+
+from instrumentation.metrics import NULL_METRICS
+
+# ICAO 9303 TD3 (passport) data page, in millimetres
+PAGE_WIDTH_MM = 125.0
+PAGE_HEIGHT_MM = 88.0
+# 44 OCR-B characters at 2.54 mm pitch, centred on the page
+MRZ_WIDTH_MM = 44 * 2.54
+MRZ_LEFT_MM = (PAGE_WIDTH_MM - MRZ_WIDTH_MM) / 2
+# Distance from the bottom of the MRZ text block to the bottom edge of the page
+MRZ_BOTTOM_MARGIN_MM = 4.0
+# Accepted width / height of the segmented MRZ (two lines of 44 characters)
+MRZ_ASPECT_RANGE = (5.0, 20.0)
+# Accepted width of the detected face, the portrait zone is about 35 mm wide
+FACE_WIDTH_RANGE_MM = (8.0, 50.0)
+
+
+def _edge_length(a, b):
+    return float(np.linalg.norm(b - a))
+
+
+class GeometricCropper:
+    """
+    Derives the document page from the MRZ and face detections, without YOLO.
+
+    On a TD3 data page the MRZ spans a known width at a known distance from the
+    bottom edge, so its quadrilateral fixes the page scale, rotation and (when the
+    segmented MRZ is a trapezoid) perspective. The face must then sit in the
+    portrait zone (left half, above the MRZ) for the geometry to be trusted.
+    When it is not, the crop falls back to a YOLO Cropper; fallback may be a
+    Cropper, a callable returning one (so ultralytics is only loaded when first
+    needed) or None to skip the crop.
+
+    With perspective=True the page is warped to an upright 125:88 rectangle,
+    otherwise the crop is the axis-aligned box around it, like Cropper's.
+    """
+
+    # PassportProcessor passes the reader's MRZ and face geometry to crop_image
+    uses_geometry = True
+
+    def __init__(
+        self, fallback=None, perspective=False, padding_mm=2.0, image_margin=0.05, metrics=None
+    ):
+        self.fallback = fallback
+        self.perspective = perspective
+        self.padding_mm = padding_mm
+        # Fraction of the image size the page may extend beyond its borders
+        self.image_margin = image_margin
+        self._crop_results = (metrics or NULL_METRICS).counter(
+            "mrz_crop_results_total", "Document crops, by the method that produced the box.",
+            ("method",),
+        )
+
+    def _fallback_cropper(self):
+        if callable(self.fallback) and not hasattr(self.fallback, "crop_image"):
+            self.fallback = self.fallback()
+        return self.fallback
+
+    def page_homography(self, mrz_quad):
+        """
+        Return the homography from page millimetres to image pixels, or None if
+        the MRZ shape is not plausible.
+        """
+        tl, tr, br, bl = mrz_quad
+        width_px = (_edge_length(tl, tr) + _edge_length(bl, br)) / 2
+        height_px = (_edge_length(tl, bl) + _edge_length(tr, br)) / 2
+        aspect = width_px / height_px if height_px > 0 else 0
+        if not MRZ_ASPECT_RANGE[0] <= aspect <= MRZ_ASPECT_RANGE[1]:
+            print("MRZ shape does not match a TD3 page.")
+            return None
+
+        # The MRZ height is measured, its width and position are standard
+        mrz_height_mm = height_px * MRZ_WIDTH_MM / width_px
+        bottom = PAGE_HEIGHT_MM - MRZ_BOTTOM_MARGIN_MM
+        left, right = MRZ_LEFT_MM, MRZ_LEFT_MM + MRZ_WIDTH_MM
+        mrz_mm = np.array(
+            [
+                [left, bottom - mrz_height_mm],
+                [right, bottom - mrz_height_mm],
+                [right, bottom],
+                [left, bottom],
+            ],
+            dtype=np.float32,
+        )
+        return cv2.getPerspectiveTransform(mrz_mm, np.asarray(mrz_quad, dtype=np.float32))
+
+    def page_quad(self, image_shape, mrz_quad, face_box):
+        """
+        Return the page corners in image pixels (top-left, top-right, bottom-right,
+        bottom-left) and the homography, or (None, None) if the geometry is inconsistent.
+        """
+        if mrz_quad is None or face_box is None:
+            print("MRZ or face not found, page geometry unknown.")
+            return None, None
+        homography = self.page_homography(mrz_quad)
+        if homography is None:
+            return None, None
+
+        # The face must be in the portrait zone: left half of the page, above the MRZ
+        to_page = np.linalg.inv(homography)
+        face_corners = np.array(
+            [[[face_box[0], face_box[1]], [face_box[2], face_box[3]]]], dtype=np.float32
+        )
+        (fx1, fy1), (fx2, fy2) = cv2.perspectiveTransform(face_corners, to_page)[0]
+        face_x, face_y = (fx1 + fx2) / 2, (fy1 + fy2) / 2
+        mrz_top = cv2.perspectiveTransform(
+            np.asarray(mrz_quad, dtype=np.float32)[None], to_page
+        )[0][:, 1].min()
+        if not (
+            0 <= face_x <= PAGE_WIDTH_MM / 2
+            and 0 <= face_y <= mrz_top
+            and FACE_WIDTH_RANGE_MM[0] <= fx2 - fx1 <= FACE_WIDTH_RANGE_MM[1]
+        ):
+            print("Face is not in the portrait zone of a TD3 page.")
+            return None, None
+
+        pad = self.padding_mm
+        page_mm = np.array(
+            [
+                [
+                    [-pad, -pad],
+                    [PAGE_WIDTH_MM + pad, -pad],
+                    [PAGE_WIDTH_MM + pad, PAGE_HEIGHT_MM + pad],
+                    [-pad, PAGE_HEIGHT_MM + pad],
+                ]
+            ],
+            dtype=np.float32,
+        )
+        quad = cv2.perspectiveTransform(page_mm, homography)[0]
+
+        # The page has to be (almost) inside the image
+        height, width = image_shape[:2]
+        margin_x, margin_y = self.image_margin * width, self.image_margin * height
+        if (
+            quad[:, 0].min() < -margin_x
+            or quad[:, 0].max() > width + margin_x
+            or quad[:, 1].min() < -margin_y
+            or quad[:, 1].max() > height + margin_y
+        ):
+            print("Page derived from the MRZ extends beyond the image.")
+            return None, None
+        return quad, homography
+
+    def crop_box(self, image, geometry):
+        """
+        Return the axis-aligned (x1, y1, x2, y2) page box, or None if the geometry is inconsistent.
+        """
+        quad, _ = self.page_quad(
+            image.shape, geometry.get("mrz_quad"), geometry.get("face_box")
+        )
+        if quad is None:
+            return None
+        height, width = image.shape[:2]
+        x1 = max(int(np.floor(quad[:, 0].min())), 0)
+        y1 = max(int(np.floor(quad[:, 1].min())), 0)
+        x2 = min(int(np.ceil(quad[:, 0].max())), width)
+        y2 = min(int(np.ceil(quad[:, 1].max())), height)
+        return x1, y1, x2, y2
+
+    def warp_page(self, image, quad):
+        """
+        Return the page inside quad warped to an upright rectangle at the MRZ resolution.
+        """
+        tl, tr, br, bl = quad
+        width = int(round(max(_edge_length(tl, tr), _edge_length(bl, br))))
+        page_aspect = (PAGE_HEIGHT_MM + 2 * self.padding_mm) / (PAGE_WIDTH_MM + 2 * self.padding_mm)
+        height = int(round(width * page_aspect))
+        target = np.array(
+            [[0, 0], [width - 1, 0], [width - 1, height - 1], [0, height - 1]], dtype=np.float32
+        )
+        transform = cv2.getPerspectiveTransform(np.asarray(quad, dtype=np.float32), target)
+        return cv2.warpPerspective(
+            image,
+            transform,
+            (width, height),
+            flags=cv2.INTER_LINEAR,
+            borderMode=cv2.BORDER_REPLICATE,
+        )
+
+    def crop_image(self, image, geometry=None):
+        """
+        Return the document crop of a decoded image as an array.
+
+        geometry is the dict returned by MRZReader.predict(..., return_geometry=True).
+        Falls back to the YOLO cropper when the geometry is inconsistent; returns
+        None when there is no fallback.
+        """
+        geometry = geometry or {}
+        if self.perspective:
+            quad, _ = self.page_quad(
+                image.shape, geometry.get("mrz_quad"), geometry.get("face_box")
+            )
+            if quad is not None:
+                print("Document page derived from the MRZ and face, perspective corrected.")
+                self._crop_results.inc(method="geometric")
+                return self.warp_page(image, quad)
+        else:
+            box = self.crop_box(image, geometry)
+            if box is not None:
+                print("Document page derived from the MRZ and face.")
+                self._crop_results.inc(method="geometric")
+                x1, y1, x2, y2 = box
+                return image[y1:y2, x1:x2]
+
+        fallback = self._fallback_cropper()
+        if fallback is None:
+            print("No document crop: page geometry inconsistent and no fallback cropper.")
+            self._crop_results.inc(method="none")
+            return None
+        print("Falling back to the YOLO cropper.")
+        return fallback.crop_image(image)
@@ -4,37 +4,66 @@ import re
 from datetime import datetime
 import os
 
-def parse_mrz(mrz_lines):
+# Characters of a TD3 (passport) MRZ: two lines of 44
+TD3_MRZ_LENGTH = 88
+
+# Regular expression pattern based on the TD3 MRZ structure
+MRZ_PATTERN = re.compile(
+    r'P[<A-Z]'                                   # Document code ('P<' or 'PA' or 'P[A-Z]')
+    r'(?P<issuing_country>[A-Z]{3})'             # Issuing country
+    r'(?P<names>[A-Z<]+)'                        # Names (surname<<given names)
+    r'.*'                                        # Any characters in between
+    r'(?P<passport_number>[A-Z0-9<]{9})'         # Passport number
+    r'(?P<passport_number_cd>[0-9<])'            # Check digit (may be '<' if missing)
+    r'(?P<nationality>[A-Z]{3})'                 # Nationality
+    r'(?P<dob>[0-9<]{6})'                        # Date of birth (may contain '<')
+    r'(?P<dob_cd>[0-9<])'                        # Check digit
+    r'(?P<sex>[MF<])'                            # Sex
+    r'(?P<personal_number>[A-Z0-9<]{14})'        # Personal number
+    r'(?P<personal_number_cd>[0-9<])'            # Check digit
+    r'(?P<final_cd>[0-9<])'                      # Final check digit
+)
+
+def normalize_mrz_text(mrz_lines):
     """
-    Parses MRZ lines using regular expressions to extract passport information.
+    Joins MRZ lines into one upper-case string of letters, numbers and '<'.
     """
-    mrz_data = {}
-
     # Combine MRZ lines
     mrz_text = ''.join(mrz_lines).replace('\n', '').replace('\r', '')
     mrz_text = mrz_text.strip()
 
     # Transform any characters that are not letters, numbers, or '<' to '<'
-    mrz_text = re.sub(r'[^A-Z0-9<]', '<', mrz_text.upper())
-
-    # Regular expression patterns based on MRZ structure
-    pattern = (
-        r'P[<A-Z]'                                   # Document code ('P<' or 'PA' or 'P[A-Z]')
-        r'(?P<issuing_country>[A-Z]{3})'             # Issuing country
-        r'(?P<names>[A-Z<]+)'                        # Names (surname<<given names)
-        r'.*'                                        # Any characters in between
-        r'(?P<passport_number>[A-Z0-9<]{9})'         # Passport number
-        r'(?P<passport_number_cd>[0-9<])'            # Check digit (may be '<' if missing)
-        r'(?P<nationality>[A-Z]{3})'                 # Nationality
-        r'(?P<dob>[0-9<]{6})'                        # Date of birth (may contain '<')
-        r'(?P<dob_cd>[0-9<])'                        # Check digit
-        r'(?P<sex>[MF<])'                            # Sex
-        r'(?P<personal_number>[A-Z0-9<]{14})'        # Personal number
-        r'(?P<personal_number_cd>[0-9<])'            # Check digit
-        r'(?P<final_cd>[0-9<])'                      # Final check digit
-    )
-
-    match = re.search(pattern, mrz_text)
+    return re.sub(r'[^A-Z0-9<]', '<', mrz_text.upper())
+
+def matches_mrz_pattern(mrz_lines):
+    """
+    Returns whether the MRZ lines fully match the pattern, i.e. parse_mrz does not
+    fall back to handle_partial_mrz.
+    """
+    return MRZ_PATTERN.search(normalize_mrz_text(mrz_lines)) is not None
+
+def extract_td3(mrz_lines):
+    """
+    Returns the 88 TD3 characters of the MRZ lines, normalized like parse_mrz,
+    starting at the first document code that leaves room for them; None when
+    the read is too short.
+    """
+    text = normalize_mrz_text(mrz_lines)
+    start = text.find('P')
+    while start != -1 and len(text) - start >= TD3_MRZ_LENGTH:
+        if text[start + 1] == '<' or text[start + 1].isalpha():
+            return text[start:start + TD3_MRZ_LENGTH]
+        start = text.find('P', start + 1)
+    return None
+
+def parse_mrz(mrz_lines):
+    """
+    Parses MRZ lines using regular expressions to extract passport information.
+    """
+    mrz_data = {}
+    mrz_text = normalize_mrz_text(mrz_lines)
+
+    match = MRZ_PATTERN.search(mrz_text)
 
     if match:
         # Extract data from named groups
@@ -137,8 +166,9 @@ def convert_date(date_str):
     date_str = date_str.replace('<', '0')  # Replace missing digits with '0'
     try:
         date_obj = datetime.strptime(date_str, '%y%m%d')
-        current_year = datetime.now().year % 100
-        century = datetime.now().year - current_year
+        now_year = datetime.now().year
+        current_year = now_year % 100
+        century = now_year - current_year
         year = int(date_str[:2])
         if year > current_year:
             date_obj = date_obj.replace(year=century - 100 + year)
@@ -0,0 +1,124 @@
+# src/instrumentation/memory.py
+
+import ctypes
+import ctypes.util
+import gc
+import resource
+import sys
+import threading
+import tracemalloc
+
+MIB = 1024 * 1024
+
+_process = None
+_malloc_trim = None
+
+
+def peak_rss_mb():
+    """
+    Return the peak resident set size of this process in MiB.
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak / MIB if sys.platform == "darwin" else peak / 1024
+
+
+def current_rss_mb():
+    """
+    Return the current resident set size of this process in MiB.
+    """
+    global _process
+    if _process is None:
+        import psutil
+
+        _process = psutil.Process()
+    return _process.memory_info().rss / MIB
+
+
+def memory_footprint_mb(pid=None):
+    """
+    Return the RSS, USS and PSS of a process (this one by default) in MiB.
+
+    USS is the memory only this process maps, what it would free on exit; PSS
+    adds its share of the pages it shares with other processes, so the PSS of
+    all workers sums to their real footprint. PSS is only known on Linux (None
+    elsewhere). Reading them walks the process's page maps, so it is not for the
+    hot path.
+    """
+    import psutil
+
+    info = psutil.Process(pid).memory_full_info()
+    pss = getattr(info, "pss", None)
+    return {
+        "rss_mb": info.rss / MIB,
+        "uss_mb": info.uss / MIB,
+        "pss_mb": pss / MIB if pss is not None else None,
+    }
+
+
+def release_memory():
+    """
+    Collect garbage and hand freed heap pages back to the OS.
+
+    glibc keeps freed image buffers in its heap once its mmap threshold has grown,
+    so the RSS of a worker stays at its highest peak unless the heap is trimmed.
+    """
+    global _malloc_trim
+    gc.collect()
+    if _malloc_trim is None:
+        _malloc_trim = False
+        if sys.platform.startswith("linux"):
+            library = ctypes.util.find_library("c")
+            libc = ctypes.CDLL(library) if library else None
+            _malloc_trim = getattr(libc, "malloc_trim", False)
+    if _malloc_trim:
+        _malloc_trim(0)
+
+
+class MemoryProfiler:
+    """
+    Measures the memory allocated by each traced stage with tracemalloc.
+
+    NumPy reports its array buffers to tracemalloc, so the figures cover the
+    image arrays of OpenCV and NumPy (not the native buffers of TensorFlow or
+    torch, which show up in rss_mb only). Nested stages are handled by resetting
+    the tracemalloc peak on entry and passing it up to the enclosing stage on
+    exit. tracemalloc is process-wide: stages running concurrently on other
+    threads (e.g. the ImageWriter) are counted in the stage they overlap.
+    """
+    def __init__(self, frames=1):
+        self._started = not tracemalloc.is_tracing()
+        if self._started:
+            tracemalloc.start(frames)
+        self._local = threading.local()
+
+    def enter(self):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        current, peak = tracemalloc.get_traced_memory()
+        if stack:
+            stack[-1][1] = max(stack[-1][1], peak)
+        tracemalloc.reset_peak()
+        # [traced bytes at entry, highest traced bytes seen so far]
+        stack.append([current, current])
+
+    def exit(self):
+        """
+        Return the memory attributes of the stage that just finished.
+        """
+        stack = self._local.stack
+        start, running_peak = stack.pop()
+        current, peak = tracemalloc.get_traced_memory()
+        peak = max(running_peak, peak)
+        if stack:
+            stack[-1][1] = max(stack[-1][1], peak)
+        return {
+            "alloc_peak_mb": (peak - start) / MIB,
+            "alloc_net_mb": (current - start) / MIB,
+            "rss_mb": current_rss_mb(),
+        }
+
+    def close(self):
+        if self._started and tracemalloc.is_tracing():
+            tracemalloc.stop()
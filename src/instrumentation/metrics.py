@@ -0,0 +1,294 @@
+# src/instrumentation/metrics.py
+
+import bisect
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Upper bounds in seconds of the default latency histogram buckets
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs += [f'{name}="{_escape(value)}"' for name, value in extra]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    """
+    A named metric with one value per combination of label values.
+    """
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(labels.get(name, "") for name in self.labelnames)
+
+    def render(self):
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+        with self._lock:
+            values = dict(self._values)
+        for key, value in sorted(values.items()):
+            lines.append(
+                f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            )
+        return lines
+
+
+class Counter(_Metric):
+    """
+    Monotonically increasing count, e.g. images processed.
+    """
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    """
+    Value that goes up and down, e.g. a queue depth.
+
+    set_function() makes the gauge read a callable at scrape time, so queue
+    depths cost nothing on the hot path.
+    """
+    kind = "gauge"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._functions = {}
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set_function(self, function, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._functions[key] = function
+
+    def render(self):
+        with self._lock:
+            functions = dict(self._functions)
+        for key, function in functions.items():
+            value = function()
+            with self._lock:
+                self._values[key] = value
+        return super().render()
+
+
+class Histogram(_Metric):
+    """
+    Distribution of observed values over fixed buckets, e.g. stage latencies in seconds.
+    """
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Per-bucket counts (the last one is +Inf), sum
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][index] += 1
+            state[1] += value
+
+    def render(self):
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} histogram",
+        ]
+        with self._lock:
+            values = {key: (list(counts), total) for key, (counts, total) in self._values.items()}
+        for key, (counts, total) in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, [("le", _format_value(bound))])
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Holds the metrics of a worker and renders them in the Prometheus text format.
+
+    counter(), gauge() and histogram() return the existing metric of that name,
+    so every component can declare the metrics it records.
+    """
+    enabled = True
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+        self.server = None
+
+    def _get(self, cls, name, documentation, labelnames, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, documentation, labelnames, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {name} is already registered as a {metric.kind}")
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._get(Counter, name, documentation, labelnames)
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._get(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._get(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def render(self):
+        """
+        Return all metrics in the Prometheus text exposition format.
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port, host="127.0.0.1"):
+        """
+        Serve /metrics over HTTP from a daemon thread; return the server.
+        """
+        registry = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), MetricsHandler)
+        thread = threading.Thread(
+            target=self.server.serve_forever, name="metrics-server", daemon=True
+        )
+        thread.start()
+        print(f"Serving metrics on http://{host}:{self.server.server_address[1]}/metrics")
+        return self.server
+
+    def close(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+
+class _NullMetric:
+    def inc(self, amount=1, **labels):
+        pass
+
+    def dec(self, amount=1, **labels):
+        pass
+
+    def set(self, value, **labels):
+        pass
+
+    def set_function(self, function, **labels):
+        pass
+
+    def observe(self, value, **labels):
+        pass
+
+
+class NullMetricsRegistry:
+    """
+    Registry used when metrics are disabled: every metric ignores its updates.
+    """
+    enabled = False
+    _metric = _NullMetric()
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._metric
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._metric
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._metric
+
+    def render(self):
+        return ""
+
+    def close(self):
+        pass
+
+
+# Shared disabled registry, the default of every instrumented component
+NULL_METRICS = NullMetricsRegistry()
+
+
+def stage_latency(metrics):
+    """
+    Return the stage latency histogram shared by the pipeline components.
+    """
+    return metrics.histogram(
+        "mrz_stage_duration_seconds", "Duration of a pipeline stage in seconds.", ("stage",)
+    )
+
+
+def failures(metrics):
+    """
+    Return the failure counter shared by the pipeline components, labeled by reason.
+    """
+    return metrics.counter("mrz_failures_total", "Images that failed, by reason.", ("reason",))
+
+
+def queue_depth(metrics):
+    """
+    Return the queue depth gauge shared by the pipeline components, labeled by queue.
+    """
+    return metrics.gauge("mrz_queue_depth", "Items waiting in a pipeline queue.", ("queue",))
@@ -0,0 +1,92 @@
+# src/instrumentation/threads.py
+
+import os
+
+# Environment variables sizing the OpenMP and BLAS pools of libraries loaded later
+THREAD_ENV_VARS = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS")
+
+
+def available_cpus():
+    """
+    Return the number of CPUs this process may run on.
+    """
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+class ThreadBudget:
+    """
+    Thread counts of every runtime used by one worker.
+
+    TFLite, OpenCV (cv2.dnn, filters), EasyOCR's and ultralytics' torch and the
+    BLAS behind NumPy each size their pool to all cores by default, so several
+    workers on one node run many times more threads than cores. The stages of a
+    worker run one after the other, so each runtime gets the worker's whole
+    share: cv2.setNumThreads, torch intra-op threads, TFLite num_threads (passed
+    to MRZReader) and the OpenMP/BLAS pools all use the same count, and torch
+    inter-op parallelism is kept at a single thread since the models are
+    sequential graphs.
+    """
+    def __init__(self, threads, interop_threads=1):
+        self.threads = max(1, int(threads))
+        self.interop_threads = max(1, int(interop_threads))
+
+    @classmethod
+    def for_workers(cls, workers_per_node=1, threads_per_worker=None, cpus=None):
+        """
+        Return the budget of one of workers_per_node workers sharing the CPUs of a node.
+
+        threads_per_worker overrides the even split of the available CPUs.
+        """
+        if threads_per_worker is None:
+            cpus = cpus or available_cpus()
+            threads_per_worker = cpus // max(1, workers_per_node)
+        return cls(threads_per_worker)
+
+    def as_dict(self):
+        return {
+            "opencv": self.threads,
+            "torch_intra_op": self.threads,
+            "torch_inter_op": self.interop_threads,
+            "tflite": self.threads,
+            "blas": self.threads,
+        }
+
+    def __repr__(self):
+        return f"ThreadBudget(threads={self.threads}, interop_threads={self.interop_threads})"
+
+    def apply(self):
+        """
+        Size the thread pools of OpenCV, torch and the OpenMP/BLAS libraries.
+
+        TFLite interpreters take their count when they are created, see
+        MRZReader(num_threads=...). The environment variables only reach
+        libraries loaded afterwards and child processes; pools already loaded
+        are limited through threadpoolctl when it is installed.
+        """
+        for name in THREAD_ENV_VARS:
+            os.environ[name] = str(self.threads)
+
+        import cv2
+
+        cv2.setNumThreads(self.threads)
+
+        try:
+            import torch
+        except ImportError:
+            torch = None
+        if torch is not None:
+            torch.set_num_threads(self.threads)
+            try:
+                torch.set_num_interop_threads(self.interop_threads)
+            except RuntimeError:
+                # Only possible before torch ran any parallel work
+                print("torch inter-op threads already started, keeping their count.")
+
+        try:
+            from threadpoolctl import threadpool_limits
+        except ImportError:
+            return
+        threadpool_limits(limits=self.threads)
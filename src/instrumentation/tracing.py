@@ -0,0 +1,257 @@
+# src/instrumentation/tracing.py
+
+import json
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+from instrumentation.memory import MemoryProfiler
+
+# Percentiles reported by Tracer.summary()
+SUMMARY_PERCENTILES = (50, 95, 99)
+
+
+class JsonlSink:
+    """
+    Writes every finished span as one JSON object per line.
+    """
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self._file = open(file_path, "a")
+        self._lock = threading.Lock()
+
+    def emit(self, record):
+        line = json.dumps(record)
+        with self._lock:
+            self._file.write(line + "\n")
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+class MemorySink:
+    """
+    Keeps every finished span as a dict in self.records, for tests and notebooks.
+    """
+    def __init__(self):
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+    def close(self):
+        pass
+
+
+class TimedSpan:
+    """
+    Span of a disabled tracer: only measures its duration, which callers may
+    still use (e.g. for the columnar timings); attributes are ignored.
+    """
+    __slots__ = ("name", "start", "duration")
+
+    def __init__(self, name):
+        self.name = name
+        self.duration = None
+
+    def set(self, **attributes):
+        pass
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.duration = time.perf_counter() - self.start
+        return False
+
+
+class Span(TimedSpan):
+    """
+    A traced pipeline stage: its duration, attributes (image dimensions,
+    counts, ...) and outcome ('ok', 'error: <type>' or set by the stage).
+    """
+    __slots__ = ("tracer", "parent", "attributes", "outcome", "started_at")
+
+    def __init__(self, tracer, name, attributes):
+        super().__init__(name)
+        self.tracer = tracer
+        self.parent = None
+        self.attributes = attributes
+        self.outcome = "ok"
+
+    def set(self, outcome=None, **attributes):
+        """
+        Add attributes to the span; outcome replaces the default 'ok'.
+        """
+        if outcome is not None:
+            self.outcome = outcome
+        self.attributes.update(attributes)
+
+    def __enter__(self):
+        self.parent = self.tracer._enter(self)
+        self.started_at = time.time()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.duration = time.perf_counter() - self.start
+        if exc_type is not None:
+            self.outcome = f"error: {exc_type.__name__}"
+        self.tracer._exit(self)
+        return False
+
+
+class NullTracer:
+    """
+    Tracer used when tracing is disabled: spans only time themselves.
+    """
+    enabled = False
+
+    def span(self, name, **attributes):
+        return TimedSpan(name)
+
+    def summary(self):
+        return {}
+
+    def memory_summary(self):
+        return {}
+
+    def close(self):
+        pass
+
+
+# Shared disabled tracer, the default of every instrumented component
+NULL_TRACER = NullTracer()
+
+
+class Tracer:
+    """
+    Records a span for each pipeline stage and sends it to a sink.
+
+    Spans nest per thread, so each record names its parent stage. Durations are
+    also kept per stage name for summary(), which reports p50/p95/p99 at the end
+    of a run.
+
+    With profile_memory=True every record also gets the array memory the stage
+    allocated at its peak (alloc_peak_mb), the memory it left allocated
+    (alloc_net_mb) and the process RSS when it ended (rss_mb), see
+    instrumentation.memory.MemoryProfiler; memory_summary() reports them.
+    """
+    enabled = True
+
+    def __init__(self, sink, profile_memory=False):
+        self.sink = sink
+        self.memory_profiler = MemoryProfiler() if profile_memory else None
+        self._local = threading.local()
+        self._durations = {}
+        self._memory = {}
+        self._lock = threading.Lock()
+
+    def span(self, name, **attributes):
+        """
+        Return a context manager timing one stage; attributes are added to its record.
+        """
+        return Span(self, name, attributes)
+
+    def _enter(self, span):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        parent = stack[-1].name if stack else None
+        stack.append(span)
+        if self.memory_profiler is not None:
+            self.memory_profiler.enter()
+        return parent
+
+    def _exit(self, span):
+        self._local.stack.pop()
+        memory = None
+        if self.memory_profiler is not None:
+            memory = self.memory_profiler.exit()
+        with self._lock:
+            self._durations.setdefault(span.name, []).append(span.duration)
+            if memory is not None:
+                self._memory.setdefault(span.name, []).append(
+                    (memory["alloc_peak_mb"], memory["rss_mb"])
+                )
+        record = {
+            "name": span.name,
+            "parent": span.parent,
+            "start": datetime.fromtimestamp(span.started_at).isoformat(timespec="milliseconds"),
+            "duration_ms": span.duration * 1000,
+            "outcome": span.outcome,
+        }
+        record.update(span.attributes)
+        if memory is not None:
+            record.update(memory)
+        self.sink.emit(record)
+
+    def summary(self):
+        """
+        Return {stage: {"count", "mean_ms", "p50_ms", "p95_ms", "p99_ms"}} over all finished spans.
+        """
+        with self._lock:
+            durations = {name: list(values) for name, values in self._durations.items()}
+        summary = {}
+        for name, values in durations.items():
+            milliseconds = np.array(values) * 1000
+            stage = {"count": len(values), "mean_ms": float(milliseconds.mean())}
+            for percentile, value in zip(
+                SUMMARY_PERCENTILES, np.percentile(milliseconds, SUMMARY_PERCENTILES)
+            ):
+                stage[f"p{percentile}_ms"] = float(value)
+            summary[name] = stage
+        return summary
+
+    def memory_summary(self):
+        """
+        Return {stage: {"mean_alloc_peak_mb", "max_alloc_peak_mb", "max_rss_mb"}}, empty
+        unless memory is profiled.
+        """
+        with self._lock:
+            memory = {name: np.array(values) for name, values in self._memory.items()}
+        return {
+            name: {
+                "mean_alloc_peak_mb": float(values[:, 0].mean()),
+                "max_alloc_peak_mb": float(values[:, 0].max()),
+                "max_rss_mb": float(values[:, 1].max()),
+            }
+            for name, values in memory.items()
+        }
+
+    def close(self):
+        self.sink.close()
+        if self.memory_profiler is not None:
+            self.memory_profiler.close()
+
+
+def format_summary(summary):
+    """
+    Format a Tracer.summary() as a text table.
+    """
+    lines = [
+        f"{'stage':<24}{'count':>8}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+    ]
+    for name, stage in sorted(summary.items()):
+        lines.append(
+            f"{name:<24}{stage['count']:>8}{stage['mean_ms']:>10.1f}"
+            f"{stage['p50_ms']:>10.1f}{stage['p95_ms']:>10.1f}{stage['p99_ms']:>10.1f}"
+        )
+    return "\n".join(lines)
+
+
+def format_memory_summary(summary):
+    """
+    Format a Tracer.memory_summary() as a text table.
+    """
+    lines = [f"{'stage':<24}{'mean alloc MiB':>16}{'max alloc MiB':>16}{'max RSS MiB':>14}"]
+    for name, stage in sorted(summary.items()):
+        lines.append(
+            f"{name:<24}{stage['mean_alloc_peak_mb']:>16.1f}"
+            f"{stage['max_alloc_peak_mb']:>16.1f}{stage['max_rss_mb']:>14.1f}"
+        )
+    return "\n".join(lines)
@@ -1,45 +1,473 @@
 # src/main.py
 
+import argparse
+import multiprocessing
 import os
+from functools import partial
 from mrz_reader.reader import MRZReader
 from cropper.crop import Cropper
+from cropper.geometry import GeometricCropper
 from storage.data_manager import DataManager
+from storage.image_writer import ImageWriter, IMAGE_FORMATS
+from storage.columnar_sink import ColumnarSink, COLUMNAR_FORMATS
+from storage.record_store import DURABILITY_MODES
 from processing.passport_processor import PassportProcessor
+from processing.reparse import reparse_store
+from processing.quality import QUALITY_MODES, QualityGate
+from processing.pages import DOCUMENT_EXTENSIONS, IMAGE_EXTENSIONS
+from processing.workers import format_worker_reports, run_prefork
+from mrz_reader.stream import frames_from_video
+from quantization.manifest import MANIFEST_NAME
+from instrumentation.tracing import (
+    NULL_TRACER, JsonlSink, MemorySink, Tracer, format_memory_summary, format_summary
+)
+from instrumentation.memory import peak_rss_mb
+from instrumentation.metrics import NULL_METRICS, MetricsRegistry
+from instrumentation.threads import ThreadBudget
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Read passport MRZs from the images in inputs/.")
+    parser.add_argument(
+        "--reparse",
+        action="store_true",
+        help="Rebuild the stored records from their raw MRZ without processing any image.",
+    )
+    parser.add_argument(
+        "--export-json",
+        action="store_true",
+        help="Rewrite parsed_data.json from the record store at the end of the run.",
+    )
+    parser.add_argument(
+        "--commit-every",
+        type=int,
+        default=1,
+        help="Commit parsed records to the store every N records.",
+    )
+    parser.add_argument(
+        "--commit-interval-ms",
+        type=float,
+        default=None,
+        help="Also commit when this many milliseconds passed since the last commit.",
+    )
+    parser.add_argument(
+        "--durability",
+        choices=sorted(DURABILITY_MODES),
+        default="normal",
+        help="How hard each commit syncs to disk.",
+    )
+    parser.add_argument(
+        "--shards",
+        type=int,
+        default=1,
+        help="Split the record store over this many SQLite files by passport number.",
+    )
+    parser.add_argument(
+        "--max-hash-distance",
+        type=int,
+        default=-1,
+        help="Also match inputs within this perceptual hash distance (0-63 of 256 bits) of a processed one, confirmed by reading their MRZ; -1 (default) only skips identical files.",
+    )
+    parser.add_argument(
+        "--image-format",
+        choices=sorted(IMAGE_FORMATS),
+        default="jpeg",
+        help="Encoding of the saved face and document images.",
+    )
+    parser.add_argument(
+        "--image-quality",
+        type=int,
+        default=95,
+        help="JPEG/WebP quality of the saved images.",
+    )
+    parser.add_argument(
+        "--max-image-dimension",
+        type=int,
+        default=None,
+        help="Downscale saved images so that their longest side fits this size.",
+    )
+    parser.add_argument("--skip-faces", action="store_true", help="Do not save face images.")
+    parser.add_argument(
+        "--skip-documents",
+        action="store_true",
+        help="Do not crop and save document images.",
+    )
+    parser.add_argument(
+        "--columnar-format",
+        choices=sorted(COLUMNAR_FORMATS),
+        default=None,
+        help="Also write new records to outputs/columnar/ in this format (needs pyarrow).",
+    )
+    parser.add_argument(
+        "--yolo-imgsz",
+        type=int,
+        default=640,
+        help="Input size of the YOLO document detector.",
+    )
+    parser.add_argument(
+        "--yolo-conf",
+        type=float,
+        default=0.25,
+        help="Minimum confidence of YOLO person and book detections.",
+    )
+    parser.add_argument(
+        "--yolo-max-det",
+        type=int,
+        default=300,
+        help="Maximum number of YOLO detections per image.",
+    )
+    parser.add_argument(
+        "--crop-mode",
+        choices=["yolo", "geometric"],
+        default="yolo",
+        help="Find the document page with YOLO, or derive it from the MRZ and face (YOLO only as fallback).",
+    )
+    parser.add_argument(
+        "--perspective-correct",
+        action="store_true",
+        help="In geometric crop mode, warp the page to an upright rectangle.",
+    )
+    parser.add_argument(
+        "--no-crop-fallback",
+        action="store_true",
+        help="In geometric crop mode, never load YOLO; pages with inconsistent geometry are not cropped.",
+    )
+    parser.add_argument(
+        "--int8",
+        action="store_true",
+        help="Use the INT8 models of weights/int8/ that passed the accuracy gate of quantization/quantize.py.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Process the inputs with this many worker processes forked after the models are loaded, sharing them copy-on-write.",
+    )
+    parser.add_argument(
+        "--workers-per-node",
+        type=int,
+        default=1,
+        help="Pipeline workers sharing this machine; each gets an even share of the CPUs for OpenCV, torch and TFLite.",
+    )
+    parser.add_argument(
+        "--threads-per-worker",
+        type=int,
+        default=None,
+        help="Threads of every runtime in this worker, instead of the even share of the CPUs.",
+    )
+    parser.add_argument(
+        "--trace",
+        default=None,
+        help="Record a span per pipeline stage to this JSONL file and print a latency summary.",
+    )
+    parser.add_argument(
+        "--profile-memory",
+        action="store_true",
+        help="Record the array memory allocated by each pipeline stage and print a memory summary.",
+    )
+    parser.add_argument(
+        "--low-memory",
+        action="store_true",
+        help="Memory-budget mode: cap the input resolution, keep at most 2 images queued for writing and trim the heap after every image.",
+    )
+    parser.add_argument(
+        "--max-input-side",
+        type=int,
+        default=None,
+        help="Downscale inputs so that their longest side fits this size (2048 with --low-memory).",
+    )
+    parser.add_argument(
+        "--detection-side",
+        type=int,
+        default=None,
+        help="Run the models on a reduced decode at least this large (e.g. 1024) and decode the full resolution only to cut the MRZ, face and document.",
+    )
+    parser.add_argument(
+        "--max-pending-images",
+        type=int,
+        default=None,
+        help="Face and document images waiting to be written before processing blocks (8, or 2 with --low-memory).",
+    )
+    parser.add_argument(
+        "--quality-gate",
+        choices=QUALITY_MODES,
+        default=None,
+        help="Check sharpness, glare and contrast before inference and reject or flag failing images.",
+    )
+    parser.add_argument(
+        "--min-sharpness",
+        type=float,
+        default=40.0,
+        help="Quality gate: minimum variance of the Laplacian on a 512 px thumbnail.",
+    )
+    parser.add_argument(
+        "--max-glare",
+        type=float,
+        default=0.4,
+        help="Quality gate: maximum fraction of pixels clipped to white.",
+    )
+    parser.add_argument(
+        "--min-contrast",
+        type=int,
+        default=40,
+        help="Quality gate: minimum spread between the 1st and 99th intensity percentiles.",
+    )
+    parser.add_argument(
+        "--detect-orientation",
+        action="store_true",
+        help="Detect images rotated by 90, 180 or 270 degrees and turn them upright before reading.",
+    )
+    parser.add_argument(
+        "--pdf-dpi",
+        type=int,
+        default=200,
+        help="Resolution PDF pages are rasterized at.",
+    )
+    parser.add_argument(
+        "--stop-at-valid-page",
+        action="store_true",
+        help="Skip the remaining pages of a PDF or TIFF once a page has an MRZ with valid check digits.",
+    )
+    parser.add_argument(
+        "--video",
+        default=None,
+        help="Read the MRZ from this video file (or camera index) instead of the images in inputs/.",
+    )
+    parser.add_argument(
+        "--max-frames",
+        type=int,
+        default=None,
+        help="With --video, give up after this many frames.",
+    )
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        default=None,
+        help="Serve Prometheus metrics on http://127.0.0.1:PORT/metrics while running.",
+    )
+    args = parser.parse_args()
+    if args.workers > 1 and (
+        args.trace or args.profile_memory or args.metrics_port is not None or args.video
+    ):
+        parser.error(
+            "--workers cannot be combined with --trace, --profile-memory, --metrics-port or --video."
+        )
+    if args.workers > 1 and (args.commit_every > 1 or args.commit_interval_ms is not None):
+        # Workers share the store, so each commits its writes at once under a shared lock
+        parser.error("--workers cannot be combined with --commit-every or --commit-interval-ms.")
+    return args
 
 def main():
+    args = parse_args()
+
     # Define the project root directory (one level up from src/)
     project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    output_folder = os.path.join(project_root, 'outputs')
+
+    # Operational metrics, disabled unless a port is given
+    metrics = NULL_METRICS
+    if args.metrics_port is not None:
+        metrics = MetricsRegistry()
+        metrics.serve(args.metrics_port)
+
+    # Initialize DataManager
+    def open_data_manager(process_lock=None):
+        return DataManager(
+            output_folder,
+            commit_every=args.commit_every,
+            commit_interval_ms=args.commit_interval_ms,
+            durability=args.durability,
+            max_hash_distance=args.max_hash_distance,
+            shards=args.shards,
+            metrics=metrics,
+            process_lock=process_lock,
+        )
+
+    data_manager = open_data_manager()
+
+    # Reparse-only mode: re-run the formatter on the stored raw MRZ strings
+    if args.reparse:
+        for record_id, passport_number, changes in reparse_store(data_manager):
+            print(f"Record {record_id} ({passport_number}) changed: {changes}")
+        if args.export_json:
+            data_manager.export_parsed_data()
+        data_manager.close()
+        return
+
+    # Per-stage tracing, disabled unless a trace file is given or memory is profiled
+    tracer = NULL_TRACER
+    if args.trace or args.profile_memory:
+        sink = JsonlSink(args.trace) if args.trace else MemorySink()
+        tracer = Tracer(sink, profile_memory=args.profile_memory)
+
+    # One thread count for OpenCV, torch and TFLite, so workers do not oversubscribe the node
+    thread_budget = ThreadBudget.for_workers(
+        max(args.workers_per_node, args.workers), args.threads_per_worker
+    )
+    thread_budget.apply()
+    print(f"Thread budget: {thread_budget.as_dict()}")
 
     # Define the weights directory
     weights_dir = os.path.join(os.path.dirname(__file__), 'weights')
+    int8_manifest = os.path.join(weights_dir, 'int8', MANIFEST_NAME) if args.int8 else None
 
     # Initialize the MRZReader with updated paths
     reader = MRZReader(
         facedetection_protxt=os.path.join(weights_dir, "face_detector/deploy.prototxt"),
         facedetection_caffemodel=os.path.join(weights_dir, "face_detector/res10_300x300_ssd_iter_140000.caffemodel"),
         segmentation_model=os.path.join(weights_dir, "mrz_detector/mrz_seg.tflite"),
-        easy_ocr_params={"lang_list": ["en"], "gpu": False}
+        easy_ocr_params={"lang_list": ["en"], "gpu": False},
+        int8_manifest=int8_manifest,
+        num_threads=thread_budget.threads,
+        tracer=tracer,
+        metrics=metrics,
     )
 
     # Initialize the Cropper with the YOLO model path
-    cropper = Cropper(os.path.join(weights_dir, 'yolo/yolo11n.pt'))
+    def build_yolo_cropper():
+        return Cropper(
+            os.path.join(weights_dir, 'yolo/yolo11n.pt'),
+            imgsz=args.yolo_imgsz,
+            conf=args.yolo_conf,
+            max_det=args.yolo_max_det,
+            int8_manifest=int8_manifest,
+            tracer=tracer,
+            metrics=metrics,
+        )
+
+    if args.crop_mode == "geometric":
+        # YOLO is only loaded the first time the page geometry is inconsistent, except
+        # for forked workers, which share the models loaded before the fork
+        if args.no_crop_fallback:
+            fallback = None
+        elif args.workers > 1:
+            fallback = build_yolo_cropper()
+        else:
+            fallback = build_yolo_cropper
+        cropper = GeometricCropper(
+            fallback=fallback,
+            perspective=args.perspective_correct,
+            metrics=metrics,
+        )
+    else:
+        cropper = build_yolo_cropper()
 
     # Input and output directories
     input_folder = os.path.join(project_root, 'inputs')
-    output_folder = os.path.join(project_root, 'outputs')
-    os.makedirs(output_folder, exist_ok=True)
 
-    # Initialize DataManager
-    data_manager = DataManager(output_folder)
+    # Optional quality gate run before inference
+    quality_gate = None
+    if args.quality_gate:
+        quality_gate = QualityGate(
+            mode=args.quality_gate,
+            min_sharpness=args.min_sharpness,
+            max_glare=args.max_glare,
+            min_contrast=args.min_contrast,
+        )
+
+    def build_processor(data_manager, name_suffix=""):
+        # Initialize the background writer for face and document images
+        image_writer = ImageWriter(
+            image_format=args.image_format,
+            quality=args.image_quality,
+            max_dimension=args.max_image_dimension,
+            save_faces=not args.skip_faces,
+            save_documents=not args.skip_documents,
+            max_pending=args.max_pending_images or (2 if args.low_memory else 8),
+            tracer=tracer,
+            metrics=metrics,
+        )
+
+        # Optional columnar export of the new records for analytics
+        columnar_sink = None
+        if args.columnar_format:
+            columnar_sink = ColumnarSink(
+                os.path.join(output_folder, 'columnar'),
+                file_format=args.columnar_format,
+                name_suffix=name_suffix,
+            )
+
+        # Initialize PassportProcessor
+        return PassportProcessor(
+            reader, cropper, data_manager, weights_dir, image_writer, columnar_sink, tracer,
+            metrics=metrics,
+            max_input_side=args.max_input_side,
+            low_memory=args.low_memory,
+            quality_gate=quality_gate,
+            detect_orientation=args.detect_orientation,
+            detection_side=args.detection_side,
+        )
+
+    def close_processor(processor):
+        # Wait for the queued images and finish the columnar file
+        processor.image_writer.close()
+        if processor.columnar_sink is not None:
+            processor.columnar_sink.close()
+
+    def process_input(processor, input_file):
+        if input_file.lower().endswith(IMAGE_EXTENSIONS):
+            print(f"Processing image: {input_file}")
+            processor.process_image(input_file, input_folder)
+        elif input_file.lower().endswith(DOCUMENT_EXTENSIONS):
+            print(f"Processing document: {input_file}")
+            try:
+                processor.process_document(
+                    input_file,
+                    input_folder,
+                    dpi=args.pdf_dpi,
+                    stop_at_valid=args.stop_at_valid_page,
+                )
+            except Exception as e:
+                # A missing PDF library or an unreadable file only skips this document
+                print(f"Error processing document {input_file}: {e}")
+
+    if args.workers > 1:
+        # Pre-fork mode: the models loaded above are shared copy-on-write; every
+        # worker opens its own store connections, writer threads and columnar file,
+        # and writes to the store under a lock shared by all of them
+        data_manager.close()
+        store_lock = multiprocessing.get_context("fork").Lock()
+
+        def build_worker(index):
+            worker_data_manager = open_data_manager(store_lock)
+            processor = build_processor(worker_data_manager, name_suffix=f"-w{index}")
+
+            def close():
+                close_processor(processor)
+                worker_data_manager.close()
+
+            return partial(process_input, processor), close
 
-    # Initialize PassportProcessor
-    processor = PassportProcessor(reader, cropper, data_manager, weights_dir)
+        parent_memory, reports = run_prefork(
+            sorted(os.listdir(input_folder)), args.workers, build_worker
+        )
+        print(format_worker_reports(reports, parent_memory))
+        data_manager = open_data_manager()
+    else:
+        processor = build_processor(data_manager)
+        if args.video is not None:
+            # Stream mode: segmentation on sampled frames, OCR only on still and sharp ones
+            source = int(args.video) if args.video.isdigit() else args.video
+            print(f"Processing video: {args.video}")
+            processor.process_stream(frames_from_video(source, args.max_frames), args.video)
+        else:
+            # Loop through each image and multi-page document in the input folder
+            for input_file in os.listdir(input_folder):
+                process_input(processor, input_file)
+        close_processor(processor)
 
-    # Loop through each image in the input folder
-    for image_file in os.listdir(input_folder):
-        if image_file.lower().endswith(('.png', '.jpg', '.jpeg')):
-            print(f"Processing image: {image_file}")
-            processor.process_image(image_file, input_folder)
+    # The store is the source of truth; the JSON file is a full rewrite, only made on request
+    if args.export_json:
+        data_manager.export_parsed_data()
+    data_manager.close()
+    if tracer.enabled:
+        tracer.close()
+        if args.trace:
+            print(f"Trace saved as: {args.trace}")
+        print(format_summary(tracer.summary()))
+    if args.profile_memory:
+        print(format_memory_summary(tracer.memory_summary()))
+        print(f"Peak RSS: {peak_rss_mb():.1f} MiB")
+    metrics.close()
 
 if __name__ == "__main__":
     main()
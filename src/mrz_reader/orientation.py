@@ -0,0 +1,184 @@
+import cv2
+import numpy as np
+
+# Clockwise rotations of the page content that are detected, and the cv2.rotate
+# code turning each back upright
+ROTATIONS = (0, 90, 180, 270)
+_UPRIGHT_CODES = {
+    90: cv2.ROTATE_90_COUNTERCLOCKWISE,
+    180: cv2.ROTATE_180,
+    270: cv2.ROTATE_90_CLOCKWISE,
+}
+
+
+def rotate_upright(image, rotation):
+    """
+    Turns an image whose content is rotated clockwise by rotation degrees upright.
+
+    Parameters:
+    -----------
+    image : numpy.ndarray
+        The image array.
+    rotation : int
+        One of ROTATIONS, e.g. as returned by OrientationDetector.detect.
+
+    Returns:
+    --------
+    numpy.ndarray
+        The upright image (the image itself when rotation is 0).
+    """
+    if rotation == 0:
+        return image
+    return cv2.rotate(image, _UPRIGHT_CODES[rotation])
+
+
+def text_line_axis(gray_image, smear=9):
+    """
+    Guesses whether the text lines of a page run horizontally or vertically.
+
+    Smearing the ink along the text lines merges neighbouring glyphs, while
+    smearing it across the lines spreads it into the gaps between them, so the
+    smear across the lines covers more of the page. Unlike projection profiles,
+    this still works on a slightly skewed page.
+
+    Parameters:
+    -----------
+    gray_image : numpy.ndarray
+        Grayscale thumbnail of the page.
+    smear : int, optional
+        Length in pixels of the smearing kernels (default is 9).
+
+    Returns:
+    --------
+    float
+        Ratio of the vertically to the horizontally smeared ink area, above 1
+        for horizontal lines.
+    """
+    ink = cv2.adaptiveThreshold(
+        gray_image, 1, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY_INV, 15, 10
+    )
+    horizontal = cv2.dilate(ink, np.ones((1, smear), np.uint8))
+    vertical = cv2.dilate(ink, np.ones((smear, 1), np.uint8))
+    return float(cv2.countNonZero(vertical) / max(cv2.countNonZero(horizontal), 1))
+
+
+class OrientationDetector:
+    """
+    Finds by how much a scan or photo is rotated (0, 90, 180 or 270 degrees).
+
+    The segmentation network is run on a thumbnail turned upright for each
+    candidate rotation; an upright page gives a wide, horizontal MRZ mask in its
+    lower half. Candidates are tried most likely first, from the direction of
+    the text lines, and the first one passing these checks is returned, so an
+    upright page costs a single run of the network on a thumbnail. When no
+    candidate passes, the one with the best mask wins (0 without any mask).
+
+    Methods:
+    --------
+    detect(image)
+        Returns the rotation of the image content and the network runs it took.
+    """
+
+    def __init__(
+        self,
+        segmentation,
+        thumbnail_side=512,
+        threshold=0.35,
+        min_area=0.002,
+        min_aspect=3.0,
+    ):
+        """
+        Initializes the OrientationDetector.
+
+        Parameters:
+        -----------
+        segmentation : SegmentationNetwork
+            The MRZ segmentation network.
+        thumbnail_side : int, optional
+            Longest side of the thumbnail the rotations are tried on (default is 512).
+        threshold : float, optional
+            Mask probability threshold, as in SegmentationNetwork.locate (default is 0.35).
+        min_area : float, optional
+            Smallest MRZ mask area, as a fraction of the image, that is trusted
+            (default is 0.002).
+        min_aspect : float, optional
+            Smallest width to height ratio of a horizontal MRZ mask (default is 3).
+        """
+        self.segmentation = segmentation
+        self.thumbnail_side = thumbnail_side
+        self.threshold = threshold
+        self.min_area = min_area
+        self.min_aspect = min_aspect
+
+    def _thumbnail(self, image):
+        """
+        Returns a BGR copy of the image whose longest side is at most thumbnail_side.
+        """
+        # Skip pixels down to about twice the thumbnail size before averaging
+        step = max(1, max(image.shape[:2]) // (2 * self.thumbnail_side))
+        image = image[::step, ::step]
+        if image.ndim == 2:
+            image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+        scale = self.thumbnail_side / max(image.shape[:2])
+        if scale < 1:
+            image = cv2.resize(
+                image,
+                (max(1, round(image.shape[1] * scale)), max(1, round(image.shape[0] * scale))),
+                interpolation=cv2.INTER_AREA,
+            )
+        return np.ascontiguousarray(image[:, :, :3])
+
+    def _score(self, output_data):
+        """
+        Scores the MRZ mask of an upright candidate.
+
+        Returns:
+        --------
+        tuple
+            Whether the mask looks like the MRZ of an upright page, and a score
+            ranking the candidates (the mask area, favoring horizontal masks low
+            on the page).
+        """
+        mask = np.uint8(output_data[0, :, :, 0] > self.threshold)
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        if not contours:
+            return False, 0.0
+        contour = max(contours, key=cv2.contourArea)
+        x, y, w, h = cv2.boundingRect(contour)
+        area = cv2.contourArea(contour) / mask.size
+        center = (y + h / 2) / mask.shape[0]
+        horizontal = w >= self.min_aspect * h
+        plausible = horizontal and center >= 0.5 and area >= self.min_area
+        return plausible, area * (0.5 + center) * (1.0 if horizontal else 0.1)
+
+    def detect(self, image):
+        """
+        Returns the clockwise rotation of the image content.
+
+        Parameters:
+        -----------
+        image : numpy.ndarray
+            The BGR image.
+
+        Returns:
+        --------
+        tuple
+            The rotation (one of ROTATIONS, undone by rotate_upright) and the
+            number of segmentation runs it took.
+        """
+        thumbnail = self._thumbnail(image)
+        gray = cv2.cvtColor(thumbnail, cv2.COLOR_BGR2GRAY)
+        if text_line_axis(gray) >= 1.0:
+            candidates = (0, 180, 90, 270)
+        else:
+            candidates = (90, 270, 0, 180)
+
+        best, best_score = 0, 0.0
+        for runs, rotation in enumerate(candidates, start=1):
+            upright = rotate_upright(thumbnail, rotation)
+            plausible, score = self._score(self.segmentation.run(upright))
+            if plausible:
+                return rotation, runs
+            if score > best_score:
+                best, best_score = rotation, score
+        return best, len(candidates)
@@ -2,8 +2,13 @@ import cv2
 import numpy as np
 import easyocr
 
+from mrz_reader.orientation import OrientationDetector, rotate_upright
 from mrz_reader.segmentation import SegmentationNetwork, FaceDetection
+from mrz_reader.stream import StreamReader
 from mrz_reader.utils import *
+from instrumentation.metrics import NULL_METRICS, failures, stage_latency
+from instrumentation.tracing import NULL_TRACER
+from quantization.manifest import accepted_model
 
 
 def instantiate_from_config_easyocr(config, reload=False):
@@ -67,9 +72,15 @@ class MRZReader:
 
     Methods:
     --------
-    predict(image, do_facedetect=False, facedetect_coef=0.1, preprocess_config=None)
+    predict(image, do_facedetect=False, facedetect_coef=0.1, preprocess_config=None, return_geometry=False)
         Predicts MRZ text from the given image with optional face detection and preprocessing.
 
+    upright(image)
+        Turns an image rotated by 90, 180 or 270 degrees upright.
+
+    read_stream(frames, **stream_options)
+        Reads the MRZ from video frames, stopping once a read is confirmed.
+
     recognize_text(image, preprocess_config)
         Recognizes text from the preprocessed image using OCR.
 
@@ -98,6 +109,10 @@ class MRZReader:
         facedetection_protxt: str = "./weights/face_detector/deploy.prototxt",
         facedetection_caffemodel: str = "./weights/face_detector/res10_300x300_ssd_iter_140000.caffemodel",
         segmentation_model: str = "./weights/mrz_detector/mrz_seg.tflite",
+        int8_manifest: str = None,
+        num_threads: int = None,
+        tracer=None,
+        metrics=None,
     ):
         """
         Initializes the MRZReader with segmentation, face detection, and OCR models.
@@ -112,15 +127,49 @@ class MRZReader:
             Path to the face detection model's .caffemodel file.
         segmentation_model : str
             Path to the segmentation model file in .tflite format.
+        int8_manifest : str, optional
+            Path to the manifest written by quantization/quantize.py. The INT8
+            segmentation and face detection models it lists are used when they
+            passed the accuracy gate (default is None, float models only).
+        num_threads : int, optional
+            Threads of the TFLite segmentation interpreter, normally
+            instrumentation.threads.ThreadBudget.threads (default is None,
+            TFLite's default). OpenCV and torch are sized by ThreadBudget.apply.
+        tracer : instrumentation.tracing.Tracer, optional
+            Records a span per stage (segmentation, face detection, each
+            preprocessing step, OCR); disabled by default.
+        metrics : instrumentation.metrics.MetricsRegistry, optional
+            Records the segmentation, face detection and OCR latencies and the
+            images without a detected MRZ; disabled by default.
         """
-        self.segmentation = SegmentationNetwork(segmentation_model)
+        self.tracer = tracer or NULL_TRACER
+        metrics = metrics or NULL_METRICS
+        self._stage_latency = stage_latency(metrics)
+        self._failures = failures(metrics)
+        face_calibration = None
+        if int8_manifest:
+            segmentation_entry = accepted_model(int8_manifest, "segmentation")
+            if segmentation_entry is not None:
+                segmentation_model = segmentation_entry["path"]
+            face_entry = accepted_model(int8_manifest, "face_detection")
+            if face_entry is not None:
+                face_calibration = np.load(face_entry["calibration"])
+
+        self.segmentation = SegmentationNetwork(segmentation_model, num_threads)
         self.face_detection = FaceDetection(
-            facedetection_protxt, facedetection_caffemodel
+            facedetection_protxt, facedetection_caffemodel, face_calibration
         )
         self.ocr_reader = instantiate_from_config_easyocr(easy_ocr_params)
+        self.orientation = OrientationDetector(self.segmentation)
 
     def predict(
-        self, image, do_facedetect=False, facedetect_coef=0.1, preprocess_config=None
+        self,
+        image,
+        do_facedetect=False,
+        facedetect_coef=0.1,
+        preprocess_config=None,
+        return_geometry=False,
+        source=None,
     ):
         """
         Predicts MRZ text from the given image with optional face detection and preprocessing.
@@ -135,11 +184,23 @@ class MRZReader:
             Confidence coefficient for face detection (default is 0.1).
         preprocess_config : dict, optional
             Configuration dictionary for preprocessing steps (default is None).
+        return_geometry : bool, optional
+            Also return where the MRZ and the face are, for geometric document
+            cropping (default is False). Face detection then always runs.
+        source : numpy.ndarray or callable, optional
+            Full-resolution copy of image, or a function returning it that is only
+            called once something was found. The segmentation and face detection
+            models then run on image, a reduced copy with the same aspect ratio,
+            and the MRZ and face are cut from source, in whose coordinates the
+            geometry is returned (default is None, image is used for everything).
 
         Returns:
         --------
         tuple
             A tuple containing the recognized text, segmented image, and detected face (if any).
+            With return_geometry, a fourth element is a dict with the "mrz_quad"
+            (see segmentation.mrz_quad) and the "face_box" (startX, startY, endX, endY),
+            each None when not found.
         """
         if isinstance(image, str):
             img = cv2.imread(image, cv2.IMREAD_COLOR)
@@ -147,16 +208,99 @@ class MRZReader:
             img = image
 
         face = None
+        mrz_quad = face_box = None
         # Segmentation prediction
-        segmented_image = self.segmentation.predict(img)
-
-        # Optional face detection
-        if do_facedetect:
-            face, face_coef = self.face_detection.detect(img, facedetect_coef)
+        with self.tracer.span("segmentation") as span:
+            if return_geometry:
+                segmented_image, mrz_quad = self.segmentation.predict(
+                    img, return_quad=True, source=source
+                )
+            else:
+                segmented_image = self.segmentation.predict(img, source=source)
+            if segmented_image is None:
+                span.set(outcome="not_found")
+        self._stage_latency.observe(span.duration, stage="segmentation")
+        if segmented_image is None:
+            self._failures.inc(reason="segmentation_not_found")
+
+        # Optional face detection, always run when the geometry is requested
+        if do_facedetect or return_geometry:
+            with self.tracer.span("face_detection") as span:
+                face_box, face_coef = self.face_detection.detect_box(img, facedetect_coef)
+                if face_box is None:
+                    span.set(outcome="not_found")
+            self._stage_latency.observe(span.duration, stage="face_detection")
+            if face_box is not None:
+                face_source = img
+                if source is not None:
+                    # Map the box found on the reduced copy to the full resolution
+                    face_source = source() if callable(source) else source
+                    scale_x = face_source.shape[1] / img.shape[1]
+                    scale_y = face_source.shape[0] / img.shape[0]
+                    face_box = (
+                        int(face_box[0] * scale_x),
+                        int(face_box[1] * scale_y),
+                        int(np.ceil(face_box[2] * scale_x)),
+                        int(np.ceil(face_box[3] * scale_y)),
+                    )
+                if do_facedetect:
+                    (startX, startY, endX, endY) = face_box
+                    face = face_source[startY:endY, startX:endX].copy()
 
         # Text recognition
         text_results = self.recognize_text(segmented_image, preprocess_config or {})
-        return text_results, segmented_image, face
+        if not return_geometry:
+            return text_results, segmented_image, face
+        geometry = {"mrz_quad": mrz_quad, "face_box": face_box}
+        return text_results, segmented_image, face, geometry
+
+    def upright(self, image, rotation=None):
+        """
+        Turns an image rotated by 90, 180 or 270 degrees upright.
+
+        The rotation is found by mrz_reader.orientation.OrientationDetector from
+        the MRZ masks of a thumbnail, so it costs one to four segmentation runs
+        at thumbnail size and a single rotation of the full image.
+
+        Parameters:
+        -----------
+        image : numpy.ndarray
+            The BGR image.
+        rotation : int, optional
+            Apply this rotation instead of detecting it, e.g. to the full-resolution
+            copy of an image whose rotation was found on a reduced copy
+            (default is None).
+
+        Returns:
+        --------
+        tuple
+            The upright image (the image itself when it was not rotated), the
+            clockwise rotation of its content and the number of segmentation runs.
+        """
+        runs = 0
+        if rotation is None:
+            rotation, runs = self.orientation.detect(image)
+        return rotate_upright(image, rotation), rotation, runs
+
+    def read_stream(self, frames, **stream_options):
+        """
+        Reads the MRZ from video frames, stopping once a read is confirmed.
+
+        Parameters:
+        -----------
+        frames : iterable of numpy.ndarray
+            BGR frames, e.g. from mrz_reader.stream.frames_from_video.
+        **stream_options
+            Settings of mrz_reader.stream.StreamReader (sampling, tracking,
+            sharpness and voting thresholds).
+
+        Returns:
+        --------
+        dict
+            The result of StreamReader.read: the voted MRZ lines, whether they
+            were confirmed, the work done and the latency to the result.
+        """
+        return StreamReader(self, **stream_options).read(frames)
 
     def recognize_text(self, image, preprocess_config):
         """
@@ -183,7 +327,11 @@ class MRZReader:
         if preprocess_config.get("do_preprocess", False):
             img = self._preprocess_image(img, preprocess_config)
 
-        return self.ocr_reader.readtext(img)
+        with self.tracer.span("ocr") as span:
+            text_results = self.ocr_reader.readtext(img)
+            span.set(lines=len(text_results))
+        self._stage_latency.observe(span.duration, stage="ocr")
+        return text_results
 
     def _preprocess_image(self, img, preprocess_config):
         """
@@ -201,20 +349,27 @@ class MRZReader:
         numpy.ndarray
             The preprocessed image array.
         """
-        img = resize(img)
+        with self.tracer.span("preprocess.resize") as span:
+            img = resize(img)
+            span.set(height=img.shape[0], width=img.shape[1])
 
         if preprocess_config.get("skewness", False):
-            img = self._correct_skew(img)
+            with self.tracer.span("preprocess.skew"):
+                img = self._correct_skew(img)
 
         if preprocess_config.get("delete_shadow", False):
-            img = self._delete_shadow(img)
+            with self.tracer.span("preprocess.shadow"):
+                img = self._delete_shadow(img)
 
         if preprocess_config.get("clear_background", False):
-            img = self._clear_background(img)
+            with self.tracer.span("preprocess.background"):
+                img = self._clear_background(img)
 
         # Further image processing
-        img = self._apply_morphological_operations(img)
-        img = self._apply_threshold(img)
+        with self.tracer.span("preprocess.morphology"):
+            img = self._apply_morphological_operations(img)
+        with self.tracer.span("preprocess.threshold"):
+            img = self._apply_threshold(img)
 
         return img
 
@@ -7,6 +7,43 @@ import tensorflow as tf
 Interpreter = tf.lite.Interpreter
 
 
+def mrz_quad(contour):
+    """
+    Approximates an MRZ contour by a quadrilateral.
+
+    Parameters:
+    -----------
+    contour : numpy.ndarray
+        Contour of the segmented MRZ region.
+
+    Returns:
+    --------
+    numpy.ndarray
+        A (4, 2) float32 array of corners ordered top-left, top-right,
+        bottom-right, bottom-left. The polygon approximation is used when it has
+        four corners, so a perspective-distorted MRZ keeps its trapezoid shape;
+        otherwise the minimum-area rotated rectangle.
+    """
+    approx = cv2.approxPolyDP(contour, 0.02 * cv2.arcLength(contour, True), True)
+    if len(approx) == 4:
+        points = approx.reshape(4, 2).astype(np.float32)
+    else:
+        points = cv2.boxPoints(cv2.minAreaRect(contour)).astype(np.float32)
+
+    # Order the corners by their coordinate sums and differences
+    sums = points.sum(axis=1)
+    diffs = points[:, 1] - points[:, 0]
+    return np.array(
+        [
+            points[np.argmin(sums)],
+            points[np.argmin(diffs)],
+            points[np.argmax(sums)],
+            points[np.argmax(diffs)],
+        ],
+        dtype=np.float32,
+    )
+
+
 class SegmentationNetwork:
     """
     A class to perform segmentation using a TFLite model.
@@ -26,11 +63,15 @@ class SegmentationNetwork:
         Preprocesses the input image to the required format.
     output(output_data, image)
         Processes the model's output to extract the region of interest (ROI).
-    predict(image)
+    run(image)
+        Runs the segmentation model and returns its raw output.
+    locate(output_data, shape)
+        Finds the contour of the MRZ region in the model's output.
+    predict(image, return_quad=False)
         Runs the segmentation model on the input image and returns the ROI.
     """
 
-    def __init__(self, model_path):
+    def __init__(self, model_path, num_threads=None):
         """
         Initializes the SegmentationNetwork with the given TFLite model.
 
@@ -38,8 +79,10 @@ class SegmentationNetwork:
         -----------
         model_path : str
             Path to the TFLite model file.
+        num_threads : int, optional
+            Threads of the TFLite interpreter (default is None, TFLite's default).
         """
-        self.interpreter = Interpreter(model_path=model_path)
+        self.interpreter = Interpreter(model_path=model_path, num_threads=num_threads)
         self.interpreter.allocate_tensors()
         self.input_details = self.interpreter.get_input_details()
         self.output_details = self.interpreter.get_output_details()
@@ -69,27 +112,42 @@ class SegmentationNetwork:
         img = np.reshape(img, (1, 256, 256, 3))
         return img
 
-    def output(self, output_data, image):
+    def run(self, image):
         """
-        Processes the model's output to extract the region of interest (ROI).
+        Runs the segmentation model on the input image.
+
+        Parameters:
+        -----------
+        image : str or numpy.ndarray
+            Path to the image file or an image array.
+
+        Returns:
+        --------
+        numpy.ndarray
+            The model's output, accepted by locate and output.
+        """
+        image_array = self.process(image)
+        self.interpreter.set_tensor(self.input_details[0]["index"], image_array)
+        self.interpreter.invoke()
+        return self.interpreter.get_tensor(self.output_details[0]["index"])
+
+    def locate(self, output_data, shape):
+        """
+        Finds the MRZ region in the model's output.
 
         Parameters:
         -----------
         output_data : numpy.ndarray
             The output data from the segmentation model.
-        image : str or numpy.ndarray
-            Path to the original image file or an image array.
+        shape : tuple
+            Shape of the original image.
 
         Returns:
         --------
         numpy.ndarray or None
-            The extracted ROI or None if no valid ROI is found.
+            The contour of the largest segmented region in original image
+            coordinates, or None if nothing was segmented.
         """
-        if isinstance(image, str):
-            img = cv2.imread(image, cv2.IMREAD_COLOR)
-        else:
-            img = image
-        shape = img.shape
         kernel = np.ones((5, 5), dtype=np.float32)
         output_data = (output_data[0, :, :, 0] > 0.35) * 1
         output_data = np.uint8(output_data * 255)
@@ -103,12 +161,36 @@ class SegmentationNetwork:
         c_area = np.zeros([len(contours)])
         for j in range(len(contours)):
             c_area[j] = cv2.contourArea(contours[j])
-        cnts = contours[np.argmax(c_area)]
+        return contours[np.argmax(c_area)]
+
+    def output(self, output_data, image):
+        """
+        Processes the model's output to extract the region of interest (ROI).
+
+        Parameters:
+        -----------
+        output_data : numpy.ndarray
+            The output data from the segmentation model.
+        image : str or numpy.ndarray
+            Path to the original image file or an image array.
+
+        Returns:
+        --------
+        numpy.ndarray or None
+            The extracted ROI or None if no valid ROI is found.
+        """
+        if isinstance(image, str):
+            img = cv2.imread(image, cv2.IMREAD_COLOR)
+        else:
+            img = image
+        cnts = self.locate(output_data, img.shape)
+        if cnts is None:
+            return None
         x, y, w, h = cv2.boundingRect(cnts)
         roi = img[y : y + h, x : x + w].copy()
         return roi
 
-    def predict(self, image):
+    def predict(self, image, return_quad=False, source=None):
         """
         Runs the segmentation model on the input image and returns the ROI.
 
@@ -116,18 +198,43 @@ class SegmentationNetwork:
         -----------
         image : str or numpy.ndarray
             Path to the image file or an image array.
+        return_quad : bool, optional
+            Also return the MRZ quadrilateral (default is False).
+        source : numpy.ndarray or callable, optional
+            Full-resolution copy of image (or a function returning it, called
+            only when an MRZ is found). The model then runs on image, a reduced
+            copy, and the ROI is cut from source, in whose coordinates the quad
+            is returned (default is None, image is used for both).
 
         Returns:
         --------
-        numpy.ndarray or None
-            The extracted ROI or None if no valid ROI is found.
+        numpy.ndarray or None, or tuple
+            The extracted ROI or None if no valid ROI is found. With return_quad,
+            a tuple (roi, quad) where quad is the MRZ outline as returned by mrz_quad
+            (None when nothing was segmented).
         """
-        image_array = self.process(image)
-        self.interpreter.set_tensor(self.input_details[0]["index"], image_array)
-        self.interpreter.invoke()
-        output_data = self.interpreter.get_tensor(self.output_details[0]["index"])
-        output_data = self.output(output_data, image)
-        return output_data
+        output_data = self.run(image)
+        if not return_quad and source is None:
+            return self.output(output_data, image)
+
+        if isinstance(image, str):
+            image = cv2.imread(image, cv2.IMREAD_COLOR)
+        cnts = self.locate(output_data, image.shape)
+        if cnts is None:
+            return (None, None) if return_quad else None
+        if source is not None:
+            # Cut the MRZ from the full-resolution copy
+            source = source() if callable(source) else source
+            scale = np.array(
+                [source.shape[1] / image.shape[1], source.shape[0] / image.shape[0]]
+            )
+            cnts = np.round(cnts * scale).astype(np.int32)
+            image = source
+        x, y, w, h = cv2.boundingRect(cnts)
+        roi = image[y : y + h, x : x + w].copy()
+        if not return_quad:
+            return roi
+        return roi, mrz_quad(cnts)
 
 
 class FaceDetection:
@@ -141,11 +248,15 @@ class FaceDetection:
 
     Methods:
     --------
+    preprocess(img)
+        Converts an image array to the network's input blob.
+    detect_box(image, confidence_input)
+        Detects a face in the image and returns its bounding box.
     detect(image, confidence_input)
         Detects a face in the image and returns the region of interest (ROI).
     """
 
-    def __init__(self, prototxt_path, caffemodel_path):
+    def __init__(self, prototxt_path, caffemodel_path, calibration=None):
         """
         Initializes the FaceDetection with the given Caffe model files.
 
@@ -155,12 +266,38 @@ class FaceDetection:
             Path to the Caffe model's deploy.prototxt file.
         caffemodel_path : str
             Path to the Caffe model's .caffemodel file.
+        calibration : numpy.ndarray, optional
+            Input blobs (N x 3 x 300 x 300, see preprocess) to quantize the network
+            to INT8 with; the float network is used when None (default).
         """
         self.faceNet = cv2.dnn.readNet(prototxt_path, caffemodel_path)
+        if calibration is not None:
+            # OpenCV cannot save quantized networks, so they are quantized on load
+            self.faceNet = self.faceNet.quantize(
+                [blob[None] for blob in calibration], cv2.CV_32F, cv2.CV_32F
+            )
 
-    def detect(self, image, confidence_input):
+    def preprocess(self, img):
         """
-        Detects a face in the image and returns the region of interest (ROI).
+        Converts an image array to the network's input blob.
+
+        Parameters:
+        -----------
+        img : numpy.ndarray
+            The image array.
+
+        Returns:
+        --------
+        numpy.ndarray
+            A 1 x 3 x 300 x 300 input blob.
+        """
+        return cv2.dnn.blobFromImage(
+            cv2.resize(img, (300, 300)), 1.0, (300, 300), (104.0, 177.0, 123.0)
+        )
+
+    def detect_box(self, image, confidence_input):
+        """
+        Detects a face in the image and returns its bounding box.
 
         Parameters:
         -----------
@@ -172,7 +309,7 @@ class FaceDetection:
         Returns:
         --------
         tuple
-            A tuple containing the ROI (numpy.ndarray) and the confidence score (float).
+            A tuple containing the (startX, startY, endX, endY) box and the confidence score (float).
             Returns (None, None) if no face is detected with sufficient confidence.
         """
         if isinstance(image, str):
@@ -180,16 +317,40 @@ class FaceDetection:
         else:
             img = image
         (h, w) = img.shape[:2]
-        blob = cv2.dnn.blobFromImage(
-            cv2.resize(img, (300, 300)), 1.0, (300, 300), (104.0, 177.0, 123.0)
-        )
+        blob = self.preprocess(img)
         self.faceNet.setInput(blob)
         detections = self.faceNet.forward()
         for i in range(0, detections.shape[2]):
             confidence = detections[0, 0, i, 2]
             if confidence > confidence_input:
                 box = detections[0, 0, i, 3:7] * np.array([w, h, w, h])
-                (startX, startY, endX, endY) = box.astype("int")
-                roi = img[startY:endY, startX:endX].copy()
-                return roi, confidence
+                return tuple(box.astype("int")), confidence
         return None, None
+
+    def detect(self, image, confidence_input):
+        """
+        Detects a face in the image and returns the region of interest (ROI).
+
+        Parameters:
+        -----------
+        image : str or numpy.ndarray
+            Path to the image file or an image array.
+        confidence_input : float
+            The minimum confidence threshold for detecting a face.
+
+        Returns:
+        --------
+        tuple
+            A tuple containing the ROI (numpy.ndarray) and the confidence score (float).
+            Returns (None, None) if no face is detected with sufficient confidence.
+        """
+        if isinstance(image, str):
+            img = cv2.imread(image, cv2.IMREAD_COLOR)
+        else:
+            img = image
+        box, confidence = self.detect_box(img, confidence_input)
+        if box is None:
+            return None, None
+        (startX, startY, endX, endY) = box
+        roi = img[startY:endY, startX:endX].copy()
+        return roi, confidence
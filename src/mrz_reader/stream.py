@@ -0,0 +1,301 @@
+import time
+
+import cv2
+import numpy as np
+
+from formatter.bulk_mrz import TD3_LENGTH, TD3_LINE_LENGTH, is_valid_td3, load_mrz_array
+from formatter.format_mrz import extract_td3
+
+
+def frames_from_video(source, max_frames=None):
+    """
+    Yields the frames of a video file or camera.
+
+    Parameters:
+    -----------
+    source : str or int
+        Path of a video file, or the index of a camera.
+    max_frames : int, optional
+        Stop after this many frames (default is None, until the stream ends).
+
+    Yields:
+    -------
+    numpy.ndarray
+        The decoded BGR frames.
+    """
+    capture = cv2.VideoCapture(source)
+    if not capture.isOpened():
+        raise FileNotFoundError(f"Could not open video source: {source}")
+    try:
+        count = 0
+        while max_frames is None or count < max_frames:
+            ok, frame = capture.read()
+            if not ok:
+                break
+            count += 1
+            yield frame
+    finally:
+        capture.release()
+
+
+def sharpness(gray_image):
+    """
+    Returns the variance of the Laplacian of a grayscale image, higher when sharper.
+    """
+    return float(cv2.Laplacian(gray_image, cv2.CV_64F).var())
+
+
+def vote(reads):
+    """
+    Combines several reads of the same MRZ character by character.
+
+    Parameters:
+    -----------
+    reads : list of str
+        TD3 MRZs of 88 characters, as returned by extract_td3.
+
+    Returns:
+    --------
+    tuple
+        The voted MRZ string and, per character position, how many reads agree
+        with the voted character (an (88,) int array).
+    """
+    characters = load_mrz_array(reads)
+    positions = np.broadcast_to(np.arange(TD3_LENGTH), characters.shape)
+    counts = np.zeros((TD3_LENGTH, 256), dtype=np.int32)
+    np.add.at(counts, (positions, characters), 1)
+    voted = counts.argmax(axis=1)
+    return bytes(voted.astype(np.uint8)).decode("ascii"), counts.max(axis=1)
+
+
+class StreamReader:
+    """
+    Reads an MRZ from a video stream, running the expensive models on few frames.
+
+    Segmentation runs on every sample_every-th frame until the MRZ is found,
+    then the MRZ box is followed from frame to frame by template matching on a
+    downscaled search window, and segmented again every resegment_every frames.
+    OCR only runs on the tracked MRZ when it has moved less than stable_motion
+    (a fraction of its width) for stable_frames frames and its Laplacian
+    variance is at least min_sharpness, at most once every ocr_interval frames.
+    The TD3 reads are voted character by character and the stream stops as soon
+    as the voted MRZ passes all check digits with at least min_votes reads
+    agreeing on every character.
+
+    Attributes:
+    -----------
+    reader : MRZReader
+        Reader whose segmentation network and recognize_text are used.
+
+    Methods:
+    --------
+    read(frames)
+        Consumes frames until an MRZ is confirmed or the frames run out.
+    """
+
+    def __init__(
+        self,
+        reader,
+        sample_every=3,
+        resegment_every=30,
+        stable_frames=3,
+        stable_motion=0.01,
+        min_sharpness=100.0,
+        ocr_interval=5,
+        min_votes=2,
+        min_track_score=0.6,
+        track_width=200,
+        preprocess_config=None,
+    ):
+        """
+        Initializes the StreamReader.
+
+        Parameters:
+        -----------
+        reader : MRZReader
+            The reader providing segmentation and OCR.
+        sample_every : int, optional
+            Segment every n-th frame while the MRZ is not tracked (default is 3).
+        resegment_every : int, optional
+            Segment again after this many tracked frames (default is 30).
+        stable_frames : int, optional
+            Consecutive stable frames required before OCR (default is 3).
+        stable_motion : float, optional
+            Largest motion between frames, as a fraction of the MRZ width, that
+            still counts as stable (default is 0.01).
+        min_sharpness : float, optional
+            Smallest Laplacian variance of the MRZ for OCR (default is 100).
+        ocr_interval : int, optional
+            Frames between two OCR runs (default is 5).
+        min_votes : int, optional
+            Reads that must agree on every character to confirm (default is 2).
+        min_track_score : float, optional
+            Smallest normalized correlation accepted by the tracker (default is 0.6).
+        track_width : int, optional
+            Width in pixels the MRZ is scaled to for tracking (default is 200).
+        preprocess_config : dict, optional
+            Passed to recognize_text (default is the full preprocessing of
+            PassportProcessor).
+        """
+        self.reader = reader
+        self.sample_every = sample_every
+        self.resegment_every = resegment_every
+        self.stable_frames = stable_frames
+        self.stable_motion = stable_motion
+        self.min_sharpness = min_sharpness
+        self.ocr_interval = ocr_interval
+        self.min_votes = min_votes
+        self.min_track_score = min_track_score
+        self.track_width = track_width
+        self.preprocess_config = preprocess_config or {
+            "do_preprocess": True,
+            "skewness": True,
+            "delete_shadow": True,
+            "clear_background": True,
+        }
+
+    def _segment(self, frame):
+        """
+        Returns the MRZ box (x, y, w, h) found by the segmentation network, or None.
+        """
+        segmentation = self.reader.segmentation
+        with self.reader.tracer.span("segmentation") as span:
+            contour = segmentation.locate(segmentation.run(frame), frame.shape)
+            if contour is None:
+                span.set(outcome="not_found")
+                return None
+        x, y, w, h = cv2.boundingRect(contour)
+        if w < 2 or h < 2:
+            return None
+        return x, y, w, h
+
+    def _template(self, gray, box):
+        """
+        Returns the downscaled MRZ patch used to track it, and its scale.
+        """
+        x, y, w, h = box
+        scale = min(1.0, self.track_width / w)
+        patch = gray[y:y + h, x:x + w]
+        template = cv2.resize(
+            patch,
+            (max(1, round(w * scale)), max(1, round(h * scale))),
+            interpolation=cv2.INTER_AREA,
+        )
+        return template, scale
+
+    def _track(self, gray, box, template, scale):
+        """
+        Returns the box of the template in a window around its previous box, or None.
+        """
+        x, y, w, h = box
+        margin = int(max(0.1 * w, 0.5 * h))
+        x0, y0 = max(0, x - margin), max(0, y - margin)
+        x1 = min(gray.shape[1], x + w + margin)
+        y1 = min(gray.shape[0], y + h + margin)
+        window = cv2.resize(
+            gray[y0:y1, x0:x1],
+            (max(1, round((x1 - x0) * scale)), max(1, round((y1 - y0) * scale))),
+            interpolation=cv2.INTER_AREA,
+        )
+        if window.shape[0] < template.shape[0] or window.shape[1] < template.shape[1]:
+            return None
+        scores = cv2.matchTemplate(window, template, cv2.TM_CCOEFF_NORMED)
+        _, score, _, location = cv2.minMaxLoc(scores)
+        if score < self.min_track_score:
+            return None
+        new_x = min(x0 + round(location[0] / scale), gray.shape[1] - w)
+        new_y = min(y0 + round(location[1] / scale), gray.shape[0] - h)
+        return max(0, new_x), max(0, new_y), w, h
+
+    def read(self, frames):
+        """
+        Consumes frames until an MRZ is confirmed or the frames run out.
+
+        Parameters:
+        -----------
+        frames : iterable of numpy.ndarray
+            BGR frames, e.g. from frames_from_video.
+
+        Returns:
+        --------
+        dict
+            "mrz_lines": the two voted TD3 lines (None when nothing was read),
+            "confirmed": whether they passed the check digits with enough votes,
+            "frames", "segmentations", "ocr_runs", "reads": work done,
+            "latency_ms": wall time from the first frame to the result,
+            "cpu_ms": process CPU time spent in the same interval.
+        """
+        started = time.perf_counter()
+        cpu_started = time.process_time()
+        box = template = None
+        scale = 1.0
+        tracked_frames = stable = 0
+        last_ocr = None
+        reads = []
+        result = {
+            "mrz_lines": None,
+            "confirmed": False,
+            "frames": 0,
+            "segmentations": 0,
+            "ocr_runs": 0,
+            "reads": 0,
+        }
+
+        for index, frame in enumerate(frames):
+            result["frames"] = index + 1
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+
+            # Follow the MRZ found on an earlier frame
+            previous = box
+            if box is not None:
+                with self.reader.tracer.span("track") as span:
+                    box = self._track(gray, box, template, scale)
+                    if box is None:
+                        span.set(outcome="lost")
+                tracked_frames += 1
+
+            # Find it again when lost, and refresh the template now and then
+            if (box is None and index % self.sample_every == 0) or (
+                box is not None and tracked_frames >= self.resegment_every
+            ):
+                result["segmentations"] += 1
+                segmented = self._segment(frame)
+                if segmented is not None:
+                    box = segmented
+                    template, scale = self._template(gray, box)
+                tracked_frames = 0
+            if box is None:
+                stable = 0
+                continue
+
+            # Only read a still and sharp MRZ
+            x, y, w, h = box
+            if previous is not None:
+                motion = max(abs(x - previous[0]), abs(y - previous[1]))
+                stable = stable + 1 if motion <= self.stable_motion * w else 0
+            if stable < self.stable_frames:
+                continue
+            if last_ocr is not None and index - last_ocr < self.ocr_interval:
+                continue
+            roi = frame[y:y + h, x:x + w]
+            if sharpness(gray[y:y + h, x:x + w]) < self.min_sharpness:
+                continue
+
+            last_ocr = index
+            result["ocr_runs"] += 1
+            text_results = self.reader.recognize_text(roi, self.preprocess_config)
+            mrz = extract_td3([text for _, text, _ in text_results])
+            if mrz is None:
+                continue
+            reads.append(mrz)
+            result["reads"] = len(reads)
+
+            voted, agreement = vote(reads)
+            result["mrz_lines"] = [voted[:TD3_LINE_LENGTH], voted[TD3_LINE_LENGTH:]]
+            if agreement.min() >= self.min_votes and is_valid_td3(voted):
+                result["confirmed"] = True
+                break
+
+        result["latency_ms"] = (time.perf_counter() - started) * 1000
+        result["cpu_ms"] = (time.process_time() - cpu_started) * 1000
+        return result
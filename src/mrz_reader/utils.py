@@ -23,7 +23,6 @@ def delete_shadow(img: np.ndarray) -> np.ndarray:
     """
     rgb_planes = cv2.split(img)
 
-    result_planes = []
     result_norm_planes = []
     for plane in rgb_planes:
         dilated_img = cv2.dilate(plane, np.ones((7, 7), np.uint8))
@@ -37,7 +36,6 @@ def delete_shadow(img: np.ndarray) -> np.ndarray:
             norm_type=cv2.NORM_MINMAX,
             dtype=cv2.CV_8UC1,
         )
-        result_planes.append(diff_img)
         result_norm_planes.append(norm_img)
 
     result_norm = cv2.merge(result_norm_planes)
@@ -78,8 +76,8 @@ def clear_background(img: np.ndarray) -> np.ndarray:
     mask = (2 * (mask.astype(np.float32)) - 255.0).clip(0, 255).astype(np.uint8)
 
     # Put mask into alpha channel
-    result = img.copy()
-    result = cv2.cvtColor(result, cv2.COLOR_BGR2BGRA)
+    # cvtColor allocates the BGRA result, no copy of the input is needed
+    result = cv2.cvtColor(img, cv2.COLOR_BGR2BGRA)
     result[:, :, 3] = mask
     return result
 
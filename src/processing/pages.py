@@ -0,0 +1,89 @@
+# src/processing/pages.py
+
+import os
+
+import cv2
+import numpy as np
+
+# Single images are decoded by PassportProcessor.process_image
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+# Documents whose pages are streamed one at a time by iter_pages
+DOCUMENT_EXTENSIONS = ('.pdf', '.tif', '.tiff')
+# PDF points per inch
+PDF_POINTS_PER_INCH = 72
+
+
+def load_images(input_folder):
+    """
+    Decode every image of a folder, in name order.
+    """
+    images = []
+    for image_file in sorted(os.listdir(input_folder)):
+        if image_file.lower().endswith(IMAGE_EXTENSIONS):
+            image = cv2.imread(os.path.join(input_folder, image_file))
+            if image is not None:
+                images.append(image)
+    return images
+
+
+def iter_tiff_pages(path):
+    """
+    Yield (page number, BGR array) for every page of a TIFF, decoding one page at a time.
+    """
+    from PIL import Image, ImageSequence
+
+    with Image.open(path) as tiff:
+        for page_number, frame in enumerate(ImageSequence.Iterator(tiff), start=1):
+            page = np.asarray(frame.convert('RGB'))
+            yield page_number, cv2.cvtColor(page, cv2.COLOR_RGB2BGR)
+
+
+def iter_pdf_pages(path, dpi=200):
+    """
+    Yield (page number, BGR array) for every page of a PDF, rasterizing one page at a time.
+
+    Uses pypdfium2, or PyMuPDF (fitz) when pypdfium2 is not installed.
+    """
+    try:
+        import pypdfium2 as pdfium
+    except ImportError:
+        pdfium = None
+
+    if pdfium is not None:
+        document = pdfium.PdfDocument(path)
+        try:
+            for index in range(len(document)):
+                page = document[index]
+                bitmap = page.render(scale=dpi / PDF_POINTS_PER_INCH)
+                image = np.asarray(bitmap.to_pil().convert('RGB'))
+                bitmap.close()
+                page.close()
+                yield index + 1, cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
+        finally:
+            document.close()
+        return
+
+    try:
+        import fitz
+    except ImportError:
+        raise ImportError("Reading PDF files needs pypdfium2 or PyMuPDF (fitz)") from None
+
+    with fitz.open(path) as document:
+        for index, page in enumerate(document):
+            pixmap = page.get_pixmap(dpi=dpi, alpha=False)
+            image = np.frombuffer(pixmap.samples, np.uint8).reshape(
+                pixmap.height, pixmap.width, pixmap.n
+            )
+            yield index + 1, cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
+
+
+def iter_pages(path, dpi=200):
+    """
+    Yield (page number, BGR array) for every page of a PDF or TIFF document.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.pdf':
+        return iter_pdf_pages(path, dpi)
+    if extension in ('.tif', '.tiff'):
+        return iter_tiff_pages(path)
+    raise ValueError(f"Unsupported document type: {path}")
@@ -1,129 +1,531 @@
 import cv2
+import numpy as np
 import os
 import re
-from formatter.format_mrz import parse_mrz, convert_date, map_sex
+from contextlib import closing
+from formatter.bulk_mrz import is_valid_td3
+from formatter.format_mrz import extract_td3, parse_mrz, convert_date, map_sex, matches_mrz_pattern
+from instrumentation.memory import release_memory
+from instrumentation.metrics import NULL_METRICS, failures, stage_latency
+from instrumentation.tracing import NULL_TRACER
+from processing.pages import iter_pages
+from processing.resolution import FullResolution, decode_at_least, scale_box
+from storage.image_writer import ImageWriter
+from storage.input_index import file_sha256, compute_dhash
 from storage.store_data import StoreData
 
+# Longest input side kept in low-memory mode when no max_input_side is given
+LOW_MEMORY_MAX_INPUT_SIDE = 2048
+
+# Preprocessing applied to the MRZ crop before text recognition
+READ_PREPROCESS_CONFIG = {
+    "do_preprocess": True,
+    "skewness": True,
+    "delete_shadow": True,
+    "clear_background": True,
+}
+
+# Failure reason exported for each outcome of an image that produced no entry
+FAILED_OUTCOMES = {
+    "not_found": "file_not_found",
+    "undecodable": "undecodable",
+    "parse_error": "parse_error",
+}
+
+
+def build_store_data(mrz_lines):
+    """
+    Parses recognized MRZ lines into a StoreData record.
+
+    This is the formatter-only part of the pipeline, shared by image processing
+    and by reparsing stored raw MRZ strings.
+    """
+    mrz_data = parse_mrz(mrz_lines)
+
+    # Clean up raw MRZ (remove newline, blank characters, and spaces)
+    raw_mrz = (
+        "".join(mrz_lines)
+        .replace("\n", "")
+        .replace("\r", "")
+        .replace(" ", "")
+        .strip()
+    )
+    raw_mrz = raw_mrz.upper()
+    raw_mrz = re.sub(r"[^A-Z0-9]", "<", raw_mrz)
+
+    # Safely retrieve values from mrz_data, defaulting to an empty string if not found
+    return StoreData(
+        country=mrz_data.get("issuing_country", ""),
+        surname=mrz_data.get("surname", ""),
+        given_names=" ".join(mrz_data.get("given_names", [])),  # Join given names
+        dob=convert_date(mrz_data.get("date_of_birth", "")),
+        sex=map_sex(mrz_data.get("sex", "")),
+        passport_number=mrz_data.get("passport_number", ""),
+        raw_mrz=raw_mrz,
+    )
+
 
 class PassportProcessor:
     """
     Processes individual passport images.
+
+    max_input_side downscales larger inputs right after decoding, so every later
+    stage (and the saved face and document images) works on the smaller copy.
+    low_memory additionally copies document crops out of the frame before they
+    are queued, so the full frame is freed while they wait to be written, and
+    trims the heap after every image.
+
+    Inputs whose file was already processed return the stored entry before any
+    model runs. When the data manager also matches similar images (perceptual
+    hash), a similar input is only skipped once a first MRZ read, without face
+    detection, gives the passport number of the image it resembles.
+
+    With a quality_gate (processing.quality.QualityGate), images failing its
+    checks are rejected before any model runs, or processed with their reason
+    codes stored as the record's "Quality Flags"; both are logged by the
+    data manager.
+
+    With detect_orientation, images rotated by 90, 180 or 270 degrees are turned
+    upright once, before segmentation, face detection and cropping run.
+
+    With a detection_side, image files are decoded at the coarsest reduced scale
+    (1/2, 1/4 or 1/8, done within the JPEG decoder) whose longest side is still
+    at least that many pixels, and every model runs on that copy. The full
+    resolution is only decoded once something has been found, to cut the MRZ,
+    the face and the document from it, and is dropped after the image. When a
+    max_input_side is given, images are decoded at the coarsest reduced scale
+    above it before the exact downscale, in both modes.
     """
 
-    def __init__(self, reader, cropper, data_manager, weights_dir):
+    def __init__(
+        self,
+        reader,
+        cropper,
+        data_manager,
+        weights_dir,
+        image_writer=None,
+        columnar_sink=None,
+        tracer=None,
+        metrics=None,
+        max_input_side=None,
+        low_memory=False,
+        quality_gate=None,
+        detect_orientation=False,
+        detection_side=None,
+    ):
         self.reader = reader
         self.cropper = cropper
         self.data_manager = data_manager
         self.weights_dir = weights_dir
+        # Face and document images are encoded and written in the background
+        self.image_writer = image_writer or ImageWriter()
+        # Optional ColumnarSink receiving every new record with its stage timings
+        self.columnar_sink = columnar_sink
+        # Records a span per stage; the stage durations also feed the columnar timings
+        self.tracer = tracer or NULL_TRACER
+        # Operational counters and stage latency histograms, disabled by default
+        self.metrics = metrics or NULL_METRICS
+        self._stage_latency = stage_latency(self.metrics)
+        self._failures = failures(self.metrics)
+        self._images_processed = self.metrics.counter(
+            "mrz_images_processed_total", "Images processed, by outcome.", ("outcome",)
+        )
+        self.low_memory = low_memory
+        self.quality_gate = quality_gate
+        self.detect_orientation = detect_orientation
+        self.detection_side = detection_side
+        self._rotations_corrected = self.metrics.counter(
+            "mrz_rotations_corrected_total",
+            "Rotated images turned upright before reading, by rotation in degrees.",
+            ("rotation",),
+        )
+        if low_memory and max_input_side is None:
+            max_input_side = LOW_MEMORY_MAX_INPUT_SIDE
+        self.max_input_side = max_input_side
+        self._duplicates_skipped = self.metrics.counter(
+            "mrz_duplicates_skipped_total",
+            "Images skipped as already processed, by what matched.",
+            ("match",),
+        )
 
     def process_image(self, image_file, input_folder):
+        """
+        Reads, parses and stores one passport image.
+
+        Returns the stored entry for the image (the earlier one when the image or
+        the passport number was already processed), or None if it could not be read.
+        """
+        timings = {}
+        with self.tracer.span("image", image_file=image_file) as span:
+            entry, outcome = self._process_image(image_file, input_folder, timings)
+            span.set(outcome=outcome)
+        self._finish(outcome, timings, span)
+        return entry
+
+    def process_page(self, image, source_name):
+        """
+        Reads, parses and stores one already decoded image, e.g. a document page.
+
+        source_name identifies the image in the logs and the columnar export.
+        Returns the stored entry like process_image.
+        """
+        timings = {}
+        with self.tracer.span("image", image_file=source_name) as span:
+            span.set(height=image.shape[0], width=image.shape[1])
+            image = self._cap_resolution(image, span)
+            # Pages have no file of their own, so their pixels identify them
+            sha256 = file_sha256(np.ascontiguousarray(image))
+            entry, outcome = self._process_decoded(image, sha256, source_name, timings)
+            span.set(outcome=outcome)
+        self._finish(outcome, timings, span)
+        return entry
+
+    def process_document(self, document_file, input_folder, dpi=200, stop_at_valid=False):
+        """
+        Processes the pages of a PDF or TIFF document one at a time.
+
+        Only one page is held in memory. With stop_at_valid, the remaining pages
+        are skipped once a page gives an entry whose MRZ passes its check digits.
+        Returns the entries of the processed pages.
+        """
+        document_path = os.path.join(input_folder, document_file)
+        entries = []
+        with closing(iter_pages(document_path, dpi)) as pages:
+            for page_number, page in pages:
+                print(f"Processing page {page_number} of {document_file}")
+                entry = self.process_page(page, f"{document_file}#page{page_number}")
+                del page
+                entries.append(entry)
+                if stop_at_valid and entry is not None:
+                    mrz = extract_td3([entry["raw_mrz"]])
+                    if mrz is not None and is_valid_td3(mrz):
+                        print(f"Valid MRZ found on page {page_number}, skipping the other pages.")
+                        break
+        return entries
+
+    def _finish(self, outcome, timings, span):
+        """
+        Record the metrics of one processed image.
+        """
+        self._images_processed.inc(outcome=outcome)
+        if outcome == "known_input":
+            self._duplicates_skipped.inc(match="input")
+        elif outcome == "duplicate":
+            self._duplicates_skipped.inc(match="passport_number")
+        elif outcome in FAILED_OUTCOMES:
+            self._failures.inc(reason=FAILED_OUTCOMES[outcome])
+        for stage, duration in timings.items():
+            self._stage_latency.observe(duration, stage=stage)
+        self._stage_latency.observe(span.duration, stage="image")
+        if self.low_memory:
+            release_memory()
+
+    def _process_image(self, image_file, input_folder, timings):
+        """
+        Decode and process one image file, filling timings with the stage
+        durations; return its entry and the outcome recorded on its span.
+        """
         image_path = os.path.join(input_folder, image_file)
 
+        # Decode the image once; the reader and the cropper share it
+        with self.tracer.span("decode") as span:
+            try:
+                with open(image_path, "rb") as f:
+                    file_bytes = f.read()
+            except FileNotFoundError:
+                print(f"File not found: {image_path}")
+                span.set(outcome="not_found")
+                return None, "not_found"
+            if self.detection_side:
+                # Models run on a reduced decode; the full resolution is decoded on demand
+                image = decode_at_least(file_bytes, self.detection_side)
+            else:
+                image = decode_at_least(file_bytes, self.max_input_side)
+            if image is None:
+                print(f"Could not decode image: {image_path}")
+                span.set(outcome="undecodable")
+                return None, "undecodable"
+            span.set(height=image.shape[0], width=image.shape[1], bytes=len(file_bytes))
+            sha256 = file_sha256(file_bytes)
+            full_image = None
+            if self.detection_side:
+                full_image = FullResolution(
+                    file_bytes, lambda data: self._decode_full(data, timings)
+                )
+            else:
+                image = self._cap_resolution(image, span)
+            # The encoded file is not needed anymore (the full-resolution loader keeps it)
+            del file_bytes
+        timings["decode"] = span.duration
+        try:
+            return self._process_decoded(image, sha256, image_file, timings, full_image)
+        finally:
+            if full_image is not None:
+                full_image.release()
+
+    def _decode_full(self, file_bytes, timings):
+        """
+        Decode the full-resolution copy of an image, capped to max_input_side.
+        """
+        with self.tracer.span("decode_full") as span:
+            image = decode_at_least(file_bytes, self.max_input_side)
+            span.set(height=image.shape[0], width=image.shape[1])
+            image = self._cap_resolution(image, span)
+        timings["decode_full"] = span.duration
+        return image
+
+    def _process_decoded(self, image, sha256, source_name, timings, full_image=None):
+        """
+        Process one decoded image; return its entry and outcome like _process_image.
+
+        full_image is the processing.resolution.FullResolution of an image whose
+        models run on the reduced copy image, or None when image is the full resolution.
+        """
+        # Short-circuit inputs that were already processed (same file)
+        with self.tracer.span("dedup") as span:
+            dhash = compute_dhash(image)
+            known_passport_number, match = self.data_manager.find_input(sha256, dhash)
+            if match is not None:
+                span.set(outcome=f"{match}_match")
+        timings["dedup"] = span.duration
+        if match == "file":
+            print(
+                f"Input already processed as passport number {known_passport_number}. Skipping."
+            )
+            return self.data_manager.get_entry(known_passport_number), "known_input"
+
+        # Fail bad inputs fast, before any model runs
+        quality_flags = []
+        if self.quality_gate is not None:
+            with self.tracer.span("quality") as span:
+                quality, quality_flags = self.quality_gate.assess(image)
+                span.set(**quality)
+                if quality_flags:
+                    span.set(outcome=",".join(quality_flags))
+            timings["quality"] = span.duration
+            if quality_flags:
+                for reason in quality_flags:
+                    self._failures.inc(reason=f"quality_{reason}")
+                rejected = self.quality_gate.rejects
+                self.data_manager.add_quality_result(
+                    source_name, quality_flags, quality, rejected
+                )
+                if rejected:
+                    print(f"Image rejected by the quality gate: {', '.join(quality_flags)}")
+                    self.data_manager.save_parsed_data()
+                    return None, "rejected"
+                print(f"Image flagged by the quality gate: {', '.join(quality_flags)}")
+
+        # Turn sideways and upside-down captures upright before the models run
+        if self.detect_orientation:
+            with self.tracer.span("orientation") as span:
+                image, rotation, runs = self.reader.upright(image)
+                span.set(rotation=rotation, segmentation_runs=runs)
+            timings["orientation"] = span.duration
+            if rotation:
+                print(f"Image rotated by {rotation} degrees, turned upright.")
+                self._rotations_corrected.inc(rotation=rotation)
+                if full_image is not None:
+                    full_image.transforms.append(
+                        lambda frame: self.reader.upright(frame, rotation)[0]
+                    )
+
         # Perform MRZ reading with preprocessing and face detection
-        text_results, segmented_image, detected_face = self.reader.predict(
-            image_path,
-            do_facedetect=True,
-            preprocess_config={
-                "do_preprocess": True,
-                "skewness": True,
-                "delete_shadow": True,
-                "clear_background": True,
-            },
+        # A geometric cropper derives the page from where the MRZ and the face are
+        use_geometry = self.image_writer.save_documents and getattr(
+            self.cropper, "uses_geometry", False
         )
+        with self.tracer.span("read_mrz") as span:
+            prediction = self.reader.predict(
+                image,
+                do_facedetect=self.image_writer.save_faces,
+                preprocess_config=READ_PREPROCESS_CONFIG,
+                return_geometry=use_geometry,
+                # With a reduced copy, the MRZ and face are cut from the full resolution
+                source=full_image,
+            )
+        timings["read_mrz"] = span.duration
+        text_results, _, detected_face = prediction[:3]
+        geometry = prediction[3] if use_geometry else None
+        del prediction
 
         # Extract the recognized text directly from the prediction results
         mrz_lines = [result[1] for result in text_results]  # Only keep the recognized text
 
         try:
             # Process and parse MRZ using regular expressions
-            mrz_data = parse_mrz(mrz_lines)
+            with self.tracer.span("parse") as span:
+                store_data = build_store_data(mrz_lines)
+            passport_number = store_data.passport_number
+            timings["parse"] = span.duration
+            # Partial reads are still stored; count them by what went wrong
+            if self.metrics.enabled and not matches_mrz_pattern(mrz_lines):
+                self._failures.inc(reason="regex_mismatch")
+            if store_data.dob == "Invalid Date":
+                self._failures.inc(reason="invalid_date")
 
-            # Safely retrieve values from mrz_data, defaulting to an empty string if not found
-            issuing_country = mrz_data.get("issuing_country", "")
-            surname = mrz_data.get("surname", "")
-            given_names = " ".join(mrz_data.get("given_names", []))  # Join given names
-            passport_number = mrz_data.get("passport_number", "")
-            dob = convert_date(mrz_data.get("date_of_birth", ""))
-            sex = map_sex(mrz_data.get("sex", ""))
+            # A similar image may be another passport with the same layout: it is only
+            # skipped once its MRZ, read once like any other input, is the one it resembles
+            if match == "similar" and passport_number and passport_number == known_passport_number:
+                print(
+                    f"Input similar to passport number {known_passport_number}, same MRZ. Skipping."
+                )
+                self.data_manager.add_input(sha256, dhash, known_passport_number)
+                self.data_manager.save_parsed_data()
+                return self.data_manager.get_entry(known_passport_number), "known_input"
 
             # Skip duplicates
             if self.data_manager.is_duplicate(passport_number):
                 print(
                     f"Duplicate entry detected for passport number {passport_number}. Skipping."
                 )
-                return
+                self.data_manager.add_input(sha256, dhash, passport_number)
+                return self.data_manager.get_entry(passport_number), "duplicate"
 
             # Print extracted passport information
             print("----- Extracted Passport Information -----")
-            print(f"Country: {issuing_country}")
-            print(f"Surname: {surname}")
-            print(f"Given Names: {given_names}")
-            print(f"Date of Birth: {dob}")
-            print(f"Sex: {sex}")
+            print(f"Country: {store_data.country}")
+            print(f"Surname: {store_data.surname}")
+            print(f"Given Names: {store_data.given_names}")
+            print(f"Date of Birth: {store_data.dob}")
+            print(f"Sex: {store_data.sex}")
             print(f"Passport Number: {passport_number}")
 
-            # Clean up raw MRZ (remove newline, blank characters, and spaces)
-            raw_mrz = (
-                "".join(mrz_lines)
-                .replace("\n", "")
-                .replace("\r", "")
-                .replace(" ", "")
-                .strip()
-            )
-            raw_mrz = raw_mrz.upper()
-            raw_mrz = re.sub(r"[^A-Z0-9]", "<", raw_mrz)
-
-            # Store the extracted data using StoreData class and save it as a JSON object
-            store_data = StoreData(
-                country=issuing_country,
-                surname=surname,
-                given_names=given_names,
-                dob=dob,
-                sex=sex,
-                passport_number=passport_number,
-                raw_mrz=raw_mrz,
-            )
-
             # Append the new data to the parsed data list
-            self.data_manager.add_entry(
-                {
-                    "Country": issuing_country,
-                    "Surname": surname,
-                    "Given Names": given_names,
-                    "Date of Birth": dob,
-                    "Sex": sex,
-                    "Passport Number": passport_number,
-                    "raw_mrz": raw_mrz,
-                }
-            )
+            with self.tracer.span("store") as span:
+                entry = store_data.as_dict()
+                if quality_flags:
+                    entry["Quality Flags"] = quality_flags
+                added = self.data_manager.add_entry(entry)
+                self.data_manager.add_input(sha256, dhash, passport_number)
 
-            # Save the updated parsed data to the file
-            self.data_manager.save_parsed_data()
+                # Save the updated parsed data to the file
+                self.data_manager.save_parsed_data()
+            timings["store"] = span.duration
+            if not added:
+                # Another worker stored this passport since the duplicate check
+                print(
+                    f"Duplicate entry detected for passport number {passport_number}. Skipping."
+                )
+                return self.data_manager.get_entry(passport_number), "duplicate"
 
-            # Save the segmented image and detected face with specific naming conventions
+            given_names = store_data.given_names
+            surname = store_data.surname
+
+            # Save the detected face and cropped document with specific naming conventions
+            file_stem = f"{given_names}_{surname}_{passport_number}"
             if detected_face is not None:
-                face_image_path = os.path.join(
-                    self.data_manager.faces_folder,
-                    f"{given_names}_{surname}_{passport_number}_face.jpg",
+                face_image_path = self.image_writer.path_for(
+                    self.data_manager.faces_folder, f"{file_stem}_face"
                 )
-                cv2.imwrite(face_image_path, detected_face)
-                print(f"Face image saved as: {face_image_path}")
+                self.image_writer.submit(detected_face, face_image_path)
+                print(f"Face image queued as: {face_image_path}")
 
-            # Perform cropping
-            self.cropper.crop_image(image_path, self.data_manager.output_folder)
+            # Perform cropping, skipped entirely when documents are not saved
+            if self.image_writer.save_documents:
+                document_image_path = self.image_writer.path_for(
+                    self.data_manager.documents_folder, f"{file_stem}_document"
+                )
+                with self.tracer.span("crop") as span:
+                    if use_geometry:
+                        # With a reduced copy, the geometry is in full-resolution coordinates
+                        crop_source = image if full_image is None else full_image()
+                        document_image = self.cropper.crop_image(crop_source, geometry)
+                    elif full_image is None:
+                        document_image = self.cropper.crop_image(image)
+                    else:
+                        # YOLO runs on the reduced copy, the box is cut from the full resolution
+                        box = self.cropper.crop_box(image)
+                        document_image = None
+                        if box is not None:
+                            frame = full_image()
+                            x1, y1, x2, y2 = scale_box(box, image.shape, frame.shape)
+                            document_image = frame[y1:y2, x1:x2]
+                    if document_image is None:
+                        span.set(outcome="not_found")
+                timings["crop"] = span.duration
+                if document_image is not None:
+                    if self.low_memory or full_image is not None:
+                        # A crop is a view that would keep the whole frame alive in the queue
+                        document_image = document_image.copy()
+                    self.image_writer.submit(document_image, document_image_path)
+                    print(f"Cropped document image queued as: {document_image_path}")
 
-            # Save cropped document with a specific naming convention
-            document_image_path = os.path.join(
-                self.data_manager.documents_folder,
-                f"{given_names}_{surname}_{passport_number}_document.jpg",
-            )
-            os.rename(
-                os.path.join(self.data_manager.output_folder, "result_cropped.jpg"),
-                document_image_path,
-            )
-            print(f"Cropped document image saved as: {document_image_path}")
+            if self.columnar_sink is not None:
+                self.columnar_sink.write(store_data, timings, source_name)
+
+            return entry, "ok"
 
         except ValueError as ve:
             print(f"Error parsing MRZ: {ve}")
-        except FileNotFoundError:
-            print(f"File not found: {image_path}")
+            return None, "parse_error"
+
+    def process_stream(self, frames, source_name, **stream_options):
+        """
+        Reads the MRZ from video frames and stores its record.
+
+        Only a confirmed read (check digits valid, see mrz_reader.stream) is
+        stored; no face or document image is saved. Returns the stored entry (the
+        earlier one for a known passport number), or None.
+        """
+        with self.tracer.span("stream", source=source_name) as span:
+            entry, outcome = self._process_stream(frames, source_name, span, stream_options)
+            span.set(outcome=outcome)
+        self._images_processed.inc(outcome=outcome)
+        if outcome == "duplicate":
+            self._duplicates_skipped.inc(match="passport_number")
+        self._stage_latency.observe(span.duration, stage="stream")
+        return entry
+
+    def _process_stream(self, frames, source_name, span, stream_options):
+        """
+        Read the frames and store a confirmed MRZ; return its entry and the
+        outcome recorded on the stream span.
+        """
+        result = self.reader.read_stream(frames, **stream_options)
+        span.set(
+            frames=result["frames"],
+            ocr_runs=result["ocr_runs"],
+            confirmed=result["confirmed"],
+        )
+        print(
+            f"Read {result['frames']} frames in {result['latency_ms']:.0f} ms: "
+            f"{result['segmentations']} segmentations, {result['ocr_runs']} OCR runs, "
+            f"{result['cpu_ms']:.0f} ms CPU."
+        )
+        if not result["confirmed"]:
+            print(f"No confirmed MRZ in {source_name}.")
+            return None, "not_confirmed"
+
+        store_data = build_store_data(result["mrz_lines"])
+        passport_number = store_data.passport_number
+        if self.data_manager.is_duplicate(passport_number):
+            print(f"Duplicate entry detected for passport number {passport_number}. Skipping.")
+            return self.data_manager.get_entry(passport_number), "duplicate"
+
+        print(f"Confirmed MRZ for passport number {passport_number}.")
+        entry = store_data.as_dict()
+        self.data_manager.add_entry(entry)
+        self.data_manager.save_parsed_data()
+        if self.columnar_sink is not None:
+            timings = {"read_mrz": result["latency_ms"] / 1000}
+            self.columnar_sink.write(store_data, timings, source_name)
+        return entry, "ok"
+
+    def _cap_resolution(self, image, span):
+        """
+        Downscale the image so that its longest side fits max_input_side.
+        """
+        if not self.max_input_side:
+            return image
+        scale = self.max_input_side / max(image.shape[:2])
+        if scale >= 1:
+            return image
+        height, width = image.shape[:2]
+        image = cv2.resize(
+            image,
+            (max(1, round(width * scale)), max(1, round(height * scale))),
+            interpolation=cv2.INTER_AREA,
+        )
+        span.set(scaled_height=image.shape[0], scaled_width=image.shape[1])
+        return image
@@ -0,0 +1,100 @@
+# src/processing/quality.py
+
+import cv2
+import numpy as np
+
+# What the quality gate does with an image failing a threshold
+QUALITY_MODES = ('reject', 'flag')
+
+
+class QualityGate:
+    """
+    Cheap image quality checks run before any model.
+
+    The metrics are computed on a grayscale copy whose longest side is at most
+    max_side pixels, so the gate costs a few milliseconds whatever the input
+    size (the sharpness threshold is relative to that size):
+
+    - sharpness: variance of the Laplacian, low for blurred or out-of-focus images
+    - glare: fraction of pixels clipped to white, high for overexposed images or
+      reflections on the laminate
+    - contrast: spread between the 1st and 99th intensity percentiles, very low
+      for blank or washed-out images (a page is mostly background, so narrower
+      percentiles would miss its text)
+
+    assess() returns the metrics and the reason codes of the failed checks:
+    'glare' or 'blank' alone (they explain the other failures), otherwise
+    'blurry' and/or 'low_contrast'. In 'reject' mode PassportProcessor stops
+    such images before inference, in 'flag' mode it processes them and stores
+    the reasons with their record.
+    """
+    def __init__(
+        self,
+        mode='reject',
+        min_sharpness=40.0,
+        max_glare=0.4,
+        min_contrast=40,
+        blank_contrast=10,
+        clip_level=250,
+        max_side=512,
+    ):
+        if mode not in QUALITY_MODES:
+            raise ValueError(f"Unknown quality mode {mode!r}, expected one of {QUALITY_MODES}")
+        self.mode = mode
+        self.min_sharpness = min_sharpness
+        self.max_glare = max_glare
+        self.min_contrast = min_contrast
+        self.blank_contrast = blank_contrast
+        self.clip_level = clip_level
+        self.max_side = max_side
+
+    @property
+    def rejects(self):
+        return self.mode == 'reject'
+
+    def _thumbnail(self, image):
+        # Skip pixels down to about twice the thumbnail size before converting and
+        # averaging, so large inputs are never converted at full resolution
+        step = max(1, max(image.shape[:2]) // (2 * self.max_side))
+        image = image[::step, ::step]
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+        scale = self.max_side / max(gray.shape[:2])
+        if scale < 1:
+            gray = cv2.resize(
+                gray,
+                (max(1, round(gray.shape[1] * scale)), max(1, round(gray.shape[0] * scale))),
+                interpolation=cv2.INTER_AREA,
+            )
+        return gray
+
+    def measure(self, image):
+        """
+        Return the sharpness, glare and contrast metrics of an image.
+        """
+        gray = self._thumbnail(image)
+        histogram = cv2.calcHist([gray], [0], None, [256], [0, 256]).ravel()
+        cumulative = np.cumsum(histogram) / gray.size
+        low, high = np.searchsorted(cumulative, (0.01, 0.99))
+        return {
+            'sharpness': float(cv2.Laplacian(gray, cv2.CV_64F).var()),
+            'glare': float(histogram[self.clip_level:].sum() / gray.size),
+            'contrast': int(high - low),
+        }
+
+    def assess(self, image):
+        """
+        Return the quality metrics of an image and the reason codes of the failed checks.
+        """
+        metrics = self.measure(image)
+        if metrics['glare'] > self.max_glare:
+            # Clipping also flattens contrast and sharpness, glare is the cause
+            return metrics, ['glare']
+        if metrics['contrast'] < self.blank_contrast:
+            # Nothing on the image, the other checks would only repeat it
+            return metrics, ['blank']
+        reasons = []
+        if metrics['sharpness'] < self.min_sharpness:
+            reasons.append('blurry')
+        if metrics['contrast'] < self.min_contrast:
+            reasons.append('low_contrast')
+        return metrics, reasons
@@ -0,0 +1,50 @@
+# src/processing/reparse.py
+
+from processing.passport_processor import build_store_data
+
+
+def reparse_entry(entry):
+    """
+    Re-run the formatter on the raw MRZ of a stored entry.
+
+    Returns the updated entry and a dict of changed fields mapped to
+    (old value, new value) pairs. Fields the formatter does not produce are kept.
+    """
+    store_data = build_store_data([entry.get("raw_mrz", "")])
+    updated = dict(entry)
+    updated.update(store_data.as_dict())
+    # Keep the stored raw MRZ as the source of truth
+    updated["raw_mrz"] = entry.get("raw_mrz", "")
+
+    changes = {
+        key: (entry.get(key), value)
+        for key, value in updated.items()
+        if entry.get(key) != value
+    }
+    return updated, changes
+
+
+def reparse_store(data_manager, commit_every=1000):
+    """
+    Rebuild every record of a DataManager's store from its stored raw MRZ.
+
+    Records are streamed from the store in batches and only the changed ones are
+    updated in place, without running any of the vision models. This is a
+    generator yielding (record id, passport number, changes) for each changed
+    record, so the report is never held in memory; consume it fully to finish
+    the pass. The store is locked until then, see DataManager.rebuild_records.
+    """
+    count = 0
+    changed = 0
+
+    def rebuild(entry):
+        nonlocal count
+        count += 1
+        return reparse_entry(entry)
+
+    for record_id, passport_number, changes in data_manager.rebuild_records(
+        rebuild, commit_every
+    ):
+        changed += 1
+        yield record_id, passport_number, changes
+    print(f"Reparsed {count} records, {changed} changed.")
@@ -0,0 +1,91 @@
+# src/processing/resolution.py
+
+import io
+
+import cv2
+import numpy as np
+from PIL import Image
+
+# imdecode flags of the reduced decodes, coarsest first. JPEG files are decoded
+# directly at the reduced scale (DCT scaling); other formats are decoded and
+# downscaled by OpenCV.
+REDUCED_DECODE_FLAGS = (
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2),
+)
+
+
+def encoded_size(file_bytes):
+    """
+    Return the (width, height) of an encoded image from its header, or None.
+    """
+    try:
+        with Image.open(io.BytesIO(file_bytes)) as image:
+            return image.size
+    except Exception:
+        return None
+
+
+def decode_at_least(file_bytes, min_side=None):
+    """
+    Decode an image at the coarsest reduced scale whose longest side is still at least min_side.
+
+    The whole image is decoded when min_side is None, when no reduced scale is
+    large enough or when the header cannot be read. Returns None like
+    cv2.imdecode when the data is not a decodable image.
+    """
+    flag = cv2.IMREAD_COLOR
+    size = encoded_size(file_bytes) if min_side else None
+    if size is not None:
+        for factor, reduced_flag in REDUCED_DECODE_FLAGS:
+            if max(size) // factor >= min_side:
+                flag = reduced_flag
+                break
+    return cv2.imdecode(np.frombuffer(file_bytes, np.uint8), flag)
+
+
+def scale_box(box, from_shape, to_shape):
+    """
+    Map an (x1, y1, x2, y2) box between two resolutions of the same image.
+    """
+    scale_x = to_shape[1] / from_shape[1]
+    scale_y = to_shape[0] / from_shape[0]
+    x1, y1, x2, y2 = box
+    return (
+        max(int(np.floor(x1 * scale_x)), 0),
+        max(int(np.floor(y1 * scale_y)), 0),
+        min(int(np.ceil(x2 * scale_x)), to_shape[1]),
+        min(int(np.ceil(y2 * scale_y)), to_shape[0]),
+    )
+
+
+class FullResolution:
+    """
+    Full-resolution copy of an image whose detection models ran on a reduced decode.
+
+    Calling it decodes the encoded file with load on first use, applies the
+    transforms registered since (e.g. the rotation found on the reduced copy)
+    and keeps the result until release(), so the large frame is only in memory
+    while the MRZ, face and document are cut from it.
+    """
+    def __init__(self, file_bytes, load):
+        self._file_bytes = file_bytes
+        self._load = load
+        self._image = None
+        self.transforms = []
+
+    def __call__(self):
+        if self._image is None:
+            image = self._load(self._file_bytes)
+            for transform in self.transforms:
+                image = transform(image)
+            self._image = image
+        return self._image
+
+    def release(self):
+        """
+        Drop the decoded frame and the encoded file.
+        """
+        self._image = None
+        self._file_bytes = None
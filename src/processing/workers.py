@@ -0,0 +1,144 @@
+# src/processing/workers.py
+
+import gc
+import multiprocessing
+import os
+import queue
+import time
+
+from instrumentation.memory import memory_footprint_mb
+
+# Longest a finished worker waits for the parent to measure its memory
+MEASURE_TIMEOUT_S = 60
+
+
+def _run_worker(index, build_worker, items, results, measured):
+    """
+    Body of a forked worker: process items until the end marker, then report.
+    """
+    handle, close = build_worker(index)
+    processed = 0
+    failed = []
+    started = time.perf_counter()
+    while True:
+        item = items.get()
+        if item is None:
+            break
+        try:
+            handle(item)
+        except Exception as e:
+            # Reported to the parent, the other items go on
+            print(f"Worker {index} failed on {item}: {e!r}")
+            failed.append({"item": item, "error": repr(e)})
+        processed += 1
+    close()
+    results.put(
+        {
+            "worker": index,
+            "pid": os.getpid(),
+            "items": processed,
+            "failed": failed,
+            "seconds": time.perf_counter() - started,
+        }
+    )
+    # Stay alive until the parent has measured every process at the same time
+    measured.wait(MEASURE_TIMEOUT_S)
+
+
+def run_prefork(items, workers, build_worker):
+    """
+    Process items on worker processes forked from this one.
+
+    Everything loaded before the call, the model weights in particular, is
+    shared with the workers copy-on-write instead of being loaded once per
+    worker. The garbage collector is frozen around the fork so that collections
+    in the workers do not write to, and so copy, the pages of the inherited
+    objects. The parent must not have run inference or started threads (e.g. an
+    ImageWriter or a metrics server) before forking, as thread pools do not
+    survive a fork.
+
+    build_worker(index) runs in each worker right after the fork and returns
+    (handle, close): handle(item) processes one item and close() releases the
+    worker's own resources (store connections, writer threads). Items are
+    handed out one at a time, so fast workers take more of them.
+
+    Returns the memory footprint of the parent and one report per worker with
+    its index, pid, processed items, the items whose handle raised ("failed",
+    each with its item and error), wall time and memory footprint (rss_mb,
+    uss_mb, pss_mb, see instrumentation.memory.memory_footprint_mb). All
+    processes are measured together once every worker has finished, so the
+    shared pages are split between all of them in the PSS figures.
+    """
+    context = multiprocessing.get_context("fork")
+    items_queue = context.Queue()
+    results = context.Queue()
+    measured = context.Event()
+    for item in items:
+        items_queue.put(item)
+    for _ in range(workers):
+        items_queue.put(None)
+
+    gc.collect()
+    gc.freeze()
+    try:
+        processes = [
+            context.Process(
+                target=_run_worker,
+                args=(index, build_worker, items_queue, results, measured),
+                name=f"mrz-worker-{index}",
+            )
+            for index in range(workers)
+        ]
+        for process in processes:
+            process.start()
+    finally:
+        gc.unfreeze()
+
+    reports = []
+    while len(reports) < len(processes):
+        try:
+            reports.append(results.get(timeout=1.0))
+        except queue.Empty:
+            # A worker that died never reports
+            failed = sum(process.exitcode not in (None, 0) for process in processes)
+            if len(reports) + failed >= len(processes):
+                break
+
+    for report in reports:
+        report.update(memory_footprint_mb(report["pid"]))
+    parent = memory_footprint_mb()
+    measured.set()
+    for process in processes:
+        process.join()
+        if process.exitcode != 0:
+            print(f"{process.name} exited with code {process.exitcode}")
+    return parent, sorted(reports, key=lambda report: report["worker"])
+
+
+def format_worker_reports(reports, parent):
+    """
+    Format the worker reports and the parent's memory footprint as a text table.
+    """
+    lines = [
+        f"{'process':<12}{'items':>8}{'failed':>8}{'seconds':>10}"
+        f"{'RSS MiB':>10}{'USS MiB':>10}{'PSS MiB':>10}"
+    ]
+    rows = [("parent", "", "", "", parent)] + [
+        (f"worker {r['worker']}", r["items"], len(r["failed"]), f"{r['seconds']:.1f}", r)
+        for r in reports
+    ]
+    for name, items, failed, seconds, memory in rows:
+        pss = "n/a" if memory["pss_mb"] is None else f"{memory['pss_mb']:.1f}"
+        lines.append(
+            f"{name:<12}{items:>8}{failed:>8}{seconds:>10}"
+            f"{memory['rss_mb']:>10.1f}{memory['uss_mb']:>10.1f}{pss:>10}"
+        )
+    total_pss = sum(row[-1]["pss_mb"] or 0.0 for row in rows)
+    total_rss = sum(row[-1]["rss_mb"] for row in rows)
+    lines.append(f"Total PSS {total_pss:.1f} MiB, total RSS {total_rss:.1f} MiB")
+    for report in reports:
+        for failure in report["failed"]:
+            lines.append(
+                f"Failed on {failure['item']} (worker {report['worker']}): {failure['error']}"
+            )
+    return "\n".join(lines)
@@ -0,0 +1,51 @@
+# src/quantization/manifest.py
+
+import json
+import os
+
+# Written next to the quantized models by quantization/quantize.py
+MANIFEST_NAME = "manifest.json"
+# Names of the quantizable models in the manifest
+MODEL_NAMES = ("segmentation", "face_detection", "yolo")
+# Manifest entries holding a path relative to the manifest's folder
+PATH_KEYS = ("path", "calibration")
+
+
+def load_manifest(manifest_path):
+    """
+    Load a quantization manifest, or an empty one if it does not exist.
+    """
+    if not os.path.exists(manifest_path):
+        return {"models": {}}
+    with open(manifest_path, "r") as f:
+        return json.load(f)
+
+
+def save_manifest(manifest_path, manifest):
+    """
+    Write a quantization manifest.
+    """
+    os.makedirs(os.path.dirname(manifest_path) or ".", exist_ok=True)
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f, indent=4)
+
+
+def accepted_model(manifest_path, name):
+    """
+    Return the manifest entry of a quantized model that passed the accuracy gate,
+    with absolute paths, or None so that the float model is used instead.
+    """
+    entry = load_manifest(manifest_path)["models"].get(name)
+    if entry is None:
+        print(f"No INT8 {name} model in {manifest_path}, using the float model.")
+        return None
+    if not entry.get("accepted"):
+        print(f"INT8 {name} model was rejected by the accuracy gate, using the float model.")
+        return None
+    entry = dict(entry)
+    folder = os.path.dirname(os.path.abspath(manifest_path))
+    for key in PATH_KEYS:
+        if key in entry:
+            entry[key] = os.path.join(folder, entry[key])
+    print(f"Using the INT8 {name} model.")
+    return entry
@@ -0,0 +1,310 @@
+# src/quantization/quantize.py
+
+"""
+Produces INT8 variants of the models from a local calibration image set and
+accepts each one only if it agrees with its float model. Run from src/:
+
+    python -m quantization.quantize --calibration-dir ../calibration --validation-dir ../validation
+
+Accepted models are used by MRZReader and Cropper when they get the manifest
+(main.py --int8):
+
+- segmentation: mrz_seg.tflite cannot be requantized, so the TFLite model is
+  converted again from its SavedModel (--segmentation-saved-model). Gate: the
+  MRZ fields parsed with the INT8 model match the float ones.
+- face_detection: OpenCV cannot save quantized networks, so the calibration
+  blobs are stored and the Caffe model is quantized when FaceDetection loads.
+  Gate: the detected face boxes match.
+- yolo: exported by ultralytics with int8=True (OpenVINO by default). Gate:
+  the document crop boxes match.
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+
+from cropper.detections import box_iou
+from processing.pages import load_images
+from quantization.manifest import MANIFEST_NAME, MODEL_NAMES, load_manifest, save_manifest
+
+# Boxes with at least this IoU count as the same result
+MATCH_IOU = 0.9
+
+
+def _timed(function, images):
+    """
+    Apply function to every image; return the results and the mean milliseconds per image.
+    """
+    started = time.perf_counter()
+    # Keep the pipeline's progress prints out of the report
+    with contextlib.redirect_stdout(io.StringIO()):
+        results = [function(image) for image in images]
+    return results, (time.perf_counter() - started) * 1000 / len(images)
+
+
+def _boxes_match(box_a, box_b):
+    if box_a is None or box_b is None:
+        return box_a is None and box_b is None
+    return box_iou(box_a, box_b) >= MATCH_IOU
+
+
+def accuracy_gate(float_function, int8_function, images, matches, min_agreement):
+    """
+    Compare an INT8 model with its float model on the validation images.
+
+    matches(float_result, int8_result) returns the number of agreeing items and
+    the number of compared items. Returns the manifest fields of the gate.
+    """
+    float_results, float_ms = _timed(float_function, images)
+    int8_results, int8_ms = _timed(int8_function, images)
+    agreeing = compared = 0
+    for float_result, int8_result in zip(float_results, int8_results):
+        agree, total = matches(float_result, int8_result)
+        agreeing += agree
+        compared += total
+    agreement = agreeing / compared if compared else 0.0
+    return {
+        "accepted": agreement >= min_agreement,
+        "agreement": agreement,
+        "min_agreement": min_agreement,
+        "float_ms": float_ms,
+        "int8_ms": int8_ms,
+        "validation_images": len(images),
+    }
+
+
+def quantize_segmentation(args, calibration, validation):
+    """
+    Convert the segmentation SavedModel to a TFLite model with INT8 weights and activations.
+    """
+    import tensorflow as tf
+
+    from mrz_reader.reader import MRZReader
+    from mrz_reader.segmentation import SegmentationNetwork
+    from processing.passport_processor import build_store_data
+
+    if not args.segmentation_saved_model:
+        print("Skipping segmentation: --segmentation-saved-model is required to quantize it.")
+        return None
+
+    float_path = os.path.join(args.weights_dir, "mrz_detector/mrz_seg.tflite")
+    float_segmentation = SegmentationNetwork(float_path)
+
+    def representative_dataset():
+        for image in calibration:
+            yield [float_segmentation.process(image)]
+
+    converter = tf.lite.TFLiteConverter.from_saved_model(args.segmentation_saved_model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    converter.representative_dataset = representative_dataset
+    converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    # Input and output stay float32 so SegmentationNetwork feeds it unchanged
+    int8_path = os.path.join(args.output_dir, "mrz_seg_int8.tflite")
+    with open(int8_path, "wb") as f:
+        f.write(converter.convert())
+    int8_segmentation = SegmentationNetwork(int8_path)
+
+    reader = MRZReader(
+        facedetection_protxt=os.path.join(args.weights_dir, "face_detector/deploy.prototxt"),
+        facedetection_caffemodel=os.path.join(
+            args.weights_dir, "face_detector/res10_300x300_ssd_iter_140000.caffemodel"
+        ),
+        segmentation_model=float_path,
+        easy_ocr_params={"lang_list": ["en"], "gpu": False},
+    )
+
+    def read_fields(segmentation):
+        def read(image):
+            reader.segmentation = segmentation
+            text_results, _, _ = reader.predict(
+                image,
+                preprocess_config={
+                    "do_preprocess": True,
+                    "skewness": True,
+                    "delete_shadow": True,
+                    "clear_background": True,
+                },
+            )
+            try:
+                return build_store_data([result[1] for result in text_results]).as_dict()
+            except ValueError:
+                return None
+
+        return read
+
+    def fields_match(float_fields, int8_fields):
+        if float_fields is None or int8_fields is None:
+            return int(float_fields is None and int8_fields is None), 1
+        agreeing = sum(float_fields[key] == int8_fields.get(key) for key in float_fields)
+        return agreeing, len(float_fields)
+
+    entry = accuracy_gate(
+        read_fields(float_segmentation),
+        read_fields(int8_segmentation),
+        validation,
+        fields_match,
+        args.min_agreement,
+    )
+    entry["path"] = os.path.relpath(int8_path, args.output_dir)
+    return entry
+
+
+def quantize_face_detection(args, calibration, validation):
+    """
+    Store calibration blobs for the face detector and check its on-load INT8 quantization.
+    """
+    import cv2
+
+    from mrz_reader.segmentation import FaceDetection
+
+    model_files = (
+        os.path.join(args.weights_dir, "face_detector/deploy.prototxt"),
+        os.path.join(args.weights_dir, "face_detector/res10_300x300_ssd_iter_140000.caffemodel"),
+    )
+    float_detection = FaceDetection(*model_files)
+    blobs = np.concatenate([float_detection.preprocess(image) for image in calibration])
+    calibration_path = os.path.join(args.output_dir, "face_calibration.npy")
+    np.save(calibration_path, blobs)
+    try:
+        int8_detection = FaceDetection(*model_files, calibration=blobs)
+    except cv2.error as e:
+        print(f"Face detection could not be quantized: {e}")
+        return {"accepted": False, "error": str(e)}
+
+    def boxes_match(float_box, int8_box):
+        return int(_boxes_match(float_box, int8_box)), 1
+
+    entry = accuracy_gate(
+        lambda image: float_detection.detect_box(image, 0.1)[0],
+        lambda image: int8_detection.detect_box(image, 0.1)[0],
+        validation,
+        boxes_match,
+        args.min_agreement,
+    )
+    entry["calibration"] = os.path.relpath(calibration_path, args.output_dir)
+    return entry
+
+
+def quantize_yolo(args, calibration, validation):
+    """
+    Export YOLO with INT8 weights and activations through ultralytics.
+    """
+    from ultralytics import YOLO
+
+    from cropper.crop import Cropper
+
+    float_path = os.path.join(args.weights_dir, "yolo/yolo11n.pt")
+    model = YOLO(float_path)
+    with tempfile.TemporaryDirectory() as folder:
+        # ultralytics reads its calibration images through a dataset description
+        data_path = os.path.join(folder, "calibration.yaml")
+        with open(data_path, "w") as f:
+            f.write(f"path: {os.path.abspath(args.calibration_dir)}\n")
+            f.write("train: .\nval: .\nnames:\n")
+            for class_id, name in model.names.items():
+                f.write(f"  {class_id}: {name}\n")
+        int8_path = model.export(
+            format=args.yolo_format, int8=True, data=data_path, imgsz=args.yolo_imgsz
+        )
+
+    float_cropper = Cropper(float_path, imgsz=args.yolo_imgsz)
+    int8_cropper = Cropper(int8_path, imgsz=args.yolo_imgsz)
+
+    def boxes_match(float_box, int8_box):
+        return int(_boxes_match(float_box, int8_box)), 1
+
+    entry = accuracy_gate(
+        float_cropper.crop_box, int8_cropper.crop_box, validation, boxes_match, args.min_agreement
+    )
+    entry["path"] = os.path.relpath(int8_path, args.output_dir)
+    return entry
+
+
+QUANTIZERS = {
+    "segmentation": quantize_segmentation,
+    "face_detection": quantize_face_detection,
+    "yolo": quantize_yolo,
+}
+
+
+def parse_args():
+    src_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    weights_dir = os.path.join(src_dir, "weights")
+    parser = argparse.ArgumentParser(
+        description="Quantize the models to INT8 behind an accuracy gate."
+    )
+    parser.add_argument("--calibration-dir", required=True, help="Folder of calibration images.")
+    parser.add_argument(
+        "--validation-dir",
+        required=True,
+        help="Folder of held-out images the accuracy gate compares on, none of them used "
+        "for calibration.",
+    )
+    parser.add_argument("--weights-dir", default=weights_dir, help="Folder of the float models.")
+    parser.add_argument(
+        "--output-dir",
+        default=os.path.join(weights_dir, "int8"),
+        help="Folder of the INT8 models and their manifest.",
+    )
+    parser.add_argument(
+        "--models",
+        nargs="+",
+        choices=MODEL_NAMES,
+        default=list(MODEL_NAMES),
+        help="Models to quantize.",
+    )
+    parser.add_argument(
+        "--segmentation-saved-model",
+        default=None,
+        help="SavedModel folder the segmentation TFLite model was converted from.",
+    )
+    parser.add_argument("--yolo-format", choices=["openvino", "tflite"], default="openvino")
+    parser.add_argument("--yolo-imgsz", type=int, default=640)
+    parser.add_argument(
+        "--max-calibration-images", type=int, default=64, help="Calibration images used per model."
+    )
+    parser.add_argument(
+        "--min-agreement",
+        type=float,
+        default=0.98,
+        help="Fraction of results matching the float model for an INT8 model to be accepted.",
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    # Scoring on calibration images would hide the quantization loss
+    if os.path.realpath(args.validation_dir) == os.path.realpath(args.calibration_dir):
+        raise SystemExit("The validation images must not be the calibration images.")
+    calibration = load_images(args.calibration_dir)[: args.max_calibration_images]
+    validation = load_images(args.validation_dir)
+    if not calibration or not validation:
+        raise SystemExit("No calibration or validation images found.")
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    manifest_path = os.path.join(args.output_dir, MANIFEST_NAME)
+    manifest = load_manifest(manifest_path)
+    for name in args.models:
+        print(f"Quantizing {name}...")
+        entry = QUANTIZERS[name](args, calibration, validation)
+        if entry is None:
+            continue
+        entry["created"] = datetime.now().isoformat(timespec="seconds")
+        entry["calibration_images"] = len(calibration)
+        manifest["models"][name] = entry
+        # Saved after every model so a failure keeps the earlier results
+        save_manifest(manifest_path, manifest)
+        verdict = "accepted" if entry["accepted"] else "rejected"
+        print(f"{name}: {verdict}, agreement {entry.get('agreement', 0):.1%}")
+    print(f"Manifest saved as: {manifest_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+# src/storage/columnar_sink.py
+
+import glob
+import os
+from datetime import datetime
+
+from formatter.bulk_mrz import load_mrz_array, validate_check_digits
+from formatter.format_mrz import extract_td3
+
+# Pipeline stages whose durations are exported, as timing_<stage>_ms columns
+TIMING_STAGES = ("decode", "dedup", "read_mrz", "parse", "store", "crop")
+# Extension of each supported columnar format
+COLUMNAR_FORMATS = {"parquet": ".parquet", "arrow": ".arrow"}
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+    except ImportError as e:
+        raise ImportError(
+            "Columnar export needs pyarrow, install it with 'pip install pyarrow'"
+        ) from e
+    return pyarrow
+
+
+class ColumnarSink:
+    """
+    Writes extracted records to a Parquet or Arrow IPC file for analytics.
+
+    Every row holds the StoreData fields, the source image, the processing time,
+    the validity of each MRZ check digit and the duration of each pipeline stage.
+    Rows are buffered and written as one row group every row_group_size rows, so
+    a batch run streams to disk and memory stays bounded. Files are named
+    records-YYYYMMDD-HHMMSS.<ext> so a day's output can be read back at once
+    with read_columnar(). Sinks of parallel workers writing to the same folder
+    tell their files apart with a name_suffix.
+    """
+    def __init__(
+        self, output_folder, file_format="parquet", row_group_size=4096, name_suffix=""
+    ):
+        if file_format not in COLUMNAR_FORMATS:
+            raise ValueError(
+                f"Unknown columnar format {file_format!r}, expected one of {sorted(COLUMNAR_FORMATS)}"
+            )
+        self.pa = _import_pyarrow()
+        self.file_format = file_format
+        self.row_group_size = row_group_size
+        os.makedirs(output_folder, exist_ok=True)
+        self.file_path = os.path.join(
+            output_folder,
+            f"records-{datetime.now():%Y%m%d-%H%M%S}{name_suffix}{COLUMNAR_FORMATS[file_format]}",
+        )
+        self.schema = self._build_schema()
+        self._rows = []
+        self._writer = None
+
+    def _build_schema(self):
+        pa = self.pa
+        fields = [
+            ("image_file", pa.string()),
+            ("processed_at", pa.timestamp("ms")),
+            ("country", pa.string()),
+            ("surname", pa.string()),
+            ("given_names", pa.string()),
+            ("dob", pa.string()),
+            ("sex", pa.string()),
+            ("passport_number", pa.string()),
+            ("raw_mrz", pa.string()),
+        ]
+        fields += [
+            (f"{name}_valid", pa.bool_())
+            for name in ("passport_number", "date_of_birth", "expiry_date", "personal_number", "composite")
+        ]
+        fields += [(f"timing_{stage}_ms", pa.float64()) for stage in TIMING_STAGES]
+        return pa.schema(fields)
+
+    def write(self, store_data, timings=None, image_file=None):
+        """
+        Buffer one record; a row group is written once row_group_size rows are buffered.
+
+        timings maps stage names from TIMING_STAGES to durations in seconds.
+        """
+        row = {
+            "image_file": image_file,
+            "processed_at": datetime.now(),
+            "country": store_data.country,
+            "surname": store_data.surname,
+            "given_names": store_data.given_names,
+            "dob": store_data.dob,
+            "sex": store_data.sex,
+            "passport_number": store_data.passport_number,
+            "raw_mrz": store_data.raw_mrz,
+        }
+        timings = timings or {}
+        for stage in TIMING_STAGES:
+            seconds = timings.get(stage)
+            row[f"timing_{stage}_ms"] = seconds * 1000 if seconds is not None else None
+        self._rows.append(row)
+        if len(self._rows) >= self.row_group_size:
+            self.flush()
+
+    def flush(self):
+        """
+        Write the buffered rows as one row group.
+        """
+        if not self._rows:
+            return
+        columns = {name: [row[name] for row in self._rows] for name in self._rows[0]}
+        # Reads are aligned on their document code first, like the rest of the pipeline;
+        # the check digits of the whole row group are then validated in one vectorized pass
+        aligned = [extract_td3([raw_mrz]) or raw_mrz for raw_mrz in columns["raw_mrz"]]
+        checks = validate_check_digits(load_mrz_array(aligned))
+        for name, values in checks.items():
+            columns[name] = values.tolist()
+        table = self.pa.Table.from_pydict(columns, schema=self.schema)
+
+        if self._writer is None:
+            self._writer = self._open_writer()
+        self._writer.write_table(table)
+        self._rows = []
+
+    def _open_writer(self):
+        if self.file_format == "parquet":
+            import pyarrow.parquet as pq
+
+            return pq.ParquetWriter(self.file_path, self.schema, compression="zstd")
+        return self.pa.ipc.new_file(self.file_path, self.schema)
+
+    def close(self):
+        """
+        Write the remaining rows and finalize the file.
+        """
+        self.flush()
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+            print(f"Columnar records saved as: {self.file_path}")
+
+
+def read_columnar(output_folder, day=None):
+    """
+    Read all columnar record files of a day (datetime.date, default today) as one pyarrow Table.
+    """
+    pa = _import_pyarrow()
+    day = day or datetime.now().date()
+    paths = sorted(glob.glob(os.path.join(output_folder, f"records-{day:%Y%m%d}-*")))
+    tables = []
+    for path in paths:
+        if path.endswith(COLUMNAR_FORMATS["parquet"]):
+            import pyarrow.parquet as pq
+
+            tables.append(pq.read_table(path))
+        else:
+            # Memory-mapped, so the record batches are not copied
+            tables.append(pa.ipc.open_file(pa.memory_map(path)).read_all())
+    if not tables:
+        return None
+    return pa.concat_tables(tables)
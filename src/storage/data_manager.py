@@ -1,21 +1,109 @@
-import json
+import contextlib
 import os
+import threading
+import time
+
+from instrumentation.metrics import NULL_METRICS, queue_depth, stage_latency
+from storage.input_index import InputIndex
+from storage.quality_log import QualityLog
+from storage.record_store import (
+    IMPORT_POSITION_KEY,
+    JSON_MIGRATED_KEY,
+    RecordStore,
+    ShardedRecordStore,
+)
 
 class DataManager:
     """
     Handles loading and saving of parsed data to prevent duplicates.
+
+    Records live in an indexed SQLite store (parsed_data.sqlite). An existing
+    parsed_data.json is migrated into it on first use (resuming an interrupted
+    migration), and the JSON file can be regenerated with export_parsed_data().
+
+    Writes are group-committed: save_parsed_data() only commits once
+    commit_every entries are pending or commit_interval_ms has passed since the
+    last commit, and flush()/close() commit whatever is left. With a
+    commit_interval_ms, a background thread also commits pending entries once
+    the interval has passed, so they are not held back while no new input
+    arrives. durability picks how hard each commit syncs to disk ('none',
+    'normal' or 'full').
+
+    Processed inputs are also indexed by file and perceptual hash
+    (input_index.sqlite) so repeated uploads can be recognized before inference.
+    Only identical files match by default; max_hash_distance >= 0 also finds
+    images within that many dHash bits, as candidates to confirm.
+    Inputs failing the quality gate are logged with their reason codes
+    (quality_log.sqlite).
+
+    Nothing is loaded at startup: records are read through the store's index
+    or streamed with iter_parsed_data(). With shards > 1 the store is split over
+    several SQLite files by passport number; a store must always be opened with
+    the shard count it was created with.
+
+    Processes writing to the same output folder (see processing.workers) share
+    a process_lock: every write is then made under that lock, together with the
+    duplicate check of add_entry, and committed at once, so no process holds
+    the database while others wait and a passport read by two processes is
+    stored once. Group commit does not apply in that mode.
+
+    With a metrics registry, the stored records, commit latencies and the number
+    of entries waiting for a commit are exported.
     """
-    def __init__(self, output_folder):
+    def __init__(
+        self,
+        output_folder,
+        commit_every=1,
+        commit_interval_ms=None,
+        durability='normal',
+        max_hash_distance=-1,
+        shards=1,
+        metrics=None,
+        process_lock=None,
+    ):
         self.output_folder = output_folder
         self.documents_folder = os.path.join(output_folder, 'documents')
         self.faces_folder = os.path.join(output_folder, 'faces')
         self.parsed_data_file = os.path.join(output_folder, 'parsed_data.json')
+        self.store_file = os.path.join(output_folder, 'parsed_data.sqlite')
+        self.commit_every = commit_every
+        self.commit_interval_ms = commit_interval_ms
+        self.durability = durability
+        self.shards = shards
+        self._pending = 0
+        self._last_commit = time.monotonic()
+        # Serializes store access between the caller and the background committer
+        self._lock = threading.RLock()
+        self._closing = threading.Event()
+        self._committer = None
+        # multiprocessing lock of the processes sharing the output folder, if any
+        self.process_lock = process_lock
+        metrics = metrics or NULL_METRICS
+        self._stage_latency = stage_latency(metrics)
+        self._records_stored = metrics.counter(
+            "mrz_records_stored_total", "Records added to the record store."
+        )
+        # Read at scrape time, so the queue depth costs nothing per entry
+        queue_depth(metrics).set_function(lambda: self._pending, queue="uncommitted_records")
 
         # Ensure the main output folder and subdirectories exist
         self._ensure_directories()
 
-        # Load the parsed data from the JSON file
-        self.parsed_data = self.load_parsed_data()
+        # Open the record store, migrating the legacy JSON file if needed
+        self.store = self._open_store()
+        self.input_index = InputIndex(
+            os.path.join(output_folder, 'input_index.sqlite'),
+            max_distance=max_hash_distance,
+            durability=durability,
+        )
+        self.quality_log = QualityLog(
+            os.path.join(output_folder, 'quality_log.sqlite'), durability=durability
+        )
+        if commit_interval_ms is not None:
+            self._committer = threading.Thread(
+                target=self._commit_periodically, name='data-manager-commit', daemon=True
+            )
+            self._committer.start()
 
     def _ensure_directories(self):
         """
@@ -25,34 +113,197 @@ class DataManager:
         os.makedirs(self.documents_folder, exist_ok=True)
         os.makedirs(self.faces_folder, exist_ok=True)
 
-    def load_parsed_data(self):
+    def _open_store(self):
         """
-        Load existing parsed data from JSON file.
+        Open the record store and import parsed_data.json unless that finished before.
+
+        An interrupted import is resumed. A store that already holds records
+        without any import recorded (created before imports were tracked) counts
+        as migrated.
         """
-        if os.path.exists(self.parsed_data_file):
-            with open(self.parsed_data_file, 'r') as f:
-                return json.load(f)
+        if self.shards > 1:
+            if os.path.exists(self.store_file):
+                raise ValueError(f"{self.store_file} is not sharded, not split over {self.shards}")
+            store = ShardedRecordStore(self.store_file, self.shards, durability=self.durability)
         else:
-            return []
+            stored_shards = ShardedRecordStore.stored_shard_count(self.store_file)
+            if stored_shards is not None:
+                raise ValueError(f"{self.store_file} is split over {stored_shards} shards, not 1")
+            store = RecordStore(self.store_file, durability=self.durability)
+        if store.get_meta(JSON_MIGRATED_KEY):
+            return store
+        resuming = store.get_meta(IMPORT_POSITION_KEY) is not None
+        if os.path.exists(self.parsed_data_file) and (resuming or not len(store)):
+            count = store.import_json(self.parsed_data_file)
+            print(f"Migrated {count} records from {self.parsed_data_file}")
+        # From now on parsed_data.json is an export of the store, never imported again
+        store.set_meta(JSON_MIGRATED_KEY, True)
+        store.commit()
+        return store
+
+    def iter_parsed_data(self):
+        """
+        Stream the parsed data from the record store, one batch in memory at a time.
+        """
+        return iter(self.store)
 
     def is_duplicate(self, passport_number):
         """
         Check if a passport number already exists in the parsed data.
         """
-        return any(entry['Passport Number'] == passport_number for entry in self.parsed_data)
+        with self._lock:
+            return self.store.contains(passport_number)
+
+    def get_entry(self, passport_number):
+        """
+        Return the stored entry for a passport number, or None.
+        """
+        with self._lock:
+            return self.store.get(passport_number)
+
+    def find_input(self, sha256, dhash):
+        """
+        Return (passport number, "file" or "similar") for an already processed input,
+        or (None, None).
+        """
+        with self._lock:
+            return self.input_index.find(sha256, dhash)
+
+    @contextlib.contextmanager
+    def _writing(self):
+        """
+        Hold the locks of a write; with a process_lock, also commit it before releasing.
+        """
+        if self.process_lock is None:
+            with self._lock:
+                yield
+            return
+        with self.process_lock, self._lock:
+            yield
+            self.flush()
+
+    def add_input(self, sha256, dhash, passport_number):
+        """
+        Remember a processed input and the passport number it produced.
+        """
+        with self._writing():
+            self.input_index.add(sha256, dhash, passport_number)
+
+    def add_quality_result(self, input_name, reasons, metrics, rejected):
+        """
+        Log an input that failed the quality gate; committed with the next entries.
+        """
+        with self._writing():
+            self.quality_log.add(input_name, reasons, metrics, rejected)
+            self._pending += 1
 
     def add_entry(self, entry):
         """
         Add a new entry to the parsed data.
+
+        Returns False without adding it when its passport number is already
+        stored, e.g. by another process since the caller checked is_duplicate().
         """
-        self.parsed_data.append(entry)
+        with self._writing():
+            if self.store.contains(entry.get('Passport Number', '')):
+                return False
+            self.store.append(entry)
+            self._pending += 1
+        self._records_stored.inc()
+        return True
+
+    def rebuild_records(self, rebuild, commit_every=1000):
+        """
+        Replace stored records by rebuild(record), which returns (record, changes).
+
+        Only records with changes are written. This is a generator yielding
+        (record id, passport number, changes) per changed record; the store stays
+        locked, also against the processes sharing the process_lock, until it is
+        exhausted. Records moving to another shard are moved after the pass, so
+        that it does not visit them twice.
+        """
+        with self._writing():
+            moves = []
+            changed = 0
+            for record_id, entry in self.store.iter_records():
+                updated, changes = rebuild(entry)
+                if not changes:
+                    continue
+                if self.store.moves_record(record_id, updated):
+                    moves.append((record_id, updated))
+                else:
+                    self.store.update(record_id, updated)
+                changed += 1
+                if changed % commit_every == 0:
+                    self.flush()
+                yield record_id, updated.get('Passport Number', ''), changes
+            for record_id, updated in moves:
+                self.store.update(record_id, updated)
+            self.flush()
 
     def save_parsed_data(self):
         """
-        Save the parsed data to the JSON file.
+        Commit the new entries to the record store if the write policy says so.
+        """
+        with self._lock:
+            if not self._pending:
+                return
+            due = self._pending >= self.commit_every
+            if self.commit_interval_ms is not None:
+                elapsed_ms = (time.monotonic() - self._last_commit) * 1000
+                due = due or elapsed_ms >= self.commit_interval_ms
+            if due:
+                self.flush()
+
+    def _commit_periodically(self):
+        """
+        Body of the committer thread: commit pending entries once commit_interval_ms passed.
+        """
+        interval = self.commit_interval_ms / 1000
+        while True:
+            with self._lock:
+                if self._pending and time.monotonic() - self._last_commit >= interval:
+                    self.flush()
+                wait = self._last_commit + interval - time.monotonic()
+            # Poll at a tenth of the interval while the last commit is older than that
+            if self._closing.wait(max(wait, interval / 10)):
+                return
+
+    def flush(self):
+        """
+        Commit all pending entries now.
+        """
+        with self._lock:
+            started = time.perf_counter()
+            self.store.commit()
+            self.input_index.commit()
+            self.quality_log.commit()
+            self._stage_latency.observe(time.perf_counter() - started, stage="commit")
+            self._pending = 0
+            self._last_commit = time.monotonic()
+
+    def export_parsed_data(self, file_path=None):
+        """
+        Export the record store to a JSON file (parsed_data.json by default).
+        """
+        file_path = file_path or self.parsed_data_file
+        with self._lock:
+            self.flush()
+            count = self.store.export_json(file_path)
+        print(f"Exported {count} records to {file_path}")
+        return count
+
+    def close(self):
+        """
+        Commit pending entries and close the record store.
         """
-        with open(self.parsed_data_file, 'w') as f:
-            json.dump(self.parsed_data, f, indent=4)
+        if self._committer is not None:
+            self._closing.set()
+            self._committer.join()
+        self.flush()
+        self.store.close()
+        self.input_index.close()
+        self.quality_log.close()
 
     def get_document_folder(self):
         """
@@ -0,0 +1,145 @@
+# src/storage/image_writer.py
+
+import atexit
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+
+from instrumentation.metrics import NULL_METRICS, queue_depth, stage_latency
+from instrumentation.tracing import NULL_TRACER
+
+# Extension and OpenCV quality flag for each supported output format
+IMAGE_FORMATS = {
+    'jpeg': ('.jpg', cv2.IMWRITE_JPEG_QUALITY),
+    'webp': ('.webp', cv2.IMWRITE_WEBP_QUALITY),
+    'png': ('.png', None),
+}
+
+
+class ImageWriter:
+    """
+    Encodes and writes output images (faces and documents) on a background thread pool.
+
+    At most max_pending images wait to be written; submit() blocks once that many
+    are queued so a slow disk cannot grow memory without limit. Pending images are
+    always written before the interpreter exits.
+    """
+    def __init__(
+        self,
+        image_format='jpeg',
+        quality=95,
+        max_dimension=None,
+        save_faces=True,
+        save_documents=True,
+        workers=2,
+        max_pending=8,
+        tracer=None,
+        metrics=None,
+    ):
+        if image_format not in IMAGE_FORMATS:
+            raise ValueError(
+                f"Unknown image format {image_format!r}, expected one of {sorted(IMAGE_FORMATS)}"
+            )
+        self.image_format = image_format
+        self.quality = quality
+        self.max_dimension = max_dimension
+        self.save_faces = save_faces
+        self.save_documents = save_documents
+        self.extension, quality_flag = IMAGE_FORMATS[image_format]
+        self._encode_params = [quality_flag, int(quality)] if quality_flag is not None else []
+        self.tracer = tracer or NULL_TRACER
+        metrics = metrics or NULL_METRICS
+        self._stage_latency = stage_latency(metrics)
+
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='image-writer')
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._closed = False
+        queue_depth(metrics).set_function(lambda: len(self._pending), queue="image_writer")
+        atexit.register(self.close)
+
+    def path_for(self, folder, name):
+        """
+        Return the output path for an image name (without extension) in a folder.
+        """
+        return os.path.join(folder, name + self.extension)
+
+    def submit(self, image, path):
+        """
+        Queue an image to be written to path. The image must not be modified afterwards.
+        """
+        if self._closed:
+            raise RuntimeError("ImageWriter is closed")
+        self._slots.acquire()
+        future = self._executor.submit(self._write, image, path)
+        with self._lock:
+            self._pending.add(future)
+        future.add_done_callback(self._release)
+        return future
+
+    def _release(self, future):
+        with self._lock:
+            self._pending.discard(future)
+        self._slots.release()
+
+    def _write(self, image, path):
+        """
+        Downscale, encode and write one image.
+        """
+        try:
+            with self.tracer.span(
+                "write", height=image.shape[0], width=image.shape[1]
+            ) as span:
+                if self.max_dimension:
+                    height, width = image.shape[:2]
+                    scale = self.max_dimension / max(height, width)
+                    if scale < 1:
+                        image = cv2.resize(
+                            image,
+                            (max(1, round(width * scale)), max(1, round(height * scale))),
+                            interpolation=cv2.INTER_AREA,
+                        )
+                success, encoded = cv2.imencode(self.extension, image, self._encode_params)
+                if not success:
+                    raise ValueError(f"Could not encode image as {self.image_format}")
+                with open(path, 'wb') as f:
+                    f.write(encoded.tobytes())
+            self._stage_latency.observe(span.duration, stage="write")
+            print(f"Image saved as: {path}")
+        except Exception as e:
+            print(f"Saving image {path} failed: {e}")
+            raise
+
+    def flush(self):
+        """
+        Block until every queued image has been written.
+        """
+        with self._lock:
+            pending = list(self._pending)
+        for future in pending:
+            try:
+                future.result()
+            except Exception:
+                # Already reported by _write
+                pass
+
+    def close(self):
+        """
+        Write all queued images and stop the worker threads.
+        """
+        if self._closed:
+            return
+        self.flush()
+        self._closed = True
+        self._executor.shutdown(wait=True)
+        atexit.unregister(self.close)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
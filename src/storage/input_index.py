@@ -0,0 +1,155 @@
+# src/storage/input_index.py
+
+import hashlib
+import itertools
+import sqlite3
+
+import cv2
+
+from storage.record_store import DURABILITY_MODES
+
+# dHash grid: a 17x16 thumbnail gives a 256-bit hash
+HASH_SIZE = 16
+HASH_BITS = HASH_SIZE * HASH_SIZE
+BAND_BITS = 16
+BANDS = HASH_BITS // BAND_BITS
+# Keeps the band probes of one query within SQLite's bound parameter limit
+MAX_DISTANCE = 63
+
+
+def file_sha256(data):
+    """
+    Return the hex SHA-256 of the raw bytes of an input file.
+    """
+    return hashlib.sha256(data).hexdigest()
+
+
+def compute_dhash(image):
+    """
+    Return the 256-bit difference hash (dHash) of an image.
+
+    The image is reduced to a 17x16 grayscale thumbnail and each bit records
+    whether a pixel is brighter than its right neighbour, so re-encodes and
+    small exposure changes of the same page map to nearby hashes. Pages sharing
+    a layout can still hash close together, see InputIndex.
+    """
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    thumbnail = cv2.resize(gray, (HASH_SIZE + 1, HASH_SIZE), interpolation=cv2.INTER_AREA)
+    bits = (thumbnail[:, 1:] > thumbnail[:, :-1]).flatten()
+    value = 0
+    for bit in bits:
+        value = (value << 1) | int(bit)
+    return value
+
+
+def _bands(dhash):
+    """
+    Split a HASH_BITS-bit hash into BANDS integers of BAND_BITS bits.
+    """
+    mask = (1 << BAND_BITS) - 1
+    return [(dhash >> (BAND_BITS * band)) & mask for band in range(BANDS)]
+
+
+def _neighbours(value, radius):
+    """
+    Yield every BAND_BITS-bit value within the given Hamming radius of value.
+    """
+    for distance in range(radius + 1):
+        for positions in itertools.combinations(range(BAND_BITS), distance):
+            flipped = value
+            for position in positions:
+                flipped ^= 1 << position
+            yield flipped
+
+
+class InputIndex:
+    """
+    Index of processed input images for duplicate detection before inference.
+
+    Every input is stored with the SHA-256 of its file bytes and the dHash of its
+    pixels. Exact re-uploads are found through the SHA-256 primary key. With a
+    max_distance of 0 or more, similar images are found too, through a
+    multi-index hash: the 256-bit dHash is split into sixteen indexed 16-bit
+    bands, and by the pigeonhole principle two hashes within max_distance bits
+    share at least one band within max_distance // 16 bits, so only a handful of
+    indexed probes are needed even with millions of entries.
+
+    Different passports with the same page layout can hash within a few bits of
+    each other, so a similar match is only a candidate to confirm (see
+    PassportProcessor); perceptual matching is off by default.
+    """
+    def __init__(self, db_path, max_distance=-1, durability='normal'):
+        if not -1 <= max_distance <= MAX_DISTANCE:
+            raise ValueError(f"max_distance must be between -1 and {MAX_DISTANCE}")
+        self.db_path = db_path
+        self.max_distance = max_distance
+        # DataManager may commit from its background thread, it serializes every access
+        self.connection = sqlite3.connect(db_path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(f"PRAGMA synchronous={DURABILITY_MODES[durability]}")
+        band_columns = ", ".join(f"band{band} INTEGER NOT NULL" for band in range(BANDS))
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS inputs ("
+            " sha256 TEXT PRIMARY KEY,"
+            " dhash TEXT NOT NULL,"
+            f" {band_columns},"
+            " passport_number TEXT NOT NULL)"
+        )
+        for band in range(BANDS):
+            self.connection.execute(
+                f"CREATE INDEX IF NOT EXISTS inputs_band{band} ON inputs (band{band})"
+            )
+        self.connection.commit()
+
+    def find(self, sha256, dhash=None):
+        """
+        Return (passport number, match) for a matching processed input, or (None, None).
+
+        match is "file" for an exact file match, which wins, and "similar" for the
+        closest stored dHash within max_distance bits (perceptual matching is off
+        when max_distance is -1).
+        """
+        row = self.connection.execute(
+            "SELECT passport_number FROM inputs WHERE sha256 = ?", (sha256,)
+        ).fetchone()
+        if row is not None:
+            return row[0], "file"
+        if dhash is None or self.max_distance < 0:
+            return None, None
+
+        radius = self.max_distance // BANDS
+        best = None
+        for band, value in enumerate(_bands(dhash)):
+            probes = list(_neighbours(value, radius))
+            placeholders = ", ".join("?" * len(probes))
+            rows = self.connection.execute(
+                f"SELECT dhash, passport_number FROM inputs WHERE band{band} IN ({placeholders})",
+                probes,
+            )
+            for stored_hash, passport_number in rows:
+                distance = bin(int(stored_hash, 16) ^ dhash).count("1")
+                if distance <= self.max_distance and (best is None or distance < best[0]):
+                    best = (distance, passport_number)
+        return (best[1], "similar") if best else (None, None)
+
+    def add(self, sha256, dhash, passport_number):
+        """
+        Record a processed input. The write becomes durable on the next commit.
+        """
+        self.connection.execute(
+            f"INSERT OR REPLACE INTO inputs VALUES (?, ?, {', '.join('?' * BANDS)}, ?)",
+            (sha256, f"{dhash:0{HASH_BITS // 4}x}", *_bands(dhash), passport_number),
+        )
+
+    def commit(self):
+        """
+        Commit pending additions.
+        """
+        self.connection.commit()
+
+    def close(self):
+        """
+        Commit pending additions and close the index.
+        """
+        self.connection.commit()
+        self.connection.close()
@@ -0,0 +1,129 @@
+# src/storage/json_stream.py
+
+import json
+import os
+import tempfile
+import textwrap
+
+
+def iter_json_array(file_path, chunk_size=1 << 16):
+    """
+    Yield the items of a JSON array file one at a time.
+
+    Only the current chunk of the file and the item being decoded are held in
+    memory, so parsed data files of any size can be streamed.
+    """
+    decoder = json.JSONDecoder()
+    with open(file_path, 'r') as f:
+        buffer = f.read(chunk_size)
+        position = _skip(buffer, 0)
+        if buffer[position:position + 1] != '[':
+            raise ValueError(f"{file_path} does not contain a JSON array")
+        position += 1
+        at_eof = False
+        expect_item = True
+
+        while True:
+            position = _skip(buffer, position)
+            if position < len(buffer):
+                if buffer[position] == ']':
+                    return
+                if not expect_item:
+                    if buffer[position] != ',':
+                        raise ValueError(f"Expected ',' or ']' in {file_path}")
+                    expect_item = True
+                    position += 1
+                    continue
+                # An item is only complete once something follows it (',' or ']')
+                try:
+                    item, end = decoder.raw_decode(buffer, position)
+                    if end < len(buffer) or at_eof:
+                        yield item
+                        position = end
+                        expect_item = False
+                        continue
+                except json.JSONDecodeError:
+                    if at_eof:
+                        raise
+
+            if at_eof:
+                raise ValueError(f"Unexpected end of {file_path}")
+            chunk = f.read(chunk_size)
+            at_eof = not chunk
+            buffer = buffer[position:] + chunk
+            position = 0
+
+
+def _skip(buffer, position):
+    """
+    Return the position of the next non-whitespace character.
+    """
+    while position < len(buffer) and buffer[position] in ' \t\n\r':
+        position += 1
+    return position
+
+
+class JsonArrayWriter:
+    """
+    Writes a JSON array one item at a time and atomically replaces the target file.
+
+    The output matches json.dump(items, f, indent=4). Items are written to a
+    temporary file next to the target, which only replaces the target on a clean
+    exit, so a crash never leaves a truncated file behind. With fsync enabled the
+    data and the rename are flushed to disk before returning.
+    """
+    def __init__(self, file_path, fsync=True):
+        self.file_path = file_path
+        self.fsync = fsync
+        self.count = 0
+        self._file = None
+
+    def __enter__(self):
+        directory = os.path.dirname(os.path.abspath(self.file_path))
+        fd, self._temp_path = tempfile.mkstemp(
+            prefix='.' + os.path.basename(self.file_path), suffix='.tmp', dir=directory
+        )
+        self._file = os.fdopen(fd, 'w')
+        self._file.write('[')
+        return self
+
+    def write(self, item):
+        """
+        Append one item to the array.
+        """
+        separator = ',\n' if self.count else '\n'
+        self._file.write(separator + textwrap.indent(json.dumps(item, indent=4), '    '))
+        self.count += 1
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            if exc_type is None:
+                self._file.write('\n]' if self.count else ']')
+                self._file.flush()
+                if self.fsync:
+                    os.fsync(self._file.fileno())
+            self._file.close()
+            if exc_type is None:
+                os.replace(self._temp_path, self.file_path)
+                if self.fsync:
+                    _fsync_directory(os.path.dirname(os.path.abspath(self.file_path)))
+        finally:
+            if os.path.exists(self._temp_path):
+                os.remove(self._temp_path)
+        return False
+
+
+def _fsync_directory(directory):
+    """
+    Flush a directory entry change (such as a rename) to disk where supported.
+    """
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
@@ -0,0 +1,72 @@
+# src/storage/quality_log.py
+
+import json
+import sqlite3
+from datetime import datetime
+
+from storage.record_store import DURABILITY_MODES
+
+
+class QualityLog:
+    """
+    Record of the inputs that failed the quality gate.
+
+    Every rejected or flagged input is stored with its reason codes and quality
+    metrics, so rejected uploads leave a trace although they produce no record
+    and thresholds can be tuned on the logged metrics.
+    """
+    def __init__(self, db_path, durability='normal'):
+        self.db_path = db_path
+        # DataManager may commit from its background thread, it serializes every access
+        self.connection = sqlite3.connect(db_path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(f"PRAGMA synchronous={DURABILITY_MODES[durability]}")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS assessments ("
+            " id INTEGER PRIMARY KEY,"
+            " input TEXT NOT NULL,"
+            " rejected INTEGER NOT NULL,"
+            " reasons TEXT NOT NULL,"
+            " metrics TEXT NOT NULL,"
+            " assessed_at TEXT NOT NULL)"
+        )
+        self.connection.commit()
+
+    def add(self, input_name, reasons, metrics, rejected):
+        """
+        Record a failed assessment. The write becomes durable on the next commit.
+        """
+        self.connection.execute(
+            "INSERT INTO assessments (input, rejected, reasons, metrics, assessed_at)"
+            " VALUES (?, ?, ?, ?, ?)",
+            (
+                input_name,
+                int(rejected),
+                ",".join(reasons),
+                json.dumps(metrics),
+                datetime.now().isoformat(timespec="seconds"),
+            ),
+        )
+
+    def reason_counts(self):
+        """
+        Return {reason code: number of assessments} over the whole log.
+        """
+        counts = {}
+        for (reasons,) in self.connection.execute("SELECT reasons FROM assessments"):
+            for reason in reasons.split(","):
+                counts[reason] = counts.get(reason, 0) + 1
+        return counts
+
+    def commit(self):
+        """
+        Commit pending assessments.
+        """
+        self.connection.commit()
+
+    def close(self):
+        """
+        Commit pending assessments and close the log.
+        """
+        self.connection.commit()
+        self.connection.close()
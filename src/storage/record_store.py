@@ -0,0 +1,378 @@
+# src/storage/record_store.py
+
+import json
+import os
+import sqlite3
+import zlib
+
+from storage.json_stream import iter_json_array, JsonArrayWriter
+
+
+# SQLite synchronous level for each durability mode
+DURABILITY_MODES = {
+    'none': 'OFF',  # never fsync, the OS decides when data reaches the disk
+    'normal': 'NORMAL',  # survives process crashes, may lose the last batches on power loss
+    'full': 'FULL',  # fsync on every commit, i.e. once per batch
+}
+
+# Meta keys: records of the legacy JSON file imported so far, and whether the import finished
+IMPORT_POSITION_KEY = 'json_import_position'
+JSON_MIGRATED_KEY = 'json_migrated'
+# Meta key of a sharded store's shard count, kept in its first shard
+SHARDS_KEY = 'shards'
+
+
+class BaseRecordStore:
+    """
+    Streaming import, export and iteration shared by the record stores.
+    Subclasses provide append, commit and iter_records.
+    """
+    # Records imported per transaction, so migrating a large file keeps the WAL small
+    import_batch_size = 10000
+
+    def __iter__(self):
+        for _, entry in self.iter_records():
+            yield entry
+
+    def import_json(self, json_path):
+        """
+        Append every record of a parsed data JSON file, streaming it from disk.
+
+        The position reached in the file is stored with every batch, in the same
+        transaction as its records, so calling this again after an interruption
+        resumes the import instead of appending records twice. Returns the number
+        of records appended by this call.
+        """
+        stores = self._import_stores()
+        resume_at = [store.get_meta(IMPORT_POSITION_KEY, 0) for store in stores]
+        # Mark the import as started before any record is written
+        self._commit_import(stores, resume_at, 0)
+        count = 0
+        position = 0
+        for position, entry in enumerate(iter_json_array(json_path), start=1):
+            index = self._import_index(entry)
+            if position <= resume_at[index]:
+                continue
+            stores[index].append(entry)
+            count += 1
+            if position % self.import_batch_size == 0:
+                self._commit_import(stores, resume_at, position)
+        self._commit_import(stores, resume_at, position)
+        return count
+
+    def _import_stores(self):
+        """
+        Return the RecordStores committed separately during an import.
+        """
+        return [self]
+
+    def _import_index(self, entry):
+        """
+        Return the index, within _import_stores(), of the store receiving entry.
+        """
+        return 0
+
+    @staticmethod
+    def _commit_import(stores, resume_at, position):
+        """
+        Commit every store together with the file position its records reached.
+        """
+        for store, resumed in zip(stores, resume_at):
+            # A store already past this position from an earlier run keeps its own
+            store.set_meta(IMPORT_POSITION_KEY, max(position, resumed))
+            store.commit()
+
+    def moves_record(self, record_id, entry):
+        """
+        Return whether update(record_id, entry) would move the record to another shard.
+        """
+        return False
+
+    def export_json(self, json_path):
+        """
+        Write all records to a parsed data JSON file in the legacy format.
+        """
+        with JsonArrayWriter(json_path, fsync=self.durability != 'none') as writer:
+            for entry in self:
+                writer.write(entry)
+        return writer.count
+
+
+class RecordStore(BaseRecordStore):
+    """
+    Append-only SQLite store for parsed passport records.
+
+    Each record is kept as JSON text next to an indexed passport number, so
+    duplicate lookups and appends cost the same whatever the size of the store,
+    unlike rewriting and scanning the whole parsed data file for every image.
+    The database runs in WAL mode, so a commit is atomic and a crash never
+    leaves a half-written store behind. Opening the store does not read any
+    record, and SQLite's page cache is capped at cache_kib, so memory use does
+    not grow with the number of records.
+    """
+    def __init__(self, db_path, durability='normal', cache_kib=2048):
+        if durability not in DURABILITY_MODES:
+            raise ValueError(
+                f"Unknown durability mode {durability!r}, expected one of {sorted(DURABILITY_MODES)}"
+            )
+        self.db_path = db_path
+        self.durability = durability
+        # DataManager may commit from its background thread, it serializes every access
+        self.connection = sqlite3.connect(db_path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(f"PRAGMA synchronous={DURABILITY_MODES[durability]}")
+        self.connection.execute(f"PRAGMA cache_size=-{int(cache_kib)}")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS records ("
+            " id INTEGER PRIMARY KEY,"
+            " passport_number TEXT NOT NULL,"
+            " data TEXT NOT NULL)"
+        )
+        self.connection.execute(
+            "CREATE INDEX IF NOT EXISTS records_passport_number"
+            " ON records (passport_number)"
+        )
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)"
+        )
+        self.connection.commit()
+
+    def get_meta(self, key, default=None):
+        """
+        Return a value stored in the meta table, or default.
+        """
+        row = self.connection.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set_meta(self, key, value):
+        """
+        Store a JSON-serializable value in the meta table, written on the next commit.
+        """
+        self.connection.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, json.dumps(value))
+        )
+
+    def contains(self, passport_number):
+        """
+        Check if a record with this passport number exists.
+        """
+        row = self.connection.execute(
+            "SELECT 1 FROM records WHERE passport_number = ? LIMIT 1", (passport_number,)
+        ).fetchone()
+        return row is not None
+
+    def get(self, passport_number):
+        """
+        Return the first record stored for a passport number, or None.
+        """
+        row = self.connection.execute(
+            "SELECT data FROM records WHERE passport_number = ? ORDER BY id LIMIT 1",
+            (passport_number,),
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def append(self, entry):
+        """
+        Append a record. The write becomes durable on the next commit.
+        """
+        cursor = self.connection.execute(
+            "INSERT INTO records (passport_number, data) VALUES (?, ?)",
+            (entry.get('Passport Number', ''), json.dumps(entry)),
+        )
+        return cursor.lastrowid
+
+    def update(self, record_id, entry):
+        """
+        Replace the record stored under record_id.
+        """
+        self.connection.execute(
+            "UPDATE records SET passport_number = ?, data = ? WHERE id = ?",
+            (entry.get('Passport Number', ''), json.dumps(entry), record_id),
+        )
+
+    def commit(self):
+        """
+        Commit all pending appends and updates.
+        """
+        self.connection.commit()
+
+    def iter_records(self, batch_size=1000):
+        """
+        Yield (record id, record) pairs in insertion order, one batch in memory at a time.
+        """
+        last_id = 0
+        while True:
+            rows = self.connection.execute(
+                "SELECT id, data FROM records WHERE id > ? ORDER BY id LIMIT ?",
+                (last_id, batch_size),
+            ).fetchall()
+            if not rows:
+                return
+            for record_id, data in rows:
+                yield record_id, json.loads(data)
+            last_id = rows[-1][0]
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM records").fetchone()[0]
+
+    def close(self):
+        """
+        Commit pending writes and close the database.
+        """
+        self.connection.commit()
+        self.connection.close()
+
+
+class ShardedRecordStore(BaseRecordStore):
+    """
+    Record store split over several SQLite files by a hash of the passport number.
+
+    Each shard is a RecordStore named <base>-<shard>.sqlite, so the files stay
+    small enough to copy, vacuum and back up independently. Lookups only touch
+    the shard the passport number hashes to. Record ids are (shard, row id) pairs
+    and iteration goes shard by shard.
+
+    The shard count is stored with the records, and opening an existing store
+    with another count raises ValueError, as passport numbers would hash to
+    other shards than the ones holding their records.
+    """
+    def __init__(self, db_path, shards, durability='normal', cache_kib=2048):
+        existing = self.stored_shard_count(db_path)
+        if existing is not None and existing != shards:
+            raise ValueError(f"{db_path} is split over {existing} shards, not {shards}")
+        self.db_path = db_path
+        self.durability = durability
+        self.shards = [
+            RecordStore(
+                self.shard_path(db_path, shard),
+                durability=durability,
+                cache_kib=max(1, cache_kib // shards),
+            )
+            for shard in range(shards)
+        ]
+        if existing is None or self.get_meta(SHARDS_KEY) is None:
+            self.set_meta(SHARDS_KEY, shards)
+            self.commit()
+
+    @classmethod
+    def stored_shard_count(cls, db_path):
+        """
+        Return the shard count of an existing sharded store, or None when there is none.
+        """
+        first_shard = cls.shard_path(db_path, 0)
+        if not os.path.exists(first_shard):
+            return None
+        connection = sqlite3.connect(first_shard)
+        try:
+            row = connection.execute(
+                "SELECT value FROM meta WHERE key = ?", (SHARDS_KEY,)
+            ).fetchone()
+        except sqlite3.OperationalError:
+            # No meta table yet
+            row = None
+        finally:
+            connection.close()
+        if row is not None:
+            return json.loads(row[0])
+        # Stores written before the count was recorded: count their files
+        count = 0
+        while os.path.exists(cls.shard_path(db_path, count)):
+            count += 1
+        return count
+
+    @staticmethod
+    def shard_path(db_path, shard):
+        """
+        Return the file name of one shard of a store.
+        """
+        base, extension = os.path.splitext(db_path)
+        return f"{base}-{shard:02d}{extension}"
+
+    def get_meta(self, key, default=None):
+        """
+        Return a value of the store's meta table, kept in the first shard, or default.
+        """
+        return self.shards[0].get_meta(key, default)
+
+    def set_meta(self, key, value):
+        """
+        Store a value in the first shard's meta table, written on the next commit.
+        """
+        self.shards[0].set_meta(key, value)
+
+    def _import_stores(self):
+        return self.shards
+
+    def _import_index(self, entry):
+        return self._shard_index(entry.get('Passport Number', ''))
+
+    def _shard_index(self, passport_number):
+        return zlib.crc32(passport_number.encode('utf-8')) % len(self.shards)
+
+    def _shard(self, passport_number):
+        return self.shards[self._shard_index(passport_number)]
+
+    def contains(self, passport_number):
+        """
+        Check if a record with this passport number exists.
+        """
+        return self._shard(passport_number).contains(passport_number)
+
+    def get(self, passport_number):
+        """
+        Return the first record stored for a passport number, or None.
+        """
+        return self._shard(passport_number).get(passport_number)
+
+    def append(self, entry):
+        """
+        Append a record to its shard. The write becomes durable on the next commit.
+        """
+        shard = self._shard_index(entry.get('Passport Number', ''))
+        return shard, self.shards[shard].append(entry)
+
+    def moves_record(self, record_id, entry):
+        """
+        Return whether update(record_id, entry) would move the record to another shard.
+        """
+        return self._shard_index(entry.get('Passport Number', '')) != record_id[0]
+
+    def update(self, record_id, entry):
+        """
+        Replace the record stored under record_id, moving it if its shard changed.
+
+        A moved record gets a new id in its new shard, so moves made while
+        iter_records() runs can visit it twice; see moves_record().
+        """
+        shard, row_id = record_id
+        target = self._shard_index(entry.get('Passport Number', ''))
+        if target == shard:
+            self.shards[shard].update(row_id, entry)
+        else:
+            self.shards[shard].connection.execute("DELETE FROM records WHERE id = ?", (row_id,))
+            self.shards[target].append(entry)
+
+    def commit(self):
+        """
+        Commit all pending appends and updates of every shard.
+        """
+        for shard in self.shards:
+            shard.commit()
+
+    def iter_records(self, batch_size=1000):
+        """
+        Yield ((shard, row id), record) pairs, one batch of one shard in memory at a time.
+        """
+        for index, shard in enumerate(self.shards):
+            for row_id, entry in shard.iter_records(batch_size):
+                yield (index, row_id), entry
+
+    def __len__(self):
+        return sum(len(shard) for shard in self.shards)
+
+    def close(self):
+        """
+        Commit pending writes and close every shard.
+        """
+        for shard in self.shards:
+            shard.close()
@@ -15,11 +15,11 @@ class StoreData:
         self.passport_number = passport_number
         self.raw_mrz = raw_mrz
 
-    def create_json_object(self):
+    def as_dict(self):
         """
-        Create a JSON object with the passport details.
+        Return the passport details as a record of the parsed data file.
         """
-        passport_data = {
+        return {
             "Country": self.country,
             "Surname": self.surname,
             "Given Names": self.given_names,
@@ -29,7 +29,11 @@ class StoreData:
             "raw_mrz": self.raw_mrz
         }
 
-        return json.dumps(passport_data, indent=4)
+    def create_json_object(self):
+        """
+        Create a JSON object with the passport details.
+        """
+        return json.dumps(self.as_dict(), indent=4)
 
     def save_to_file(self, file_path):
         """
@@ -0,0 +1,7 @@
+# tests/conftest.py
+
+import os
+import sys
+
+# The packages are imported from src/, as when running main.py
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), "src"))
@@ -0,0 +1,164 @@
+# tests/test_bulk_mrz.py
+
+from datetime import date
+
+import numpy as np
+import pytest
+
+from formatter.bulk_mrz import (
+    compute_check_digits,
+    is_valid_td3,
+    load_mrz_array,
+    parse_mrz_bulk,
+    validate_check_digits,
+)
+from formatter.format_mrz import convert_date, parse_mrz
+
+LINE2 = "L898902C36UTO7408122F1204159ZE184226B<<<<<10"
+
+
+def check_digit(field):
+    values = [
+        0 if c == "<" else int(c) if c.isdigit() else ord(c) - ord("A") + 10 for c in field
+    ]
+    return str(sum(value * (7, 3, 1)[i % 3] for i, value in enumerate(values)) % 10)
+
+
+def td3(names):
+    return ("P<UTO" + names).ljust(44, "<")[:44] + LINE2
+
+
+@pytest.mark.parametrize(
+    "names",
+    [
+        "ERIKSSON<<ANNA<MARIA",
+        "ERIKSSON<<ANNA<<MARIA",
+        "ERIKSSON<<ANNA<<<MARIA<<<<JOHANNA",
+        "ERIKSSON<<<ANNA",
+        "ERIKSSON",
+        "ERIKSSON<<",
+        "O<CONNOR<<SEAN",
+    ],
+)
+def test_names_match_scalar_parser(names):
+    mrz = td3(names)
+    scalar = parse_mrz([mrz])
+    bulk = parse_mrz_bulk([mrz])
+    assert bulk["surname"][0].decode() == scalar["surname"]
+    assert bulk["given_names"][0].decode() == " ".join(scalar["given_names"])
+
+
+def test_double_filler_given_names():
+    bulk = parse_mrz_bulk([td3("ERIKSSON<<ANNA<<MARIA")])
+    assert bulk["given_names"][0] == b"ANNA MARIA"
+
+
+_line2 = "<<<<<<<<<0UTO7408122F1204159ZE184226B<<<<<1"
+LINE2_WITHOUT_NUMBER = _line2 + check_digit(_line2[0:10] + _line2[13:20] + _line2[21:43])
+
+
+def test_is_valid_td3_accepts_a_complete_read():
+    assert is_valid_td3(td3("ERIKSSON<<ANNA<MARIA"))
+
+
+@pytest.mark.parametrize(
+    "mrz",
+    [
+        "P".ljust(88, "<"),
+        "<" * 88,
+        # Wrong document code, valid check digits
+        "I" + td3("ERIKSSON<<ANNA<MARIA")[1:],
+        # No surname
+        td3("<<ANNA"),
+        # No passport number, every check digit valid
+        td3("ERIKSSON<<ANNA")[:44] + LINE2_WITHOUT_NUMBER,
+    ],
+)
+def test_is_valid_td3_rejects_blank_and_incomplete_reads(mrz):
+    assert not is_valid_td3(mrz)
+
+
+def td3_line2(number, dob, expiry, personal="ZE184226B"):
+    number, personal = number.ljust(9, "<"), personal.ljust(14, "<")
+    line = (
+        number + check_digit(number) + "UTO" + dob + check_digit(dob) + "F"
+        + expiry + check_digit(expiry) + personal + check_digit(personal)
+    )
+    return line + check_digit(line[0:10] + line[13:20] + line[21:43])
+
+
+@pytest.mark.parametrize(
+    "field", ["L898902C3", "740812", "ZE184226B<<<<<", "<<<<<<", "A<1<B<2", "0", "Z" * 20]
+)
+def test_compute_check_digits_match_scalar(field):
+    digits = compute_check_digits(load_mrz_array([field], len(field)))
+    assert digits[0] == int(check_digit(field))
+
+
+def test_validate_check_digits_match_scalar():
+    rng = np.random.default_rng(0)
+    alphabet = list("0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ<")
+    lines = ["".join(rng.choice(alphabet, 44)) for _ in range(200)]
+    lines += [td3_line2("L898902C3", "740812", "120415"), LINE2, LINE2_WITHOUT_NUMBER]
+    line1 = td3("ERIKSSON<<ANNA")[:44]
+    checks = validate_check_digits(load_mrz_array([line1 + line for line in lines]))
+    for row, line in enumerate(lines):
+        fields = {
+            "passport_number": (line[0:9], line[9]),
+            "date_of_birth": (line[13:19], line[19]),
+            "expiry_date": (line[21:27], line[27]),
+            "personal_number": (line[28:42], line[42]),
+            "composite": (line[0:10] + line[13:20] + line[21:43], line[43]),
+        }
+        for name, (field, digit) in fields.items():
+            assert checks[f"{name}_valid"][row] == (check_digit(field) == digit.replace("<", "0"))
+
+
+@pytest.mark.parametrize(
+    "number", ["L898902C3", "L8989<<<<", "L89<89<C3", "<<<L89890", "<<<<<<<<<"]
+)
+def test_passport_numbers_match_scalar(number):
+    mrz = td3("ERIKSSON<<ANNA")[:44] + td3_line2(number, "740812", "120415")
+    bulk = parse_mrz_bulk([mrz])
+    assert bulk["passport_number"][0].decode() == parse_mrz([mrz])["passport_number"]
+
+
+@pytest.mark.parametrize(
+    "dob",
+    [
+        "740812", "991231", "000101", "000229", "010229", "960229", "991332",
+        "990431", "990100", "7<0812", "<<<<<<", "AB0812", "74081Z",
+    ],
+)
+def test_date_of_birth_matches_convert_date(dob):
+    mrz = td3("ERIKSSON<<ANNA")[:44] + td3_line2("L898902C3", dob, "120415")
+    value = parse_mrz_bulk([mrz])["date_of_birth"][0]
+    expected = convert_date(dob)
+    if expected == "Invalid Date":
+        assert np.isnat(value)
+    else:
+        assert str(value) == expected
+
+
+@pytest.mark.parametrize(
+    "today, expiry, expected",
+    [
+        (date(2026, 6, 1), "460101", "2046-01-01"),
+        (date(2026, 6, 1), "470101", "1947-01-01"),
+        (date(2026, 6, 1), "000101", "2000-01-01"),
+        (date(2085, 6, 1), "030101", "2103-01-01"),
+        (date(2085, 6, 1), "900101", "2090-01-01"),
+        (date(2085, 6, 1), "060101", "2006-01-01"),
+        (date(2099, 12, 31), "190101", "2119-01-01"),
+        (date(2099, 12, 31), "200101", "2020-01-01"),
+    ],
+)
+def test_expiry_century_near_century_boundary(today, expiry, expected):
+    mrz = td3("ERIKSSON<<ANNA")[:44] + td3_line2("L898902C3", "740812", expiry)
+    assert str(parse_mrz_bulk([mrz], today=today)["expiry_date"][0]) == expected
+
+
+def test_date_of_birth_century_follows_convert_date_year():
+    mrz = td3("ERIKSSON<<ANNA")[:44] + td3_line2("L898902C3", "850101", "120415")
+    assert str(parse_mrz_bulk([mrz], today=date(2085, 6, 1))["date_of_birth"][0]) == "2085-01-01"
+    assert str(parse_mrz_bulk([mrz], today=date(2084, 6, 1))["date_of_birth"][0]) == "1985-01-01"
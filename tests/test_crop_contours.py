@@ -0,0 +1,105 @@
+# tests/test_crop_contours.py
+
+import cv2
+import numpy as np
+import pytest
+
+from cropper.crop import Cropper, contour_boxes_and_areas
+
+PADDING = 10
+
+
+def reference_contour_box(image, person_box):
+    """
+    The per-contour search crop_box_v2 ran before it was vectorized.
+    """
+    person_x1, person_y1, person_x2, person_y2 = person_box
+    gray_image = cv2.GaussianBlur(cv2.cvtColor(image, cv2.COLOR_BGR2GRAY), (5, 5), 0)
+    contours, _ = cv2.findContours(
+        cv2.Canny(gray_image, 50, 150), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE
+    )
+    smallest_area = float("inf")
+    smallest_contour = None
+    for contour in contours:
+        x, y, w, h = cv2.boundingRect(contour)
+        aspect_ratio = float(w) / h if h != 0 else 0
+        if x <= person_x1 and x + w >= person_x2 and y <= person_y1 and y + h >= person_y2:
+            if 0.5 < aspect_ratio < 1.7:
+                area = cv2.contourArea(contour)
+                if area < smallest_area:
+                    smallest_area = area
+                    smallest_contour = (x, y, w, h)
+    if smallest_contour is None:
+        return None
+    x, y, w, h = smallest_contour
+    x, y = max(0, x - PADDING), max(0, y - PADDING)
+    w = min(image.shape[1], x + w + PADDING) - x
+    h = min(image.shape[0], y + h + PADDING) - y
+    return x, y, x + w, y + h
+
+
+def contour_cropper(contour_max_side):
+    # Only the contour search is exercised, so no YOLO model is loaded
+    cropper = Cropper.__new__(Cropper)
+    cropper.contour_max_side = contour_max_side
+    return cropper
+
+
+def synthetic_page(rng, height=3000, width=4000):
+    image = np.full((height, width, 3), 60, np.uint8)
+    image += rng.integers(0, 20, (height, width, 3), dtype=np.uint8)
+    x0, y0 = int(rng.integers(100, 1000)), int(rng.integers(100, 800))
+    page_w, page_h = int(rng.integers(1800, 2600)), int(rng.integers(1500, 2000))
+    cv2.rectangle(image, (x0, y0), (x0 + page_w, y0 + page_h), (220, 220, 210), -1)
+    person_box = (x0 + 200, y0 + 300, x0 + 800, y0 + 1100)
+    cv2.rectangle(image, person_box[:2], person_box[2:], (90, 80, 70), -1)
+    return image, person_box
+
+
+def test_contour_boxes_and_areas_match_opencv():
+    rng = np.random.default_rng(0)
+    mask = np.zeros((400, 400), np.uint8)
+    for _ in range(40):
+        center = tuple(int(v) for v in rng.integers(0, 400, 2))
+        cv2.circle(mask, center, int(rng.integers(1, 30)), 255, -1)
+    # Single pixels and thin lines give one- and two-point contours
+    mask[5, 5] = 255
+    mask[10, 20:30] = 255
+    polygon = np.array([[300, 300], [390, 320], [350, 395], [310, 360]], np.int32)
+    cv2.fillPoly(mask, [polygon], 255)
+    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    assert any(len(contour) <= 2 for contour in contours)
+
+    (x, y, w, h), areas = contour_boxes_and_areas(contours)
+    for index, contour in enumerate(contours):
+        assert (x[index], y[index], w[index], h[index]) == cv2.boundingRect(contour)
+        # Both use the shoelace formula; only float rounding can differ
+        assert areas[index] == pytest.approx(cv2.contourArea(contour), abs=1e-6)
+
+
+def test_contour_box_at_full_resolution_matches_reference():
+    rng = np.random.default_rng(1)
+    for _ in range(3):
+        image, person_box = synthetic_page(rng)
+        assert contour_cropper(None)._contour_box(image, person_box) == reference_contour_box(
+            image, person_box
+        )
+
+
+def test_downscaled_contour_box_matches_reference():
+    rng = np.random.default_rng(2)
+    contour_max_side = 1024
+    for _ in range(5):
+        image, person_box = synthetic_page(rng)
+        expected = reference_contour_box(image, person_box)
+        found = contour_cropper(contour_max_side)._contour_box(image, person_box)
+        # One pixel of the downscaled copy, plus one for the Canny edge position,
+        # in full-resolution pixels
+        tolerance = 2 * max(image.shape[:2]) / contour_max_side
+        assert found is not None and expected is not None
+        assert np.abs(np.subtract(found, expected)).max() <= tolerance
+
+
+def test_no_contour_containing_the_person():
+    image = np.full((600, 800, 3), 128, np.uint8)
+    assert contour_cropper(1024)._contour_box(image, (100, 100, 200, 200)) is None
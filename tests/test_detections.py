@@ -0,0 +1,182 @@
+# tests/test_detections.py
+
+import numpy as np
+import pytest
+
+from cropper.detections import (
+    BOOK_CLASS,
+    PERSON_CLASS,
+    box_iou,
+    overlap_matrix,
+    select_book_boxes,
+    select_bottom_person,
+)
+
+
+def reference_book_boxes(boxes, classes):
+    """
+    The nested loops crop_box_v1 ran before the selection was vectorized.
+    """
+    smallest_book_box, smallest_area = None, float("inf")
+    largest_book_box, largest_area = None, 0
+    for i in range(len(boxes)):
+        if classes[i] == BOOK_CLASS:
+            book_x1, book_y1, book_x2, book_y2 = boxes[i]
+            area = (book_x2 - book_x1) * (book_y2 - book_y1)
+            if area > largest_area:
+                largest_area, largest_book_box = area, boxes[i]
+            for j in range(len(boxes)):
+                if classes[j] == PERSON_CLASS:
+                    person_x1, person_y1, person_x2, person_y2 = boxes[j]
+                    if (
+                        book_x1 <= person_x2
+                        and book_x2 >= person_x1
+                        and book_y1 <= person_y2
+                        and book_y2 >= person_y1
+                    ):
+                        if area < smallest_area:
+                            smallest_area, smallest_book_box = area, boxes[i]
+    return smallest_book_box, largest_book_box
+
+
+def reference_bottom_person(boxes, classes):
+    """
+    The sort crop_box_v2 ran before the selection was vectorized.
+    """
+    person_boxes = [boxes[i] for i in range(len(boxes)) if classes[i] == PERSON_CLASS]
+    if not person_boxes:
+        return None
+    return sorted(person_boxes, key=lambda box: box[3])[-1]
+
+
+def reference_iou(box_a, box_b):
+    ax1, ay1, ax2, ay2 = box_a
+    bx1, by1, bx2, by2 = box_b
+    intersection = max(0, min(ax2, bx2) - max(ax1, bx1)) * max(0, min(ay2, by2) - max(ay1, by1))
+    union = (ax2 - ax1) * (ay2 - ay1) + (bx2 - bx1) * (by2 - by1) - intersection
+    return intersection / union if union > 0 else 0.0
+
+
+def random_detections(rng, count):
+    # Coarse integer coordinates, so equal areas, equal y2 and touching edges are common
+    corners = rng.integers(0, 12, (count, 2)) * 10
+    sizes = rng.integers(0, 6, (count, 2)) * 10
+    boxes = np.hstack([corners, corners + sizes]).astype(np.float32)
+    classes = rng.choice([PERSON_CLASS, BOOK_CLASS], count).astype(np.float32)
+    return boxes, classes
+
+
+def assert_same_box(found, expected):
+    if expected is None:
+        assert found is None
+    else:
+        assert found is not None and np.array_equal(found, expected)
+
+
+EMPTY = (np.empty((0, 4), np.float32), np.empty(0, np.float32))
+
+
+def test_select_book_boxes_matches_reference():
+    rng = np.random.default_rng(0)
+    for count in list(range(1, 8)) * 50 + [40] * 20:
+        boxes, classes = random_detections(rng, count)
+        smallest, largest = select_book_boxes(boxes, classes)
+        expected_smallest, expected_largest = reference_book_boxes(boxes, classes)
+        assert_same_box(smallest, expected_smallest)
+        assert_same_box(largest, expected_largest)
+
+
+def test_select_book_boxes_ties_go_to_the_earliest_detection():
+    boxes = np.array(
+        [[0, 0, 10, 10], [20, 0, 30, 10], [5, 5, 8, 8], [25, 5, 28, 8]], np.float32
+    )
+    classes = np.array([BOOK_CLASS, BOOK_CLASS, PERSON_CLASS, PERSON_CLASS], np.float32)
+    smallest, largest = select_book_boxes(boxes, classes)
+    assert smallest is not None and smallest.tolist() == [0, 0, 10, 10]
+    assert largest is not None and largest.tolist() == [0, 0, 10, 10]
+
+
+def test_select_book_boxes_without_detections():
+    assert select_book_boxes(*EMPTY) == (None, None)
+
+
+def test_select_book_boxes_single_detection():
+    book = np.array([[0, 0, 10, 10]], np.float32)
+    smallest, largest = select_book_boxes(book, np.array([BOOK_CLASS], np.float32))
+    assert smallest is None
+    assert largest.tolist() == [0, 0, 10, 10]
+    person = select_book_boxes(book, np.array([PERSON_CLASS], np.float32))
+    assert person == (None, None)
+    # A book without area is never the largest one
+    flat = np.array([[0, 0, 10, 0]], np.float32)
+    assert select_book_boxes(flat, np.array([BOOK_CLASS], np.float32)) == (None, None)
+
+
+def test_select_bottom_person_matches_reference():
+    rng = np.random.default_rng(1)
+    for count in list(range(1, 8)) * 50 + [40] * 20:
+        boxes, classes = random_detections(rng, count)
+        found = select_bottom_person(boxes, classes)
+        assert_same_box(found, reference_bottom_person(boxes, classes))
+
+
+def test_select_bottom_person_ties_go_to_the_latest_detection():
+    boxes = np.array([[0, 0, 10, 50], [20, 0, 30, 50], [40, 0, 50, 20]], np.float32)
+    classes = np.full(3, PERSON_CLASS, np.float32)
+    assert select_bottom_person(boxes, classes).tolist() == [20, 0, 30, 50]
+
+
+def test_select_bottom_person_without_detections():
+    assert select_bottom_person(*EMPTY) is None
+    book = np.array([[0, 0, 10, 10]], np.float32)
+    assert select_bottom_person(book, np.array([BOOK_CLASS], np.float32)) is None
+
+
+def test_select_bottom_person_single_detection():
+    person = np.array([[1, 2, 3, 4]], np.float32)
+    assert select_bottom_person(person, np.array([PERSON_CLASS], np.float32)).tolist() == [
+        1, 2, 3, 4
+    ]
+
+
+def test_overlap_matrix_matches_pairwise_checks():
+    rng = np.random.default_rng(2)
+    boxes_a, _ = random_detections(rng, 30)
+    boxes_b, _ = random_detections(rng, 20)
+    matrix = overlap_matrix(boxes_a, boxes_b)
+    assert matrix.shape == (30, 20)
+    for i, (ax1, ay1, ax2, ay2) in enumerate(boxes_a):
+        for j, (bx1, by1, bx2, by2) in enumerate(boxes_b):
+            assert matrix[i, j] == (ax1 <= bx2 and ax2 >= bx1 and ay1 <= by2 and ay2 >= by1)
+
+
+def test_overlap_matrix_edges_and_empty_inputs():
+    box = np.array([[0, 0, 10, 10]], np.float32)
+    touching = np.array([[10, 10, 20, 20]], np.float32)
+    apart = np.array([[11, 0, 20, 10]], np.float32)
+    assert overlap_matrix(box, touching).tolist() == [[True]]
+    assert overlap_matrix(box, apart).tolist() == [[False]]
+    assert overlap_matrix(box, EMPTY[0]).shape == (1, 0)
+    assert overlap_matrix(EMPTY[0], box).shape == (0, 1)
+
+
+def test_box_iou_matches_reference():
+    rng = np.random.default_rng(3)
+    boxes, _ = random_detections(rng, 40)
+    for box_a in boxes:
+        for box_b in boxes:
+            assert box_iou(box_a, box_b) == pytest.approx(reference_iou(box_a, box_b))
+
+
+@pytest.mark.parametrize(
+    "box_a, box_b, expected",
+    [
+        ((0, 0, 10, 10), (0, 0, 10, 10), 1.0),
+        ((0, 0, 10, 10), (5, 0, 15, 10), 1 / 3),
+        ((0, 0, 10, 10), (10, 0, 20, 10), 0.0),
+        ((0, 0, 10, 10), (20, 20, 30, 30), 0.0),
+        ((0, 0, 0, 0), (0, 0, 0, 0), 0.0),
+    ],
+)
+def test_box_iou_known_values(box_a, box_b, expected):
+    assert box_iou(box_a, box_b) == pytest.approx(expected)
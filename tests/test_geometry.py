@@ -0,0 +1,144 @@
+# tests/test_geometry.py
+
+import cv2
+import numpy as np
+import pytest
+
+from cropper.geometry import (
+    MRZ_BOTTOM_MARGIN_MM,
+    MRZ_LEFT_MM,
+    MRZ_WIDTH_MM,
+    PAGE_HEIGHT_MM,
+    PAGE_WIDTH_MM,
+    GeometricCropper,
+)
+
+MRZ_HEIGHT_MM = 10.0
+
+
+def page_to_image(scale, angle_deg, offset):
+    """
+    Similarity transform from page millimetres to image pixels, as a 3x3 homography.
+    """
+    angle = np.deg2rad(angle_deg)
+    cos, sin = np.cos(angle) * scale, np.sin(angle) * scale
+    return np.array([[cos, -sin, offset[0]], [sin, cos, offset[1]], [0, 0, 1]])
+
+
+def project(homography, points_mm):
+    points = np.asarray(points_mm, dtype=np.float32)[None]
+    return cv2.perspectiveTransform(points, homography.astype(np.float32))[0]
+
+
+def mrz_quad(homography):
+    bottom = PAGE_HEIGHT_MM - MRZ_BOTTOM_MARGIN_MM
+    left, right = MRZ_LEFT_MM, MRZ_LEFT_MM + MRZ_WIDTH_MM
+    top = bottom - MRZ_HEIGHT_MM
+    return project(homography, [[left, top], [right, top], [right, bottom], [left, bottom]])
+
+
+def face_box(homography, center_mm=(25.0, 40.0), size_mm=30.0):
+    x, y = center_mm
+    half = size_mm / 2
+    (x1, y1), (x2, y2) = project(homography, [[x - half, y - half], [x + half, y + half]])
+    return (min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2))
+
+
+PAGE_CORNERS = [[0, 0], [PAGE_WIDTH_MM, 0], [PAGE_WIDTH_MM, PAGE_HEIGHT_MM], [0, PAGE_HEIGHT_MM]]
+
+
+@pytest.mark.parametrize("scale, angle", [(8.0, 0.0), (6.0, 7.0), (10.0, -4.0)])
+def test_page_homography_recovers_the_page(scale, angle):
+    homography = page_to_image(scale, angle, (150.0, 120.0))
+    found = GeometricCropper().page_homography(mrz_quad(homography))
+    np.testing.assert_allclose(
+        project(found, PAGE_CORNERS), project(homography, PAGE_CORNERS), atol=0.05
+    )
+
+
+def test_page_quad_adds_the_padding():
+    homography = page_to_image(8.0, 5.0, (150.0, 120.0))
+    cropper = GeometricCropper(padding_mm=2.0)
+    quad, _ = cropper.page_quad((1200, 1600), mrz_quad(homography), face_box(homography))
+    padded = [
+        [-2, -2], [PAGE_WIDTH_MM + 2, -2],
+        [PAGE_WIDTH_MM + 2, PAGE_HEIGHT_MM + 2], [-2, PAGE_HEIGHT_MM + 2],
+    ]
+    np.testing.assert_allclose(quad, project(homography, padded), atol=0.05)
+
+
+def test_perspective_mrz_maps_to_its_own_corners():
+    homography = page_to_image(8.0, 0.0, (150.0, 120.0))
+    homography[2, :2] = [2e-4, -1e-4]
+    quad = mrz_quad(homography)
+    found = GeometricCropper().page_homography(quad)
+    bottom = PAGE_HEIGHT_MM - MRZ_BOTTOM_MARGIN_MM
+    measured = found @ np.array([MRZ_LEFT_MM, bottom, 1.0])
+    np.testing.assert_allclose(measured[:2] / measured[2], quad[3], atol=1e-3)
+
+
+@pytest.mark.parametrize("width, height", [(100, 40), (100, 2), (100, 0)])
+def test_implausible_mrz_shape_is_rejected(width, height):
+    quad = np.array([[0, 0], [width, 0], [width, height], [0, height]], dtype=np.float32)
+    assert GeometricCropper().page_homography(quad) is None
+
+
+@pytest.mark.parametrize(
+    "center_mm, size_mm",
+    [
+        ((95.0, 40.0), 30.0),  # right half of the page
+        ((25.0, 80.0), 10.0),  # below the top of the MRZ
+        ((25.0, 40.0), 4.0),  # too small for a portrait
+        ((25.0, 40.0), 60.0),  # too large for a portrait
+    ],
+)
+def test_face_outside_the_portrait_zone_is_rejected(center_mm, size_mm):
+    homography = page_to_image(8.0, 0.0, (150.0, 120.0))
+    face = face_box(homography, center_mm, size_mm)
+    assert GeometricCropper().page_quad((1200, 1600), mrz_quad(homography), face) == (None, None)
+
+
+def test_page_beyond_the_image_is_rejected():
+    homography = page_to_image(8.0, 0.0, (-200.0, 120.0))
+    quad, _ = GeometricCropper().page_quad(
+        (1200, 1600), mrz_quad(homography), face_box(homography)
+    )
+    assert quad is None
+
+
+def test_crop_box_and_warp_follow_the_page():
+    homography = page_to_image(8.0, 0.0, (150.0, 120.0))
+    geometry = {"mrz_quad": mrz_quad(homography), "face_box": face_box(homography)}
+    image = np.zeros((1200, 1600, 3), dtype=np.uint8)
+
+    box = GeometricCropper(padding_mm=0.0).crop_box(image, geometry)
+    expected = (150, 120, 150 + 8 * PAGE_WIDTH_MM, 120 + 8 * PAGE_HEIGHT_MM)
+    assert box == pytest.approx(expected, abs=1)
+
+    page = GeometricCropper(perspective=True, padding_mm=0.0).crop_image(image, geometry)
+    assert page.shape[1] == pytest.approx(8 * PAGE_WIDTH_MM, abs=1)
+    aspect = page.shape[1] / page.shape[0]
+    assert aspect == pytest.approx(PAGE_WIDTH_MM / PAGE_HEIGHT_MM, rel=0.01)
+
+
+def test_fallback_is_built_only_when_the_geometry_fails():
+    built = []
+
+    class Fallback:
+        def crop_image(self, image):
+            return image[:1, :1]
+
+    def build_fallback():
+        built.append(True)
+        return Fallback()
+
+    homography = page_to_image(8.0, 0.0, (150.0, 120.0))
+    image = np.zeros((1200, 1600, 3), dtype=np.uint8)
+    cropper = GeometricCropper(fallback=build_fallback)
+    geometry = {"mrz_quad": mrz_quad(homography), "face_box": face_box(homography)}
+    assert cropper.crop_image(image, geometry) is not None
+    assert not built
+    assert cropper.crop_image(image, {"mrz_quad": None, "face_box": None}).shape[:2] == (1, 1)
+    assert cropper.crop_image(image).shape[:2] == (1, 1)
+    assert built == [True]
+    assert GeometricCropper().crop_image(image) is None
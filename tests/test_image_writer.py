@@ -0,0 +1,120 @@
+# tests/test_image_writer.py
+
+import os
+
+import cv2
+import numpy as np
+import pytest
+
+from processing.passport_processor import PassportProcessor
+from storage.data_manager import DataManager
+from storage.image_writer import ImageWriter
+
+MRZ_LINES = [
+    "P<UTOERIKSSON<<ANNA<MARIA<<<<<<<<<<<<<<<<<<<",
+    "L898902C36UTO7408122F1204159ZE184226B<<<<<10",
+]
+
+
+def gradient(height, width):
+    row = np.linspace(0, 255, width, dtype=np.uint8)
+    return np.repeat(np.tile(row, (height, 1))[:, :, None], 3, axis=2)
+
+
+def test_flush_writes_every_queued_image(tmp_path):
+    with ImageWriter(image_format="png", workers=2, max_pending=2) as writer:
+        paths = [writer.path_for(str(tmp_path), f"image{index}") for index in range(6)]
+        for index, path in enumerate(paths):
+            writer.submit(gradient(20 + index, 30), path)
+        writer.flush()
+        for index, path in enumerate(paths):
+            assert cv2.imread(path).shape == (20 + index, 30, 3)
+
+
+@pytest.mark.parametrize("image_format, extension", [("jpeg", ".jpg"), ("webp", ".webp")])
+def test_path_for_uses_the_format_extension(tmp_path, image_format, extension):
+    with ImageWriter(image_format=image_format) as writer:
+        assert writer.path_for(str(tmp_path), "face") == os.path.join(tmp_path, "face" + extension)
+
+
+def test_unknown_format_is_rejected():
+    with pytest.raises(ValueError):
+        ImageWriter(image_format="gif")
+
+
+def test_max_dimension_downscales_the_longest_side(tmp_path):
+    with ImageWriter(image_format="png", max_dimension=50) as writer:
+        large, small = str(tmp_path / "large.png"), str(tmp_path / "small.png")
+        writer.submit(gradient(100, 200), large)
+        writer.submit(gradient(20, 40), small)
+    assert cv2.imread(large).shape == (25, 50, 3)
+    # Smaller images are never upscaled
+    assert cv2.imread(small).shape == (20, 40, 3)
+
+
+def test_close_writes_pending_images_and_rejects_new_ones(tmp_path):
+    writer = ImageWriter(image_format="png")
+    path = str(tmp_path / "page.png")
+    image = gradient(40, 60)
+    writer.submit(image, path)
+    writer.close()
+    assert np.array_equal(cv2.imread(path), image)
+    with pytest.raises(RuntimeError):
+        writer.submit(image, path)
+    # Closing twice is harmless
+    writer.close()
+
+
+def test_failed_write_does_not_stop_flush(tmp_path):
+    with ImageWriter(image_format="png") as writer:
+        failed = writer.submit(gradient(10, 10), str(tmp_path / "missing" / "image.png"))
+        written = writer.submit(gradient(10, 10), str(tmp_path / "image.png"))
+        writer.flush()
+    assert isinstance(failed.exception(), OSError)
+    assert written.exception() is None
+
+
+class FakeReader:
+    """
+    Reads MRZ_LINES from any image and records the face detection requests.
+    """
+    def __init__(self):
+        self.face_requests = []
+
+    def predict(self, image, do_facedetect=False, preprocess_config=None, **kwargs):
+        self.face_requests.append(do_facedetect)
+        face = image[:10, :10].copy() if do_facedetect else None
+        return [(None, line, 1.0) for line in MRZ_LINES], None, face
+
+
+class FakeCropper:
+    """
+    Crops the whole image and counts the crops.
+    """
+    def __init__(self):
+        self.crops = 0
+
+    def crop_image(self, image):
+        self.crops += 1
+        return image
+
+
+@pytest.mark.parametrize("save_faces", [True, False])
+@pytest.mark.parametrize("save_documents", [True, False])
+def test_skip_flags_skip_face_detection_and_cropping(tmp_path, save_faces, save_documents):
+    data_manager = DataManager(str(tmp_path))
+    reader, cropper = FakeReader(), FakeCropper()
+    writer = ImageWriter(
+        image_format="png", save_faces=save_faces, save_documents=save_documents
+    )
+    processor = PassportProcessor(reader, cropper, data_manager, None, image_writer=writer)
+
+    entry = processor.process_page(gradient(60, 80), "page")
+    writer.close()
+    data_manager.close()
+
+    assert entry["Passport Number"] == "L898902C3"
+    assert reader.face_requests == [save_faces]
+    assert cropper.crops == int(save_documents)
+    assert len(os.listdir(data_manager.faces_folder)) == int(save_faces)
+    assert len(os.listdir(data_manager.documents_folder)) == int(save_documents)
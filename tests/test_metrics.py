@@ -0,0 +1,118 @@
+# tests/test_metrics.py
+
+import urllib.error
+import urllib.request
+
+import pytest
+
+from instrumentation.metrics import (
+    CONTENT_TYPE,
+    NULL_METRICS,
+    MetricsRegistry,
+    failures,
+    queue_depth,
+    stage_latency,
+)
+
+
+def test_counter_renders_one_sorted_line_per_label_set():
+    registry = MetricsRegistry()
+    counter = registry.counter("mrz_images_total", "Images processed.", ("outcome",))
+    counter.inc(outcome="parsed")
+    counter.inc(2, outcome="duplicate")
+    counter.inc(outcome="parsed")
+    assert registry.render() == (
+        "# HELP mrz_images_total Images processed.\n"
+        "# TYPE mrz_images_total counter\n"
+        'mrz_images_total{outcome="duplicate"} 2\n'
+        'mrz_images_total{outcome="parsed"} 2\n'
+    )
+
+
+def test_label_values_are_escaped_and_missing_labels_are_empty():
+    registry = MetricsRegistry()
+    counter = failures(registry)
+    counter.inc(reason='bad "quote"\\path\nline')
+    counter.inc()
+    lines = registry.render().splitlines()
+    assert lines[2:] == [
+        'mrz_failures_total{reason=""} 1',
+        'mrz_failures_total{reason="bad \\"quote\\"\\\\path\\nline"} 1',
+    ]
+
+
+def test_unlabeled_gauge_and_float_values():
+    registry = MetricsRegistry()
+    gauge = registry.gauge("mrz_workers", "Busy workers.")
+    gauge.set(3)
+    gauge.inc(0.5)
+    gauge.dec(2)
+    assert registry.render().splitlines()[-1] == "mrz_workers 1.5"
+
+
+def test_gauge_function_is_read_at_scrape_time():
+    registry = MetricsRegistry()
+    pending = []
+    queue_depth(registry).set_function(lambda: len(pending), queue="images")
+    assert registry.render().splitlines()[-1] == 'mrz_queue_depth{queue="images"} 0'
+    pending.extend([1, 2, 3])
+    assert registry.render().splitlines()[-1] == 'mrz_queue_depth{queue="images"} 3'
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = MetricsRegistry()
+    histogram = registry.histogram(
+        "mrz_stage_duration_seconds", "Stage duration.", ("stage",), buckets=(1.0, 0.1)
+    )
+    for value in (0.05, 0.1, 0.5, 2.0):
+        histogram.observe(value, stage="decode")
+    histogram.observe(0.2, stage="crop")
+    lines = registry.render().splitlines()
+    assert lines[2:] == [
+        'mrz_stage_duration_seconds_bucket{stage="crop",le="0.1"} 0',
+        'mrz_stage_duration_seconds_bucket{stage="crop",le="1.0"} 1',
+        'mrz_stage_duration_seconds_bucket{stage="crop",le="+Inf"} 1',
+        'mrz_stage_duration_seconds_sum{stage="crop"} 0.2',
+        'mrz_stage_duration_seconds_count{stage="crop"} 1',
+        # A value equal to a bound falls in that bucket (le is inclusive)
+        'mrz_stage_duration_seconds_bucket{stage="decode",le="0.1"} 2',
+        'mrz_stage_duration_seconds_bucket{stage="decode",le="1.0"} 3',
+        'mrz_stage_duration_seconds_bucket{stage="decode",le="+Inf"} 4',
+        'mrz_stage_duration_seconds_sum{stage="decode"} 2.65',
+        'mrz_stage_duration_seconds_count{stage="decode"} 4',
+    ]
+
+
+def test_registry_returns_the_registered_metric():
+    registry = MetricsRegistry()
+    assert stage_latency(registry) is stage_latency(registry)
+    failures(registry).inc(reason="unreadable")
+    failures(registry).inc(reason="unreadable")
+    assert 'mrz_failures_total{reason="unreadable"} 2' in registry.render()
+    with pytest.raises(ValueError):
+        registry.gauge("mrz_failures_total", "Same name, another kind.")
+
+
+def test_serve_exposes_metrics_over_http():
+    registry = MetricsRegistry()
+    registry.counter("mrz_images_total", "Images processed.").inc()
+    server = registry.serve(0)
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        with urllib.request.urlopen(url + "/metrics") as response:
+            assert response.headers["Content-Type"] == CONTENT_TYPE
+            assert response.read().decode("utf-8") == registry.render()
+        with pytest.raises(urllib.error.HTTPError) as error:
+            urllib.request.urlopen(url + "/other")
+        assert error.value.code == 404
+    finally:
+        registry.close()
+    assert registry.server is None
+
+
+def test_null_registry_ignores_updates():
+    for metric in (stage_latency(NULL_METRICS), failures(NULL_METRICS), queue_depth(NULL_METRICS)):
+        metric.inc(reason="x")
+        metric.observe(0.1, stage="x")
+        metric.set_function(lambda: 1, queue="x")
+    assert NULL_METRICS.render() == ""
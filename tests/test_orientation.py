@@ -0,0 +1,63 @@
+# tests/test_orientation.py
+
+import cv2
+import numpy as np
+import pytest
+
+# The mrz_reader package loads the OCR models on import
+pytest.importorskip("easyocr")
+from mrz_reader.orientation import ROTATIONS, rotate_upright, text_line_axis  # noqa: E402
+
+CHARACTERS = list("ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789<")
+BACKGROUND = 230
+
+
+def text_page(seed=0, skew=0.0):
+    """
+    Grayscale thumbnail of a page with eight horizontal lines of text, skewed by skew degrees.
+    """
+    rng = np.random.default_rng(seed)
+    image = np.full((300, 420), BACKGROUND, dtype=np.uint8)
+    for row in range(8):
+        text = "".join(rng.choice(CHARACTERS, 26))
+        cv2.putText(image, text, (10, 30 + row * 34), cv2.FONT_HERSHEY_SIMPLEX, 0.6, 20, 1)
+    if skew:
+        matrix = cv2.getRotationMatrix2D((210, 150), skew, 1.0)
+        image = cv2.warpAffine(image, matrix, (420, 300), borderValue=BACKGROUND)
+    return image
+
+
+def rotate(image, rotation):
+    """
+    Rotate the content clockwise by rotation degrees.
+    """
+    return np.ascontiguousarray(np.rot90(image, -rotation // 90))
+
+
+@pytest.mark.parametrize("skew", [0.0, -6.0, 6.0])
+@pytest.mark.parametrize("rotation", ROTATIONS)
+def test_text_line_axis_follows_the_lines(rotation, skew):
+    ratio = text_line_axis(rotate(text_page(skew=skew), rotation))
+    if rotation in (0, 180):
+        assert ratio > 1.1
+    else:
+        assert ratio < 0.9
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_turning_the_page_inverts_the_axis(seed):
+    page = text_page(seed)
+    horizontal = text_line_axis(page)
+    vertical = text_line_axis(rotate(page, 90))
+    assert horizontal > 1 > vertical
+    assert horizontal * vertical == pytest.approx(1.0, abs=0.05)
+
+
+def test_blank_page_has_no_axis():
+    assert text_line_axis(np.full((300, 420), BACKGROUND, dtype=np.uint8)) == 0.0
+
+
+@pytest.mark.parametrize("rotation", ROTATIONS)
+def test_rotate_upright_undoes_the_rotation(rotation):
+    page = text_page()
+    assert np.array_equal(rotate_upright(rotate(page, rotation), rotation), page)
@@ -0,0 +1,101 @@
+# tests/test_passport_processor.py
+
+import numpy as np
+import pytest
+
+from instrumentation.metrics import MetricsRegistry
+from processing.passport_processor import PassportProcessor
+from storage.data_manager import DataManager
+from storage.image_writer import ImageWriter
+from storage.input_index import compute_dhash, file_sha256
+
+LINE1 = "P<UTOERIKSSON<<ANNA<MARIA<<<<<<<<<<<<<<<<<<<"
+LINE2 = "L898902C36UTO7408122F1204159ZE184226B<<<<<10"
+OTHER_LINE2 = "X123456784UTO7408122F1204159ZE184226B<<<<<14"
+
+
+class ScriptedReader:
+    """
+    Reads the next scripted MRZ on every predict call.
+    """
+    def __init__(self, *reads):
+        self.reads = list(reads)
+        self.calls = 0
+
+    def predict(self, image, **kwargs):
+        lines = self.reads[self.calls]
+        self.calls += 1
+        return [(None, line, 1.0) for line in lines], None, None
+
+
+def page(seed):
+    rng = np.random.default_rng(0)
+    image = np.repeat(rng.integers(0, 255, (40, 60, 1), dtype=np.uint8), 3, axis=2)
+    # A few pixels differ between pages: another file, nearly the same perceptual hash
+    image[0, :seed] ^= 1
+    return image
+
+
+@pytest.mark.parametrize(
+    "second_read, stored",
+    [((LINE1, LINE2), ["L898902C3"]), ((LINE1, OTHER_LINE2), ["L898902C3", "X12345678"])],
+)
+def test_similar_input_is_read_once(tmp_path, second_read, stored):
+    data_manager = DataManager(str(tmp_path), max_hash_distance=16)
+    reader = ScriptedReader((LINE1, LINE2), second_read)
+    writer = ImageWriter(save_faces=False, save_documents=False)
+    processor = PassportProcessor(reader, None, data_manager, None, image_writer=writer)
+
+    processor.process_page(page(0), "first")
+    second = page(3)
+    sha256 = file_sha256(np.ascontiguousarray(second))
+    assert data_manager.find_input(sha256, compute_dhash(second)) == ("L898902C3", "similar")
+    entry = processor.process_page(second, "second")
+
+    # The read confirming (or not) the similar input is the one the entry comes from
+    assert reader.calls == 2
+    assert entry["Passport Number"] == second_read[1][:9]
+    assert sorted(e["Passport Number"] for e in data_manager.iter_parsed_data()) == stored
+    writer.close()
+    data_manager.close()
+
+
+class StreamResultReader:
+    """
+    Returns the scripted read_stream results in turn.
+    """
+    def __init__(self, *mrz_lines):
+        self.results = [
+            {
+                "frames": 4,
+                "segmentations": 2,
+                "ocr_runs": 2,
+                "latency_ms": 10.0,
+                "cpu_ms": 10.0,
+                "confirmed": lines is not None,
+                "mrz_lines": lines,
+            }
+            for lines in mrz_lines
+        ]
+
+    def read_stream(self, frames, **stream_options):
+        return self.results.pop(0)
+
+
+def test_every_stream_outcome_records_its_latency(tmp_path):
+    data_manager = DataManager(str(tmp_path))
+    metrics = MetricsRegistry()
+    reader = StreamResultReader((LINE1, LINE2), None, (LINE1, LINE2))
+    processor = PassportProcessor(reader, None, data_manager, None, metrics=metrics)
+
+    entries = [processor.process_stream([], f"stream{index}") for index in range(3)]
+    assert entries[0]["Passport Number"] == "L898902C3"
+    assert entries[1] is None
+    assert entries[2] == entries[0]
+    text = metrics.render()
+    assert 'mrz_stage_duration_seconds_count{stage="stream"} 3' in text
+    for outcome in ("ok", "not_confirmed", "duplicate"):
+        assert f'mrz_images_processed_total{{outcome="{outcome}"}} 1' in text
+    assert 'mrz_duplicates_skipped_total{match="passport_number"} 1' in text
+    processor.image_writer.close()
+    data_manager.close()
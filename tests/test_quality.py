@@ -0,0 +1,90 @@
+# tests/test_quality.py
+
+import cv2
+import numpy as np
+import pytest
+
+from processing.quality import QualityGate
+
+CHARACTERS = list("ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789<")
+
+
+def page(height=600, width=850, seed=0):
+    """
+    Light gray page with twelve lines of dark text.
+    """
+    rng = np.random.default_rng(seed)
+    image = np.full((height, width, 3), 215, dtype=np.uint8)
+    for row in range(12):
+        text = "".join(rng.choice(CHARACTERS, 30))
+        cv2.putText(image, text, (20, 40 + row * 45), cv2.FONT_HERSHEY_SIMPLEX, 1.0, (30,) * 3, 2)
+    return image
+
+
+def blur(image):
+    return cv2.GaussianBlur(image, (0, 0), 4)
+
+
+def wash_out(image):
+    # Squeeze the intensities into a narrow band, as on an overexposed faded scan
+    return (image * 0.15 + 100).astype(np.uint8)
+
+
+def glare(image):
+    image = image.copy()
+    image[:, :500] = 255
+    return image
+
+
+@pytest.mark.parametrize(
+    "distort, reasons",
+    [
+        (lambda image: image, []),
+        (blur, ["blurry"]),
+        (wash_out, ["low_contrast"]),
+        (lambda image: blur(wash_out(image)), ["blurry", "low_contrast"]),
+        (glare, ["glare"]),
+        # Glare explains the other failures, so it is reported alone
+        (lambda image: glare(blur(image)), ["glare"]),
+        (lambda image: np.full_like(image, 128), ["blank"]),
+        # A white page is clipped before it is blank
+        (lambda image: np.full_like(image, 255), ["glare"]),
+    ],
+)
+def test_assess_reason_codes(distort, reasons):
+    metrics, found = QualityGate().assess(distort(page()))
+    assert found == reasons
+    assert set(metrics) == {"sharpness", "glare", "contrast"}
+
+
+def test_metrics_do_not_depend_on_the_input_size():
+    gate = QualityGate()
+    small = gate.measure(page())
+    large = gate.measure(cv2.resize(page(), None, fx=4, fy=4, interpolation=cv2.INTER_NEAREST))
+    assert large["contrast"] == pytest.approx(small["contrast"], abs=5)
+    assert large["sharpness"] == pytest.approx(small["sharpness"], rel=0.1)
+    assert large["glare"] == small["glare"] == 0
+
+
+def test_grayscale_input_gives_the_same_metrics():
+    gate = QualityGate()
+    image = blur(page())
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    assert gate.measure(gray) == pytest.approx(gate.measure(image))
+
+
+def test_thresholds_decide_the_reasons():
+    image = wash_out(page())
+    assert QualityGate(min_contrast=20).assess(image)[1] == []
+    assert QualityGate(blank_contrast=30).assess(image)[1] == ["blank"]
+    assert QualityGate(min_sharpness=1e6).assess(page())[1] == ["blurry"]
+
+
+@pytest.mark.parametrize("mode, rejects", [("reject", True), ("flag", False)])
+def test_mode(mode, rejects):
+    assert QualityGate(mode=mode).rejects == rejects
+
+
+def test_unknown_mode_is_rejected():
+    with pytest.raises(ValueError):
+        QualityGate(mode="warn")
@@ -0,0 +1,161 @@
+# tests/test_record_store.py
+
+import json
+import multiprocessing
+import sqlite3
+import time
+
+import pytest
+
+from processing.reparse import reparse_entry
+from processing.workers import run_prefork
+from storage.data_manager import DataManager
+from storage.record_store import RecordStore
+
+
+def write_parsed_data(folder, count):
+    entries = [{"Passport Number": f"P{index:05d}"} for index in range(count)]
+    with open(folder / "parsed_data.json", "w") as f:
+        json.dump(entries, f)
+    return entries
+
+
+def sorted_entries(data_manager):
+    return sorted(data_manager.iter_parsed_data(), key=lambda entry: entry["Passport Number"])
+
+
+@pytest.mark.parametrize("shards", [1, 4])
+def test_interrupted_migration_resumes(tmp_path, monkeypatch, shards):
+    entries = write_parsed_data(tmp_path, 25)
+    monkeypatch.setattr(RecordStore, "import_batch_size", 10)
+    append = RecordStore.append
+    writing = set()
+
+    def failing_append(self, entry):
+        if entry["Passport Number"] == "P00017":
+            # As if the process died: the open batches are rolled back
+            for store in writing:
+                store.connection.close()
+            raise KeyboardInterrupt
+        writing.add(self)
+        return append(self, entry)
+
+    monkeypatch.setattr(RecordStore, "append", failing_append)
+    with pytest.raises(KeyboardInterrupt):
+        DataManager(str(tmp_path), shards=shards)
+
+    monkeypatch.setattr(RecordStore, "append", append)
+    data_manager = DataManager(str(tmp_path), shards=shards)
+    assert sorted_entries(data_manager) == entries
+    data_manager.close()
+
+    # Once finished, the migration (and the exported JSON) is never imported again
+    data_manager = DataManager(str(tmp_path), shards=shards)
+    data_manager.export_parsed_data()
+    data_manager.close()
+    data_manager = DataManager(str(tmp_path), shards=shards)
+    assert len(data_manager.store) == len(entries)
+    data_manager.close()
+
+
+def test_commit_interval_commits_without_new_entries(tmp_path):
+    data_manager = DataManager(str(tmp_path), commit_every=100, commit_interval_ms=50)
+    data_manager.add_entry({"Passport Number": "P00001"})
+    data_manager.save_parsed_data()
+    reader = sqlite3.connect(str(tmp_path / "parsed_data.sqlite"))
+    deadline = time.monotonic() + 5
+    while not reader.execute("SELECT COUNT(*) FROM records").fetchone()[0]:
+        assert time.monotonic() < deadline, "pending entry was never committed"
+        time.sleep(0.01)
+    reader.close()
+    data_manager.close()
+
+
+def test_sharded_migration_and_shard_count(tmp_path, monkeypatch):
+    entries = write_parsed_data(tmp_path, 40)
+    monkeypatch.setattr(RecordStore, "import_batch_size", 7)
+    data_manager = DataManager(str(tmp_path), shards=4)
+    assert sorted_entries(data_manager) == entries
+    data_manager.close()
+
+    for shards in (1, 2, 8):
+        with pytest.raises(ValueError):
+            DataManager(str(tmp_path), shards=shards)
+    data_manager = DataManager(str(tmp_path), shards=4)
+    assert len(data_manager.store) == len(entries)
+    data_manager.close()
+
+
+def test_unsharded_store_refuses_shards(tmp_path):
+    DataManager(str(tmp_path)).close()
+    with pytest.raises(ValueError):
+        DataManager(str(tmp_path), shards=4)
+
+
+def test_workers_sharing_a_store_add_each_passport_once(tmp_path):
+    DataManager(str(tmp_path)).close()
+    store_lock = multiprocessing.get_context("fork").Lock()
+
+    def build_worker(index):
+        data_manager = DataManager(str(tmp_path), process_lock=store_lock)
+
+        def handle(item):
+            if item == 7:
+                raise RuntimeError("unreadable")
+            data_manager.add_entry({"Passport Number": f"P{item % 5:05d}"})
+
+        return handle, data_manager.close
+
+    _, reports = run_prefork(list(range(40)), 4, build_worker)
+
+    data_manager = DataManager(str(tmp_path))
+    assert [entry["Passport Number"] for entry in sorted_entries(data_manager)] == [
+        f"P{index:05d}" for index in range(5)
+    ]
+    data_manager.close()
+    assert sum(report["items"] for report in reports) == 40
+    failed = [failure for report in reports for failure in report["failed"]]
+    assert [failure["item"] for failure in failed] == [7]
+
+
+def td3_mrz(passport_number):
+    def check_digit(field):
+        values = [0 if c == "<" else int(c) if c.isdigit() else ord(c) - 55 for c in field]
+        return str(sum(value * (7, 3, 1)[i % 3] for i, value in enumerate(values)) % 10)
+
+    number = passport_number.ljust(9, "<")
+    line2 = number + check_digit(number) + "UTO7408122F1204159ZE184226B<<<<<1"
+    line2 += check_digit(line2[0:10] + line2[13:20] + line2[21:43])
+    return "P<UTOERIKSSON<<ANNA<MARIA".ljust(44, "<") + line2
+
+
+def test_reparse_moves_records_between_shards_once(tmp_path):
+    data_manager = DataManager(str(tmp_path), shards=4)
+    numbers = [f"X{index:07d}" for index in range(40)]
+    for number in numbers:
+        # Stored under a misread number, the raw MRZ holds the right one
+        data_manager.add_entry({"Passport Number": "Q" + number[1:], "raw_mrz": td3_mrz(number)})
+    data_manager.flush()
+    # Some records belong in another shard once reparsed
+    moved = [
+        record_id
+        for record_id, entry in data_manager.store.iter_records()
+        if data_manager.store.moves_record(
+            record_id, {"Passport Number": "X" + entry["Passport Number"][1:]}
+        )
+    ]
+    assert moved
+
+    visited = []
+
+    def rebuild(entry):
+        visited.append(entry["raw_mrz"])
+        return reparse_entry(entry)
+
+    changed = [passport_number for _, passport_number, _ in data_manager.rebuild_records(rebuild)]
+
+    assert sorted(visited) == sorted(td3_mrz(number) for number in numbers)
+    assert sorted(changed) == numbers
+    assert sorted(entry["Passport Number"] for entry in data_manager.iter_parsed_data()) == numbers
+    assert all(data_manager.is_duplicate(number) for number in numbers)
+    data_manager.close()
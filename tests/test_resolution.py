@@ -0,0 +1,101 @@
+# tests/test_resolution.py
+
+from functools import lru_cache
+
+import cv2
+import numpy as np
+import pytest
+
+from processing.resolution import FullResolution, decode_at_least, encoded_size, scale_box
+
+FORMATS = (".jpg", ".png", ".webp")
+
+
+@lru_cache(maxsize=None)
+def encode(height, width, extension, seed=0):
+    image = np.random.default_rng(seed).integers(0, 255, (height, width, 3), dtype=np.uint8)
+    return cv2.imencode(extension, image)[1].tobytes()
+
+
+@pytest.mark.parametrize("extension", FORMATS)
+@pytest.mark.parametrize(
+    "min_side, shape",
+    [
+        (None, (1200, 1600)),
+        (100, (150, 200)),
+        (200, (150, 200)),
+        (201, (300, 400)),
+        (400, (300, 400)),
+        (401, (600, 800)),
+        (800, (600, 800)),
+        (801, (1200, 1600)),
+        (5000, (1200, 1600)),
+    ],
+)
+def test_decode_at_least_picks_the_coarsest_large_enough_scale(extension, min_side, shape):
+    image = decode_at_least(encode(1200, 1600, extension), min_side)
+    assert image.shape == shape + (3,)
+
+
+@pytest.mark.parametrize("extension", FORMATS)
+@pytest.mark.parametrize("min_side", [125, 126, 250, 251, 500, 501, 1001])
+def test_decode_at_least_keeps_min_side_on_odd_sizes(extension, min_side):
+    image = decode_at_least(encode(751, 1001, extension), min_side)
+    assert max(image.shape[:2]) >= min_side
+    assert max(image.shape[:2]) < 2 * min_side or image.shape[:2] == (751, 1001)
+
+
+def test_undecodable_data():
+    assert encoded_size(b"not an image") is None
+    assert decode_at_least(b"not an image", 100) is None
+    assert decode_at_least(b"not an image") is None
+
+
+def test_encoded_size_reads_the_header():
+    assert encoded_size(encode(30, 40, ".png")) == (40, 30)
+
+
+@pytest.mark.parametrize(
+    "box, expected",
+    [
+        ((10, 20, 30, 40), (40, 80, 120, 160)),
+        # Fractional coordinates grow outwards, so the box never loses pixels
+        ((10.2, 20.7, 30.1, 40.5), (40, 82, 121, 162)),
+        # Boxes past the edges are clipped to the image
+        ((-5, -1, 210, 160), (0, 0, 800, 600)),
+    ],
+)
+def test_scale_box_to_full_resolution(box, expected):
+    assert scale_box(box, (150, 200), (600, 800)) == expected
+
+
+def test_scale_box_between_unequal_scales():
+    # Width divided by 4, height by 2
+    assert scale_box((100, 100, 301, 201), (400, 800), (200, 200)) == (25, 50, 76, 101)
+
+
+def test_scale_box_round_trip_contains_the_box():
+    rng = np.random.default_rng(0)
+    full, reduced = (751, 1001), (94, 126)
+    for _ in range(100):
+        x1, x2 = sorted(rng.integers(0, full[1], 2))
+        y1, y2 = sorted(rng.integers(0, full[0], 2))
+        back = scale_box(scale_box((x1, y1, x2, y2), full, reduced), reduced, full)
+        assert back[0] <= x1 and back[1] <= y1 and back[2] >= x2 and back[3] >= y2
+
+
+def test_full_resolution_is_loaded_once_with_its_transforms():
+    loads = []
+
+    def load(file_bytes):
+        loads.append(file_bytes)
+        return np.arange(6).reshape(2, 3)
+
+    full = FullResolution(b"data", load)
+    full.transforms.append(np.transpose)
+    full.transforms.append(lambda image: image * 10)
+    assert full().tolist() == [[0, 30], [10, 40], [20, 50]]
+    assert full() is full()
+    assert loads == [b"data"]
+    full.release()
+    assert full._image is None and full._file_bytes is None
@@ -0,0 +1,134 @@
+# tests/test_stream.py
+
+import cv2
+import numpy as np
+import pytest
+
+from formatter.bulk_mrz import TD3_LENGTH
+from instrumentation.tracing import NULL_TRACER
+
+# The mrz_reader package loads the OCR models on import
+pytest.importorskip("easyocr")
+from mrz_reader.stream import StreamReader, vote  # noqa: E402
+
+LINE1 = "P<UTOERIKSSON<<ANNA<MARIA<<<<<<<<<<<<<<<<<<<"
+LINE2 = "L898902C36UTO7408122F1204159ZE184226B<<<<<10"
+MRZ = LINE1 + LINE2
+MRZ_SIZE = (200, 30)
+
+
+def with_character(mrz, index, character):
+    return mrz[:index] + character + mrz[index + 1:]
+
+
+class FakeSegmentation:
+    """
+    Finds the MRZ as the bounding box of the non-black pixels, and counts the calls.
+    """
+    def __init__(self):
+        self.calls = 0
+
+    def run(self, frame):
+        self.calls += 1
+        return frame
+
+    def locate(self, output, shape):
+        points = cv2.findNonZero(cv2.cvtColor(output, cv2.COLOR_BGR2GRAY))
+        if points is None:
+            return None
+        x, y, w, h = cv2.boundingRect(points)
+        return np.array([[x, y], [x + w, y], [x + w, y + h], [x, y + h]], dtype=np.int32)
+
+
+class FakeReader:
+    """
+    Reads the scripted MRZ lines on every OCR run.
+    """
+    def __init__(self, lines=(LINE1, LINE2)):
+        self.segmentation = FakeSegmentation()
+        self.tracer = NULL_TRACER
+        self.lines = lines
+
+    def recognize_text(self, image, preprocess_config):
+        return [(None, line, 1.0) for line in self.lines]
+
+
+def frames(positions, seed=0):
+    """
+    Yield black frames showing the same textured MRZ patch at each (x, y) position.
+    """
+    rng = np.random.default_rng(seed)
+    width, height = MRZ_SIZE
+    patch = rng.integers(1, 256, (height, width, 3), dtype=np.uint8)
+    for x, y in positions:
+        frame = np.zeros((240, 320, 3), dtype=np.uint8)
+        frame[y:y + height, x:x + width] = patch
+        yield frame
+
+
+def test_vote_takes_the_majority_of_every_character():
+    reads = [MRZ, with_character(MRZ, 5, "X"), with_character(MRZ, 60, "7")]
+    voted, agreement = vote(reads)
+    assert voted == MRZ
+    assert agreement.shape == (TD3_LENGTH,)
+    expected = np.full(TD3_LENGTH, 3)
+    expected[[5, 60]] = 2
+    np.testing.assert_array_equal(agreement, expected)
+
+
+def test_vote_of_one_read_is_that_read():
+    voted, agreement = vote([MRZ])
+    assert voted == MRZ
+    assert (agreement == 1).all()
+
+
+def test_still_mrz_is_segmented_once_and_read_until_confirmed():
+    reader = FakeReader()
+    result = StreamReader(reader).read(frames([(40, 100)] * 30))
+    # Segmented on frame 0, stable from frame 3, read on frames 3 and 3 + ocr_interval
+    assert reader.segmentation.calls == 1
+    assert result["confirmed"]
+    assert result["mrz_lines"] == [LINE1, LINE2]
+    assert (result["frames"], result["ocr_runs"], result["reads"]) == (9, 2, 2)
+
+
+def test_moving_mrz_is_tracked_and_read_once_still():
+    reader = FakeReader()
+    # Moves 6 pixels a frame (more than stable_motion of its width) until frame 5
+    positions = [(20 + 6 * min(index, 5), 100) for index in range(30)]
+    result = StreamReader(reader).read(frames(positions))
+    assert reader.segmentation.calls == 1
+    # Still from frame 6, stable for stable_frames at frame 8, then read again at 13
+    assert (result["frames"], result["ocr_runs"]) == (14, 2)
+    assert result["confirmed"]
+
+
+def test_mrz_out_of_sight_is_segmented_every_sample_every_frames():
+    reader = FakeReader()
+    blank = (np.zeros((240, 320, 3), dtype=np.uint8) for _ in range(10))
+    result = StreamReader(reader, sample_every=3).read(blank)
+    # Frames 0, 3, 6 and 9
+    assert reader.segmentation.calls == 4
+    assert (result["segmentations"], result["ocr_runs"], result["confirmed"]) == (4, 0, False)
+    assert result["mrz_lines"] is None
+
+
+def test_blurry_mrz_is_never_read():
+    reader = FakeReader()
+    result = StreamReader(reader, min_sharpness=1e9).read(frames([(40, 100)] * 20))
+    assert (result["frames"], result["ocr_runs"], result["confirmed"]) == (20, 0, False)
+
+
+def test_misread_is_outvoted_before_confirming():
+    reader = FakeReader()
+    reads = iter([(LINE1, with_character(LINE2, 9, "7"))] + [(LINE1, LINE2)] * 2)
+
+    def recognize_text(image, preprocess_config):
+        return [(None, line, 1.0) for line in next(reads)]
+
+    reader.recognize_text = recognize_text
+    result = StreamReader(reader, min_votes=2).read(frames([(40, 100)] * 30))
+    # The first two reads disagree on the check digit; the third one settles it
+    assert (result["frames"], result["ocr_runs"], result["reads"]) == (14, 3, 3)
+    assert result["confirmed"]
+    assert result["mrz_lines"] == [LINE1, LINE2]
@@ -0,0 +1,97 @@
+# tests/test_tracing.py
+
+import json
+
+import numpy as np
+import pytest
+
+from instrumentation import tracing
+from instrumentation.tracing import NULL_TRACER, JsonlSink, MemorySink, Tracer, format_summary
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """
+    Replace perf_counter by a clock that only moves when advanced, in milliseconds.
+    """
+    now = [0.0]
+    monkeypatch.setattr(tracing.time, "perf_counter", lambda: now[0])
+
+    def advance(milliseconds):
+        now[0] += milliseconds / 1000
+
+    return advance
+
+
+def test_summary_reports_count_mean_and_percentiles(clock):
+    tracer = Tracer(MemorySink())
+    durations = np.arange(1, 101)
+    for duration in durations:
+        with tracer.span("read_mrz"):
+            clock(duration)
+    with tracer.span("parse"):
+        clock(2)
+
+    summary = tracer.summary()
+    assert summary["read_mrz"]["count"] == 100
+    assert summary["read_mrz"]["mean_ms"] == pytest.approx(50.5)
+    for percentile in (50, 95, 99):
+        expected = np.percentile(durations, percentile)
+        assert summary["read_mrz"][f"p{percentile}_ms"] == pytest.approx(expected)
+    assert summary["parse"] == pytest.approx(
+        {"count": 1, "mean_ms": 2.0, "p50_ms": 2.0, "p95_ms": 2.0, "p99_ms": 2.0}
+    )
+
+
+def test_spans_record_parent_outcome_and_attributes(clock):
+    sink = MemorySink()
+    tracer = Tracer(sink)
+    with tracer.span("image", image_file="a.jpg") as image:
+        with tracer.span("decode") as decode:
+            clock(5)
+            decode.set(height=10, width=20)
+        with pytest.raises(KeyError):
+            with tracer.span("parse"):
+                raise KeyError("field")
+        image.set(outcome="duplicate")
+
+    decode, parse, image = sink.records
+    assert (decode["name"], decode["parent"], decode["outcome"]) == ("decode", "image", "ok")
+    assert (decode["height"], decode["width"], decode["duration_ms"]) == (10, 20, pytest.approx(5))
+    assert (parse["parent"], parse["outcome"]) == ("image", "error: KeyError")
+    assert (image["parent"], image["outcome"], image["image_file"]) == (None, "duplicate", "a.jpg")
+
+
+def test_jsonl_sink_writes_one_record_per_line(tmp_path):
+    path = tmp_path / "trace.jsonl"
+    tracer = Tracer(JsonlSink(str(path)))
+    for name in ("decode", "parse"):
+        with tracer.span(name, attempt=1):
+            pass
+    tracer.close()
+    records = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [(record["name"], record["attempt"]) for record in records] == [
+        ("decode", 1),
+        ("parse", 1),
+    ]
+
+
+def test_format_summary_is_a_sorted_table():
+    summary = {
+        "read_mrz": {"count": 3, "mean_ms": 12.345, "p50_ms": 10.0, "p95_ms": 20.0, "p99_ms": 21.5},
+        "decode": {"count": 3, "mean_ms": 1.0, "p50_ms": 1.0, "p95_ms": 1.25, "p99_ms": 1.5},
+    }
+    header, decode, read_mrz = format_summary(summary).splitlines()
+    assert header.split() == ["stage", "count", "mean", "ms", "p50", "ms", "p95", "ms", "p99", "ms"]
+    assert decode.split() == ["decode", "3", "1.0", "1.0", "1.2", "1.5"]
+    assert read_mrz.split() == ["read_mrz", "3", "12.3", "10.0", "20.0", "21.5"]
+    assert len({len(line) for line in (header, decode, read_mrz)}) == 1
+
+
+def test_null_tracer_times_spans_without_recording(clock):
+    with NULL_TRACER.span("read_mrz", image_file="a.jpg") as span:
+        span.set(outcome="ignored")
+        clock(7)
+    assert span.duration == pytest.approx(0.007)
+    assert NULL_TRACER.summary() == {}
+    assert format_summary({}).count("\n") == 0